@@ -1,17 +1,26 @@
 from __future__ import annotations
 from typing import Dict, Set, Hashable, Protocol, List, Tuple
-import networkx as nx
-import matplotlib.pyplot as plt
+from classes.networkx_view import NetworkXView
+from lib import instrumentation
 
 class NodeLike(Protocol):
     id: Hashable
     event_type: str
     event_attributes: Dict[str, str]
 
-class EventGraph:
+class GraphObserver(Protocol):
+    def node_added(self, graph: "EventGraph", node_id: Hashable) -> None: ...
+    def node_removed(self, graph: "EventGraph", node_id: Hashable,
+                     predecessors: List[Hashable], successors: List[Hashable]) -> None: ...
+    def edge_added(self, graph: "EventGraph", u: Hashable, v: Hashable) -> None: ...
+    def edge_removed(self, graph: "EventGraph", u: Hashable, v: Hashable) -> None: ...
+
+class EventGraph(NetworkXView):
     def __init__(self) -> None:
         self.nodes: Dict[Hashable, NodeLike] = {}
         self.adj_list: Dict[Hashable, Set[Hashable]] = {}
+        self.rev_adj_list: Dict[Hashable, Set[Hashable]] = {}
+        self._observers: List[GraphObserver] = []
 
     # ---- core API ----
     def add_node(self, node: NodeLike) -> None:
@@ -19,21 +28,29 @@ class EventGraph:
             raise ValueError(f"Node with id {node.id!r} already exists")
         self.nodes[node.id] = node
         self.adj_list[node.id] = set()
-        
+        self.rev_adj_list[node.id] = set()
+        for obs in self._observers:
+            obs.node_added(self, node.id)
+
     def remove_node(self, node_id: Hashable) -> None:
         """Remove a node and all its incident edges by id."""
         if node_id not in self.nodes:
             raise KeyError(f"Node {node_id!r} not found")
 
         # remove outbound edges
-        self.adj_list.pop(node_id, None)
+        succs = self.adj_list.pop(node_id, set())
+        for v in succs:
+            self.rev_adj_list[v].discard(node_id)
 
         # remove inbound edges
-        for nbrs in self.adj_list.values():
-            nbrs.discard(node_id)
+        preds = self.rev_adj_list.pop(node_id, set())
+        for u in preds:
+            self.adj_list[u].discard(node_id)
 
         # remove node record
         self.nodes.pop(node_id, None)
+        for obs in self._observers:
+            obs.node_removed(self, node_id, list(preds), list(succs))
 
     def add_edge(self, from_node: NodeLike, to_node: NodeLike) -> None:
         u, v = from_node.id, to_node.id
@@ -43,11 +60,19 @@ class EventGraph:
             raise ValueError("Self-loops are not allowed in a DAG.")
         if self._would_create_cycle(u, v):
             raise ValueError(f"Edge {u!r}->{v!r} would create a cycle.")
+        if v in self.adj_list[u]:
+            return
         self.adj_list[u].add(v)
+        self.rev_adj_list[v].add(u)
+        for obs in self._observers:
+            obs.edge_added(self, u, v)
 
     def remove_edge(self, from_id: Hashable, to_id: Hashable) -> None:
-        if from_id in self.adj_list:
+        if to_id in self.adj_list.get(from_id, ()):
             self.adj_list[from_id].discard(to_id)
+            self.rev_adj_list[to_id].discard(from_id)
+            for obs in self._observers:
+                obs.edge_removed(self, from_id, to_id)
 
     def insert_between(self, u: Hashable, v: Hashable, new_node: NodeLike) -> None:
         if v not in self.adj_list.get(u, set()):
@@ -57,6 +82,14 @@ class EventGraph:
         self.add_edge(self.nodes[u], new_node)
         self.add_edge(new_node, self.nodes[v])
 
+    # ---- observers ----
+    def subscribe(self, observer: GraphObserver) -> None:
+        """Notify `observer` after every structural edit of this graph."""
+        self._observers.append(observer)
+
+    def unsubscribe(self, observer: GraphObserver) -> None:
+        self._observers.remove(observer)
+
     # ---- new convenience methods ----
     def to_edge_list(self, *, sort: bool = False) -> List[Tuple[Hashable, Hashable]]:
         """Return edges as (u,v) tuples. Optional deterministic sort."""
@@ -68,49 +101,50 @@ class EventGraph:
             edges.sort(key=lambda e: (repr(e[0]), repr(e[1])))
         return edges
 
-    def to_networkx(self) -> nx.DiGraph:
-        """Build a NetworkX DiGraph with node attribute 'label'=event_type."""
-        G = nx.DiGraph()
-        for node in self.nodes.values():
-            G.add_node(node.id, label=node.event_type)
-        G.add_edges_from(self.to_edge_list())
-        return G
+    def freeze(self, *, keep_ids: bool = False):
+        """Return an immutable array-backed `FrozenEventGraph` snapshot for read-only use."""
+        from classes.frozen_event_graph import FrozenEventGraph
+        return FrozenEventGraph.from_graph(self, keep_ids=keep_ids)
+
+    def _labelled_nodes(self):
+        return ((node.id, node.event_type) for node in self.nodes.values())
 
     # ---- utils ----
     def successors(self, node_id: Hashable):
         return iter(self.adj_list.get(node_id, set()))
 
+    def predecessors(self, node_id: Hashable):
+        return iter(self.rev_adj_list.get(node_id, set()))
+
+    def in_degree(self, node_id: Hashable) -> int:
+        return len(self.rev_adj_list.get(node_id, ()))
+
+    def out_degree(self, node_id: Hashable) -> int:
+        return len(self.adj_list.get(node_id, ()))
+
     def print_nodes(self) -> None:
         if not self.nodes:
             print("No nodes"); return
         for nid, node in self.nodes.items():
             print(f"{nid!r}: {node.event_type}")
 
-    def visualize(self) -> None:
-        G = self.to_networkx()
-        pos = nx.spring_layout(G)
-        labels = {n: d.get("label", str(n)) for n, d in G.nodes(data=True)}
-        # shorten long labels
-        labels = {n: (lbl if len(lbl) <= 18 else lbl[:15] + "...") for n, lbl in labels.items()}
-        nx.draw_networkx_nodes(G, pos, node_color="lightblue", node_size=400)
-        nx.draw_networkx_edges(G, pos, arrows=True)
-        nx.draw_networkx_labels(G, pos, labels=labels, font_size=8)
-        plt.axis("off"); plt.tight_layout(); plt.show()
-    
-
-
     # ---- internal ----
     def _would_create_cycle(self, u: Hashable, v: Hashable) -> bool:
         if u == v:
             return True
         seen: Set[Hashable] = set()
         stack = [v]
+        found = False
         while stack:
             x = stack.pop()
             if x == u:
-                return True
+                found = True
+                break
             if x in seen:
                 continue
             seen.add(x)
             stack.extend(self.adj_list.get(x, ()))
-        return False
+        if instrumentation.enabled:
+            instrumentation.count("dag.cycle_checks")
+            instrumentation.count("dag.cycle_check_nodes_visited", len(seen))
+        return found
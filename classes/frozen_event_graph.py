@@ -0,0 +1,131 @@
+from __future__ import annotations
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+import numpy as np
+from data.event_types import event_types
+from classes.networkx_view import NetworkXView
+
+# event type name <-> small int id, seeded from data/event_types.py; unknown names are appended
+_TYPE_IDS: Dict[str, int] = {spec["event_type"]: tid for tid, spec in event_types.items()}
+_TYPE_NAMES: Dict[int, str] = {tid: name for name, tid in _TYPE_IDS.items()}
+
+# shared (attr_name, attr_value) pairs, so equal attributes across graphs are stored once;
+# keyed with the value's type so 1, 1.0 and True stay distinct
+_ATTR_ITEMS: Dict[Tuple[str, type, object], Tuple[str, object]] = {}
+
+def intern_event_type(name: str) -> int:
+    tid = _TYPE_IDS.get(name)
+    if tid is None:
+        tid = max(_TYPE_NAMES, default=-1) + 1
+        _TYPE_IDS[name] = tid
+        _TYPE_NAMES[tid] = name
+    return tid
+
+def event_type_name(tid: int) -> str:
+    return _TYPE_NAMES[tid]
+
+def _intern_attr(item: Tuple[str, object]) -> Tuple[str, object]:
+    name, value = item
+    try:
+        return _ATTR_ITEMS.setdefault((name, type(value), value), item)
+    except TypeError:  # unhashable value
+        return item
+
+def _readonly(a: np.ndarray) -> np.ndarray:
+    a.setflags(write=False)
+    return a
+
+
+class FrozenEventGraph(NetworkXView):
+    """Immutable, array-backed snapshot of an `EventGraph`.
+
+    Nodes are int32 indices in the original insertion order. Edges are stored
+    in CSR form: the successors of node i are `targets[offsets[i]:offsets[i+1]]`.
+    Event types are interned ids from `data/event_types.py`.
+    """
+
+    __slots__ = ("type_ids", "offsets", "targets", "attr_offsets", "attr_items", "ids")
+
+    def __init__(self, type_ids: np.ndarray, offsets: np.ndarray, targets: np.ndarray,
+                 attr_offsets: np.ndarray, attr_items: Tuple[Tuple[str, object], ...],
+                 ids: Optional[Tuple[Hashable, ...]] = None) -> None:
+        if len(offsets) != len(type_ids) + 1 or len(attr_offsets) != len(type_ids) + 1:
+            raise ValueError("offsets and attr_offsets must have one entry per node plus one")
+        self.type_ids = _readonly(np.asarray(type_ids, dtype=np.int16))
+        self.offsets = _readonly(np.asarray(offsets, dtype=np.int32))
+        self.targets = _readonly(np.asarray(targets, dtype=np.int32))
+        self.attr_offsets = _readonly(np.asarray(attr_offsets, dtype=np.int32))
+        self.attr_items = tuple(attr_items)
+        self.ids = ids
+
+    @classmethod
+    def from_graph(cls, graph, *, keep_ids: bool = False) -> "FrozenEventGraph":
+        index = {nid: i for i, nid in enumerate(graph.nodes)}
+        type_ids, offsets, targets = [], [0], []
+        attr_offsets, attr_items = [0], []
+        for nid, node in graph.nodes.items():
+            type_ids.append(intern_event_type(node.event_type))
+            targets.extend(sorted(index[v] for v in graph.adj_list.get(nid, ())))
+            offsets.append(len(targets))
+            attr_items.extend(_intern_attr(item) for item in node.event_attributes.items())
+            attr_offsets.append(len(attr_items))
+        return cls(
+            np.asarray(type_ids), np.asarray(offsets), np.asarray(targets),
+            np.asarray(attr_offsets), tuple(attr_items),
+            tuple(graph.nodes) if keep_ids else None,
+        )
+
+    # ---- read API ----
+    def __len__(self) -> int:
+        return len(self.type_ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.targets)
+
+    @property
+    def event_types(self) -> List[str]:
+        return [_TYPE_NAMES[t] for t in self.type_ids.tolist()]
+
+    def event_type(self, i: int) -> str:
+        return _TYPE_NAMES[int(self.type_ids[i])]
+
+    def attributes(self, i: int) -> Dict[str, object]:
+        return dict(self.attr_items[self.attr_offsets[i]:self.attr_offsets[i + 1]])
+
+    def successors(self, i: int) -> np.ndarray:
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def out_degree(self, i: int) -> int:
+        return int(self.offsets[i + 1] - self.offsets[i])
+
+    def to_edge_list(self) -> List[Tuple[int, int]]:
+        sources = np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.offsets))
+        return list(zip(sources.tolist(), self.targets.tolist()))
+
+    def iter_attributes(self) -> Iterator[Tuple[str, str, object]]:
+        """Yield (event_type, attr_name, attr_value) in node order, as `attributes_hash` visits them."""
+        for i, tid in enumerate(self.type_ids.tolist()):
+            name = _TYPE_NAMES[tid]
+            for attr_name, attr_value in self.attr_items[self.attr_offsets[i]:self.attr_offsets[i + 1]]:
+                yield name, attr_name, attr_value
+
+    def nbytes(self) -> int:
+        """Approximate memory held by this graph (arrays plus the tuple of shared attribute pairs)."""
+        arrays = self.type_ids.nbytes + self.offsets.nbytes + self.targets.nbytes + self.attr_offsets.nbytes
+        return arrays + 8 * len(self.attr_items)
+
+    # ---- conversion ----
+    def thaw(self):
+        """Build a mutable `EventGraph` with fresh `EventNode`s."""
+        from classes.event_graph import EventGraph
+        from classes.event_node import EventNode
+        g = EventGraph()
+        nodes = [EventNode(self.event_type(i), self.attributes(i)) for i in range(len(self))]
+        for node in nodes:
+            g.add_node(node)
+        for u, v in self.to_edge_list():
+            g.add_edge(nodes[u], nodes[v])
+        return g
+
+    def _labelled_nodes(self):
+        return enumerate(self.event_types)
@@ -0,0 +1,33 @@
+from __future__ import annotations
+from typing import Hashable, Iterator, Tuple
+import networkx as nx
+import matplotlib.pyplot as plt
+
+
+class NetworkXView:
+    """`to_networkx` / `visualize` for graphs with `_labelled_nodes()` and `to_edge_list()`."""
+
+    __slots__ = ()
+
+    def _labelled_nodes(self) -> Iterator[Tuple[Hashable, str]]:
+        """Yield (node key, event_type) for every node."""
+        raise NotImplementedError
+
+    def to_networkx(self) -> nx.DiGraph:
+        """Build a NetworkX DiGraph with node attribute 'label'=event_type."""
+        G = nx.DiGraph()
+        for key, event_type in self._labelled_nodes():
+            G.add_node(key, label=event_type)
+        G.add_edges_from(self.to_edge_list())
+        return G
+
+    def visualize(self) -> None:
+        G = self.to_networkx()
+        pos = nx.spring_layout(G)
+        labels = {n: d.get("label", str(n)) for n, d in G.nodes(data=True)}
+        # shorten long labels
+        labels = {n: (lbl if len(lbl) <= 18 else lbl[:15] + "...") for n, lbl in labels.items()}
+        nx.draw_networkx_nodes(G, pos, node_color="lightblue", node_size=400)
+        nx.draw_networkx_edges(G, pos, arrows=True)
+        nx.draw_networkx_labels(G, pos, labels=labels, font_size=8)
+        plt.axis("off"); plt.tight_layout(); plt.show()
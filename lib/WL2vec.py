@@ -1,13 +1,163 @@
-import hashlib
+import hashlib, time
+from typing import Dict, List, Sequence, Union
+import numpy as np
+from lib import instrumentation
 from data.attribute_weights import attribute_weights
 from classes.event_graph import EventGraph
+from classes.frozen_event_graph import FrozenEventGraph, event_type_name, intern_event_type
+from lib.sparse_fingerprint import SparseFingerprint, csr_from_coo
+
+# recorded in persisted fingerprints; bump when labels would hash differently
+HASH_SCHEME = "blake2b-128/repr"
 
 def stable_hash(label: str):
+    if instrumentation.enabled:
+        instrumentation.count("wl.hash_calls")
     h = hashlib.blake2b(label.encode("utf-8"), digest_size=16).digest()
     return int.from_bytes(h, "little")
 
-def WL_neighborhood_label(graph: EventGraph, iterations: int = 3, inspect: bool = False):
-    labels = {node: stable_hash(graph.nodes[node].event_type) for node in graph.nodes}
+def key_hash(key):
+    """Hash a WL key: event type names as-is, signatures and attribute triples via `repr`."""
+    if instrumentation.enabled:
+        return _timed_key_hash(key)
+    return stable_hash(key if isinstance(key, str) else repr(key))
+
+def _timed_key_hash(key):
+    # split the cost of building the key string from the blake2b digest itself
+    t0 = time.perf_counter()
+    text = key if isinstance(key, str) else repr(key)
+    t1 = time.perf_counter()
+    label = stable_hash(text)
+    instrumentation.add_time("wl.repr", t1 - t0)
+    instrumentation.add_time("wl.blake2b", time.perf_counter() - t1)
+    return label
+
+def _memo_key(key):
+    # 1 == 1.0 == True share a dict slot but not a repr, so memoized keys carry their type
+    if type(key) is tuple:
+        return key, tuple(map(type, key))
+    return type(key), key
+
+def _hasher(vocab):
+    # a `lib.label_vocab.LabelVocabulary` memoizes key_hash across a corpus
+    return vocab.hash if vocab is not None else key_hash
+
+# ---- hash families ----
+class Blake2bFamily:
+    """Default WL hashing: 128-bit blake2b over the `repr` of every key (names as-is).
+
+    `key` hashes leaf keys (event type names, attribute triples); `signature`
+    hashes one relabel step, with neighbours sorted by `repr`. With a `vocab`
+    a repeated signature is found before its key is built.
+    """
+
+    name = HASH_SCHEME
+
+    def __init__(self, vocab=None) -> None:
+        self.key = _hasher(vocab)
+        if vocab is not None:
+            self.signature = vocab.signature
+
+    def signature_key(self, label: int, neighbours: List[int]) -> tuple:
+        """The (label, neighbours) key `signature` hashes, as `inspect=True` prints it."""
+        return label, tuple(sorted(neighbours, key=repr))
+
+    def signature(self, label: int, neighbours: List[int]) -> int:
+        return self.key(self.signature_key(label, neighbours))
+
+
+_MASK64 = (1 << 64) - 1
+
+def _mix64(x: int) -> int:
+    """splitmix64 finalizer over Python ints."""
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+def _mix64_array(x: np.ndarray) -> np.ndarray:
+    """`_mix64` over a uint64 array (multiplication wraps mod 2^64)."""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class SplitMixFamily:
+    """Seeded 64-bit integer mixing; relabels without building or hashing any string.
+
+    A signature is mix(mix(label ^ s1) + sum of mix(n ^ s2) over neighbours)
+    mod 2^64: the neighbour sum is a multiset hash, so no sort is needed, and
+    `relabel` computes a whole WL iteration over CSR arrays in NumPy. Leaf
+    keys are hashed once with 64-bit blake2b and memoized. Labels differ
+    from `Blake2bFamily`'s, so fingerprints of the two are not comparable.
+    """
+
+    def __init__(self, seed: int = 0, max_keys: int = 1 << 20) -> None:
+        self.seed = seed
+        self.name = f"splitmix64/{seed}"
+        self.max_keys = max_keys
+        self._s1 = _mix64((seed * 2 + 1) & _MASK64)
+        self._s2 = _mix64((seed * 2 + 2) & _MASK64)
+        self._keys: Dict = {}
+
+    def key(self, key) -> int:
+        memo = _memo_key(key)
+        label = self._keys.get(memo)
+        if label is None:
+            text = f"{self.seed}:{key if isinstance(key, str) else repr(key)}"
+            if instrumentation.enabled:
+                instrumentation.count("wl.hash_calls")
+            label = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+            if len(self._keys) >= self.max_keys:
+                self._keys.clear()
+            self._keys[memo] = label
+        return label
+
+    def signature_key(self, label: int, neighbours: List[int]) -> tuple:
+        """(label, neighbour multiset) that `signature` hashes, neighbours sorted for display."""
+        return label, tuple(sorted(neighbours))
+
+    def signature(self, label: int, neighbours: List[int]) -> int:
+        acc = _mix64(label ^ self._s1)
+        for n in neighbours:
+            acc += _mix64(n ^ self._s2)
+        return _mix64(acc & _MASK64)
+
+    def relabel(self, labels: np.ndarray, offsets: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        """One WL iteration for every node: uint64 labels in, uint64 labels out."""
+        acc = _mix64_array(labels ^ np.uint64(self._s1))
+        if len(targets):
+            contrib = _mix64_array(labels[targets] ^ np.uint64(self._s2))
+            starts = offsets[:-1]
+            has = starts < offsets[1:]
+            acc[has] += np.add.reduceat(contrib, starts[has])
+        return _mix64_array(acc)
+
+    def __getstate__(self) -> Dict:
+        # ship to worker processes without the memo
+        return {**self.__dict__, "_keys": {}}
+
+
+HASH_FAMILIES = {"blake2b": Blake2bFamily, "splitmix64": SplitMixFamily}
+_named_families: Dict[str, SplitMixFamily] = {}  # shared so the key memo survives across calls
+
+def get_hash_family(spec: Union[None, str, Blake2bFamily, SplitMixFamily] = None, vocab=None):
+    """Resolve a `hash_family` argument: None / "blake2b" (default), "splitmix64", or an instance."""
+    if spec is None or spec == "blake2b":
+        return Blake2bFamily(vocab)
+    if vocab is not None and not isinstance(spec, Blake2bFamily):
+        raise ValueError("vocab only applies to the blake2b hash family")
+    if isinstance(spec, str):
+        if spec not in HASH_FAMILIES:
+            raise ValueError(f"Unknown hash family {spec!r}; expected one of {sorted(HASH_FAMILIES)}")
+        spec = _named_families.setdefault(spec, HASH_FAMILIES[spec]())
+    return spec
+
+def WL_neighborhood_label(graph: EventGraph, iterations: int = 3, inspect: bool = False, vocab=None,
+                          hash_family=None):
+    fam = get_hash_family(hash_family, vocab)
+    if isinstance(graph, FrozenEventGraph):
+        return _frozen_WL_neighborhood_label(graph, iterations, inspect, fam)
+    labels = {node: fam.key(graph.nodes[node].event_type) for node in graph.nodes}
     history = [labels.copy()]
     
     for _ in range(iterations):
@@ -15,38 +165,66 @@ def WL_neighborhood_label(graph: EventGraph, iterations: int = 3, inspect: bool
         for node in graph.nodes:
             nbrs = graph.adj_list.get(node, [])  # safe default
             neighbor_labels = [labels[nbr] for nbr in nbrs if nbr in labels]
-            
-            # deterministic sort even if labels later become non-strings
-            neighbor_labels.sort(key=repr)
 
-            signature = (labels[node], tuple(neighbor_labels))
-
-            if inspect: print(repr(signature))
-            new_label = stable_hash(repr(signature))
+            if inspect: print(repr(fam.signature_key(labels[node], neighbor_labels)))
+            new_label = fam.signature(labels[node], neighbor_labels)
             
             new_core[node] = new_label
             
         labels = new_core
         history.append(labels.copy())
+        if instrumentation.enabled:
+            _count_iteration(len(labels))
         
     return history  # list of dicts for it=0..h
 
-def attributes_hash(graph: EventGraph, inspect: bool = False):
-    attr_features = []
-    
+def _count_iteration(nodes: int) -> None:
+    instrumentation.count("wl.iterations")
+    instrumentation.count("wl.nodes_relabeled", nodes)
+
+def _frozen_WL_neighborhood_label(graph: FrozenEventGraph, iterations: int, inspect: bool, fam):
+    """`WL_neighborhood_label` over CSR arrays; history dicts are keyed by node index."""
+    labels = [fam.key(name) for name in graph.event_types]
+    history = [dict(enumerate(labels))]
+    offsets, targets = graph.offsets.tolist(), graph.targets.tolist()
+
+    for _ in range(iterations):
+        new_core = []
+        for node in range(len(labels)):
+            neighbor_labels = [labels[nbr] for nbr in targets[offsets[node]:offsets[node + 1]]]
+            if inspect: print(repr(fam.signature_key(labels[node], neighbor_labels)))
+            new_core.append(fam.signature(labels[node], neighbor_labels))
+        labels = new_core
+        history.append(dict(enumerate(labels)))
+        if instrumentation.enabled:
+            _count_iteration(len(labels))
+
+    return history
+
+def _attribute_triples(graph: EventGraph):
+    if isinstance(graph, FrozenEventGraph):
+        yield from graph.iter_attributes()
+        return
     for node in graph.nodes.values():
         for (attr_name, attr_value) in node.event_attributes.items():
-            feat_key = (node.event_type, attr_name, attr_value)
-            if inspect: print(repr(feat_key))
-            feat_hash = stable_hash(repr(feat_key))
-            attr_features.append((feat_hash, attribute_weights[attr_name]))
+            yield node.event_type, attr_name, attr_value
+
+def attributes_hash(graph: EventGraph, inspect: bool = False, vocab=None, hash_family=None):
+    h = get_hash_family(hash_family, vocab).key
+    attr_features = []
+    
+    for feat_key in _attribute_triples(graph):
+        if inspect: print(repr(feat_key))
+        feat_hash = h(feat_key)
+        attr_features.append((feat_hash, attribute_weights[feat_key[1]]))
     
     return attr_features
         
 
-def graph_to_fingerprint(graph: EventGraph, D=1024):
-    labels_h_stack = WL_neighborhood_label(graph)
-    attr_features = attributes_hash(graph)
+@instrumentation.timed("wl.graph_to_fingerprint")
+def graph_to_fingerprint(graph: EventGraph, D=1024, iterations: int = 3, vocab=None, hash_family=None):
+    labels_h_stack = WL_neighborhood_label(graph, iterations, vocab=vocab, hash_family=hash_family)
+    attr_features = attributes_hash(graph, vocab=vocab, hash_family=hash_family)
     
     fingerprint = [0.0] * D
     
@@ -61,4 +239,339 @@ def graph_to_fingerprint(graph: EventGraph, D=1024):
         idx = feat_hash % D
         fingerprint[idx] = weight
     
-    return fingerprint
\ No newline at end of file
+    return fingerprint
+
+def graph_to_sparse_fingerprint(graph: EventGraph, D=1024, iterations: int = 3, vocab=None,
+                                hash_family=None) -> SparseFingerprint:
+    """`graph_to_fingerprint` as a `SparseFingerprint`, built without a dense list."""
+    slots: Dict[int, float] = {}
+    for labels in WL_neighborhood_label(graph, iterations, vocab=vocab, hash_family=hash_family):
+        for feat in labels.values():
+            slots[feat % D] = 1.0
+    for (feat_hash, weight) in attributes_hash(graph, vocab=vocab, hash_family=hash_family):
+        slots[feat_hash % D] = weight
+    return SparseFingerprint.from_slots(slots, D)
+
+
+# ---- incremental maintenance ----
+class IncrementalFingerprint:
+    """WL label history and fingerprint of `graph`, kept current as the graph is edited.
+
+    Subscribes to the graph and, on every edit, relabels only the nodes whose
+    WL label can change: the edited nodes and their predecessors up to
+    `iterations` hops upstream. `history` matches `WL_neighborhood_label(graph,
+    iterations)` and `fingerprint` matches `graph_to_fingerprint(graph, D,
+    iterations)`; both are updated in place.
+    """
+
+    def __init__(self, graph: EventGraph, D: int = 1024, iterations: int = 3, vocab=None,
+                 hash_family=None) -> None:
+        self.graph = graph
+        self._family = get_hash_family(hash_family, vocab)
+        self._hash = self._family.key
+        self.D = D
+        self.iterations = iterations
+        self.history: List[Dict] = [{} for _ in range(iterations + 1)]
+        self.fingerprint: List[float] = [0.0] * D
+        self._struct_counts = [0] * D                # labels hashed into each slot, all iterations
+        self._attr_slots: Dict[int, Dict[tuple, float]] = {}  # slot -> {(node seq, attr idx): weight}
+        self._node_attrs: Dict = {}                  # node id -> [(slot, key)]
+        self._seq: Dict = {}
+        self._next_seq = 0
+        for nid in graph.nodes:
+            self._add_attributes(nid)
+        for it, labels in enumerate(WL_neighborhood_label(graph, iterations, hash_family=self._family)):
+            for nid, label in labels.items():
+                self._set_label(it, nid, label)
+        graph.subscribe(self)
+
+    def detach(self) -> None:
+        self.graph.unsubscribe(self)
+
+    # ---- observer callbacks ----
+    def node_added(self, graph: EventGraph, node_id) -> None:
+        self._add_attributes(node_id)
+        self._set_label(0, node_id, self._hash(graph.nodes[node_id].event_type))
+        self._propagate({node_id}, set())
+
+    def node_removed(self, graph: EventGraph, node_id, predecessors, successors) -> None:
+        for it in range(self.iterations + 1):
+            self._drop_label(it, node_id)
+        self._drop_attributes(node_id)
+        self._propagate(set(), set(predecessors))
+
+    def edge_added(self, graph: EventGraph, u, v) -> None:
+        self._propagate(set(), {u})
+
+    def edge_removed(self, graph: EventGraph, u, v) -> None:
+        self._propagate(set(), {u})
+
+    # ---- internal ----
+    def _propagate(self, changed: set, rewired: set) -> None:
+        """Relabel upstream of the edit, stopping early once no label changes."""
+        for it in range(1, self.iterations + 1):
+            dirty = set(rewired) | changed
+            for nid in changed:
+                dirty.update(self.graph.predecessors(nid))
+            changed = set()
+            for nid in dirty:
+                if nid in self.graph.nodes and self._set_label(it, nid, self._relabel(it, nid)):
+                    changed.add(nid)
+            if not changed and not rewired:
+                break
+
+    def _relabel(self, it: int, node_id) -> int:
+        labels = self.history[it - 1]
+        neighbor_labels = [labels[nbr] for nbr in self.graph.adj_list.get(node_id, []) if nbr in labels]
+        return self._family.signature(labels[node_id], neighbor_labels)
+
+    def _set_label(self, it: int, node_id, label: int) -> bool:
+        old = self.history[it].get(node_id)
+        if old == label:
+            return False
+        if old is not None:
+            self._count(old % self.D, -1)
+        self.history[it][node_id] = label
+        self._count(label % self.D, 1)
+        return True
+
+    def _drop_label(self, it: int, node_id) -> None:
+        old = self.history[it].pop(node_id, None)
+        if old is not None:
+            self._count(old % self.D, -1)
+
+    def _count(self, idx: int, delta: int) -> None:
+        self._struct_counts[idx] += delta
+        self._refresh(idx)
+
+    def _add_attributes(self, node_id) -> None:
+        seq = self._seq[node_id] = self._next_seq
+        self._next_seq += 1
+        node = self.graph.nodes[node_id]
+        entries = []
+        for j, (attr_name, attr_value) in enumerate(node.event_attributes.items()):
+            idx = self._hash((node.event_type, attr_name, attr_value)) % self.D
+            self._attr_slots.setdefault(idx, {})[(seq, j)] = attribute_weights[attr_name]
+            entries.append((idx, (seq, j)))
+            self._refresh(idx)
+        self._node_attrs[node_id] = entries
+
+    def _drop_attributes(self, node_id) -> None:
+        self._seq.pop(node_id, None)
+        for idx, key in self._node_attrs.pop(node_id, []):
+            slot = self._attr_slots[idx]
+            del slot[key]
+            if not slot:
+                del self._attr_slots[idx]
+            self._refresh(idx)
+
+    def _refresh(self, idx: int) -> None:
+        # attribute weights overwrite structural bits; the latest node/attribute wins
+        slot = self._attr_slots.get(idx)
+        if slot:
+            self.fingerprint[idx] = slot[max(slot)]
+        else:
+            self.fingerprint[idx] = 1.0 if self._struct_counts[idx] else 0.0
+
+
+# ---- batched engine ----
+def _pack_graphs(graphs: Sequence[EventGraph]):
+    """Flatten `graphs` into one disjoint-union array graph.
+
+    Returns interned event type ids, the owning graph of every node, CSR
+    offsets/targets over global node indices, and the attribute features in
+    the same order `attributes_hash` would visit them.
+    """
+    type_ids: List[np.ndarray] = []
+    node_graph: List[np.ndarray] = []
+    offsets: List[np.ndarray] = [np.zeros(1, dtype=np.int64)]
+    targets: List[np.ndarray] = []
+    triples: List[tuple] = []
+    triple_index: Dict[tuple, int] = {}   # keyed with the value's type so 1, 1.0 and True stay distinct
+    attr_graph: List[int] = []
+    attr_triple: List[int] = []
+    attr_weight: List[float] = []
+
+    n_nodes = n_edges = 0
+    for gi, graph in enumerate(graphs):
+        if isinstance(graph, FrozenEventGraph):
+            g_types = graph.type_ids.astype(np.int64)
+            g_offsets = graph.offsets[1:].astype(np.int64)
+            g_targets = graph.targets.astype(np.int64)
+        else:
+            local = {nid: i for i, nid in enumerate(graph.nodes)}
+            g_types, g_offsets, g_targets = [], [], []
+            for nid, node in graph.nodes.items():
+                g_types.append(intern_event_type(node.event_type))
+                g_targets.extend(local[nbr] for nbr in graph.adj_list.get(nid, ()) if nbr in local)
+                g_offsets.append(len(g_targets))
+            g_types = np.asarray(g_types, dtype=np.int64)
+            g_offsets = np.asarray(g_offsets, dtype=np.int64)
+            g_targets = np.asarray(g_targets, dtype=np.int64)
+
+        type_ids.append(g_types)
+        node_graph.append(np.full(len(g_types), gi, dtype=np.int64))
+        offsets.append(g_offsets + n_edges)
+        targets.append(g_targets + n_nodes)
+        n_nodes += len(g_types)
+        n_edges += len(g_targets)
+
+        for feat_key in _attribute_triples(graph):
+            attr_graph.append(gi)
+            t = triple_index.setdefault((type(feat_key[2]), feat_key), len(triples))
+            if t == len(triples):
+                triples.append(feat_key)
+            attr_triple.append(t)
+            attr_weight.append(attribute_weights[feat_key[1]])
+
+    def cat(chunks):
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64)
+
+    return (
+        cat(type_ids),
+        cat(node_graph),
+        cat(offsets),
+        cat(targets),
+        triples,
+        np.asarray(attr_graph, dtype=np.int64),
+        np.asarray(attr_triple, dtype=np.int64),
+        np.asarray(attr_weight, dtype=np.float32),
+    )
+
+def _rank_by_repr(hashes: List[int]):
+    """Order unique labels by `repr`, the order `WL_neighborhood_label` sorts neighbours in."""
+    order = sorted(range(len(hashes)), key=lambda i: repr(hashes[i]))
+    rank = np.empty(len(hashes), dtype=np.int64)
+    rank[order] = np.arange(len(hashes), dtype=np.int64)
+    return [hashes[i] for i in order], rank
+
+def _relabel(labels: np.ndarray, hashes: List[int], offsets: np.ndarray, targets: np.ndarray, h=key_hash):
+    """One WL iteration over every node of the packed graph at once.
+
+    `labels` are ranks into `hashes`, so sorting ranks numerically equals
+    sorting the underlying labels by `repr`. Neighbour ranks are sorted within
+    each CSR segment and nodes are grouped by degree, so signatures are
+    compared without padding to the largest degree. Only distinct signatures are hashed.
+    """
+    n = len(labels)
+    deg = np.diff(offsets)
+    rows = np.repeat(np.arange(n, dtype=np.int64), deg)
+    nbrs = labels[targets]
+    nbrs = nbrs[np.lexsort((nbrs, rows))]
+
+    by_degree = np.argsort(deg, kind="stable")
+    degrees, starts = np.unique(deg[by_degree], return_index=True)
+    sig_index = np.empty(n, dtype=np.int64)
+    new_hashes = []
+    for d, nodes in zip(degrees.tolist(), np.split(by_degree, starts[1:])):
+        sig = np.empty((len(nodes), d + 1), dtype=np.int64)
+        sig[:, 0] = labels[nodes]
+        if d:
+            sig[:, 1:] = nbrs[offsets[nodes][:, None] + np.arange(d)]
+        uniq, inverse = np.unique(sig, axis=0, return_inverse=True)
+        sig_index[nodes] = len(new_hashes) + inverse.reshape(-1)
+        for row in uniq.tolist():
+            new_hashes.append(h((hashes[row[0]], tuple(hashes[x] for x in row[1:]))))
+
+    # distinct signatures hash to distinct labels; fold any collision anyway
+    distinct = list(dict.fromkeys(new_hashes))
+    position = {h: i for i, h in enumerate(distinct)}
+    sorted_hashes, rank = _rank_by_repr(distinct)
+    sig_rank = rank[np.asarray([position[h] for h in new_hashes], dtype=np.int64)]
+    return sig_rank[sig_index], sorted_hashes
+
+def _iter_batch_labels(packed, iterations: int, vocab=None, hash_family=None):
+    """Yield (labels, hashes) for WL iterations 0..h over a packed batch from `_pack_graphs`.
+
+    `labels[i]` indexes node i's label in `hashes` (for blake2b sorted by `repr`).
+    """
+    type_ids, node_graph, offsets, targets = packed[:4]
+    fam = get_hash_family(hash_family, vocab)
+    present = np.unique(type_ids)
+    if hasattr(fam, "relabel"):
+        yield from _iter_vectorized_labels(fam, present, type_ids, offsets, targets, iterations)
+        return
+    h = fam.key
+    hashes, rank = _rank_by_repr([h(event_type_name(t)) for t in present.tolist()])
+    labels = rank[np.searchsorted(present, type_ids)]
+    yield labels, hashes
+    for _ in range(iterations):
+        labels, hashes = _relabel(labels, hashes, offsets, targets, h)
+        if instrumentation.enabled:
+            _count_iteration(len(labels))
+            instrumentation.count("wl.distinct_signatures", len(hashes))
+        yield labels, hashes
+
+def _iter_vectorized_labels(fam, present: np.ndarray, type_ids: np.ndarray, offsets: np.ndarray,
+                            targets: np.ndarray, iterations: int):
+    # integer families relabel uint64 arrays directly; only distinct labels become Python ints
+    type_labels = np.asarray([fam.key(event_type_name(t)) for t in present.tolist()], dtype=np.uint64)
+    labels = type_labels[np.searchsorted(present, type_ids)]
+    for it in range(iterations + 1):
+        if it:
+            labels = fam.relabel(labels, offsets, targets)
+            if instrumentation.enabled:
+                _count_iteration(len(labels))
+        hashes, inverse = np.unique(labels, return_inverse=True)
+        yield inverse.reshape(-1), hashes.tolist()
+
+def _batch_features(graphs: Sequence[EventGraph], D: int, iterations: int, vocab=None, hash_family=None):
+    """Structural and attribute features of a batch, before they are combined into fingerprints.
+
+    Returns the sorted unique structural keys (graph * D + slot), then the
+    owning graph, full hash and weight of every attribute feature in visit order.
+    """
+    packed = _pack_graphs(graphs)
+    node_graph = packed[1]
+    triples, attr_graph, attr_triple, attr_weight = packed[4:]
+
+    fam = get_hash_family(hash_family, vocab)
+    struct_keys = []
+    for labels, hashes in _iter_batch_labels(packed, iterations, hash_family=fam):
+        slots = np.asarray([lab % D for lab in hashes], dtype=np.int64)
+        struct_keys.append(node_graph * D + slots[labels])
+    struct_keys = np.unique(np.concatenate(struct_keys))
+
+    triple_hashes = [fam.key(t) for t in triples]
+    attr_hashes = [triple_hashes[t] for t in attr_triple.tolist()]
+    return struct_keys, attr_graph, attr_hashes, attr_weight
+
+def _batch_slots(graphs: Sequence[EventGraph], D: int, iterations: int, vocab=None, hash_family=None):
+    """Final (graph * D + slot) keys, sorted, and their float32 values for a batch."""
+    keys, attr_graph, attr_hashes, attr_weight = _batch_features(graphs, D, iterations, vocab, hash_family)
+
+    # structural contribution
+    values = np.ones(len(keys), dtype=np.float32)
+
+    # attribute contribution: later features overwrite earlier ones, as in the per-graph loop
+    if attr_hashes:
+        attr_slots = np.asarray([fh % D for fh in attr_hashes], dtype=np.int64)
+        keys = np.concatenate([keys, attr_graph * D + attr_slots])
+        values = np.concatenate([values, attr_weight])
+        keys, last = np.unique(keys[::-1], return_index=True)
+        values = values[::-1][last]
+
+    return keys, values
+
+@instrumentation.timed("wl.graphs_to_fingerprints")
+def graphs_to_fingerprints(graphs: Sequence[EventGraph], D: int = 1024, iterations: int = 3,
+                           vocab=None, sparse: bool = False, hash_family=None):
+    """Fingerprint a batch of `EventGraph`s and/or `FrozenEventGraph`s.
+
+    Row i equals `graph_to_fingerprint(graphs[i], D, iterations)`.
+
+    The batch is packed into one disjoint-union graph and relabelled with
+    vectorized NumPy, hashing each distinct WL signature once per iteration.
+    Returns a float32 matrix of shape (len(graphs), D), or with `sparse=True`
+    a float32 `scipy.sparse.csr_matrix`, which never materializes the dense
+    rows and so suits large `D`. Pass a shared `LabelVocabulary` as `vocab`
+    to memoize hashing across batches, or `hash_family="splitmix64"` for the
+    much faster integer hashing of `SplitMixFamily`.
+    """
+    keys, values = _batch_slots(graphs, D, iterations, vocab, hash_family)
+    rows, cols = np.divmod(keys, D)
+    if sparse:
+        return csr_from_coo(rows, cols, values, (len(graphs), D))
+    fingerprints = np.zeros((len(graphs), D), dtype=np.float32)
+    fingerprints[rows, cols] = values
+    return fingerprints
@@ -0,0 +1,189 @@
+"""Seeded benchmarks for the sampler, WL fingerprinting, DAG edits and search.
+
+    python -m lib.benchmark --out bench.json               # default sweep
+    python -m lib.benchmark --quick --out bench.json       # small sweep, seconds
+    python -m lib.benchmark --compare old.json new.json    # per-benchmark speedups
+
+Every benchmark draws its inputs from `--seed`, so two runs of the same
+commit time identical work and results are comparable between machines.
+Each timing is the best of `--repeat` runs.
+"""
+from __future__ import annotations
+import argparse, json, platform, random, subprocess, sys, time
+from itertools import product
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+import numpy as np
+from classes.event_graph import EventGraph
+from classes.event_node import EventNode
+from lib.WL2vec import graph_to_fingerprint, graphs_to_fingerprints
+from lib.hnsw import HNSWIndex
+from lib.local_index import FingerprintIndex
+from lib.noise_sampler import generate_noise_graphs
+
+RULES_PATH = Path(__file__).parent / "sampling_rules.json"
+
+SWEEPS = {
+    "default": {"max_events": [20, 80, 200], "corpus": [1_000, 10_000], "iterations": [1, 3, 5],
+                "D": [256, 1024, 4096], "dag_nodes": [100, 1_000], "queries": 200},
+    "quick": {"max_events": [20, 80], "corpus": [500], "iterations": [3], "D": [1024],
+              "dag_nodes": [100], "queries": 50},
+}
+
+# main metric per benchmark for --compare; lower is better
+PRIMARY = {"generate": "sec_per_graph", "fingerprint": "sec_per_graph", "fingerprint_batch": "sec_per_graph",
+           "add_edge": "sec_per_edge", "query": "p50_ms"}
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def _percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    ms = np.asarray(samples) * 1e3
+    return {"p50_ms": float(np.percentile(ms, 50)), "p99_ms": float(np.percentile(ms, 99)),
+            "mean_ms": float(ms.mean()), "max_ms": float(ms.max())}
+
+def _corpus(n: int, max_events: int, seed: int) -> List[EventGraph]:
+    return generate_noise_graphs(n, max_events, str(RULES_PATH), seed=seed)
+
+# ---- benchmarks ----
+def bench_generate(n: int, max_events: int, seed: int, repeat: int) -> Dict[str, float]:
+    sec = best_of(lambda: _corpus(n, max_events, seed), repeat)
+    return {"seconds": sec, "sec_per_graph": sec / n, "graphs_per_sec": n / sec}
+
+def bench_fingerprint(graphs: List[EventGraph], D: int, iterations: int, repeat: int) -> Dict[str, float]:
+    sec = best_of(lambda: [graph_to_fingerprint(g, D, iterations) for g in graphs], repeat)
+    nodes = sum(len(g.nodes) for g in graphs)
+    return {"seconds": sec, "sec_per_graph": sec / len(graphs), "nodes_per_sec": nodes / sec}
+
+def bench_fingerprint_batch(graphs: List[EventGraph], D: int, iterations: int, repeat: int) -> Dict[str, float]:
+    sec = best_of(lambda: graphs_to_fingerprints(graphs, D, iterations), repeat)
+    return {"seconds": sec, "sec_per_graph": sec / len(graphs), "graphs_per_sec": len(graphs) / sec}
+
+def bench_add_edge(n_nodes: int, seed: int, repeat: int, edges_per_node: int = 3) -> Dict[str, float]:
+    """Random DAG: forward edges u < v are accepted, back edges v -> u are rejected by the cycle check."""
+    rng = random.Random(seed)
+    sources = [rng.randrange(n_nodes - 1) for _ in range(edges_per_node * n_nodes)]
+    forward = [(u, rng.randrange(u + 1, n_nodes)) for u in sources]
+    backward = [(v, u) for u, v in rng.sample(forward, min(len(forward), n_nodes))]
+
+    def build():
+        g = EventGraph()
+        nodes = [EventNode("started_school", {}) for _ in range(n_nodes)]
+        for node in nodes:
+            g.add_node(node)
+        t0 = time.perf_counter()
+        for u, v in forward:
+            g.add_edge(nodes[u], nodes[v])
+        t1 = time.perf_counter()
+        for u, v in backward:
+            try:
+                g.add_edge(nodes[u], nodes[v])
+            except ValueError:
+                pass
+        return t1 - t0, time.perf_counter() - t1
+
+    runs = [build() for _ in range(repeat)]
+    accept = min(r[0] for r in runs)
+    reject = min(r[1] for r in runs)
+    return {"edges": len(forward), "sec_per_edge": accept / len(forward),
+            "rejected": len(backward), "sec_per_rejected_edge": reject / max(1, len(backward))}
+
+def bench_query(fingerprints: np.ndarray, queries: np.ndarray, index: str = "flat",
+                top_k: int = 10) -> Dict[str, float]:
+    ids = [str(i) for i in range(len(fingerprints))]
+    t0 = time.perf_counter()
+    idx = FingerprintIndex(fingerprints.shape[1]) if index == "flat" else HNSWIndex(fingerprints.shape[1])
+    idx.upsert(dict(zip(ids, fingerprints)))
+    build = time.perf_counter() - t0
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        idx.query(q, top_k, include_metadata=False)
+        latencies.append(time.perf_counter() - t0)
+    return {"build_seconds": build, **_percentiles(latencies)}
+
+# ---- sweep ----
+def run(sweep: Dict, seed: int = 1337, repeat: int = 3, hnsw: bool = False,
+        log: Optional[Callable[[str], None]] = print) -> Dict:
+    results: List[Dict] = []
+
+    def record(bench: str, params: Dict, metrics: Dict) -> None:
+        results.append({"bench": bench, "params": params, "metrics": metrics})
+        if log:
+            log(f"{bench:<18} {json.dumps(params):<55} {PRIMARY[bench]}={metrics[PRIMARY[bench]]:.3g}")
+
+    small = min(sweep["corpus"])
+    for max_events in sweep["max_events"]:
+        record("generate", {"n": small, "max_events": max_events},
+               bench_generate(small, max_events, seed, repeat))
+        graphs = _corpus(small, max_events, seed)
+        for D, iterations in product(sweep["D"], sweep["iterations"]):
+            params = {"n": small, "max_events": max_events, "D": D, "iterations": iterations}
+            record("fingerprint", params, bench_fingerprint(graphs, D, iterations, repeat))
+            record("fingerprint_batch", params, bench_fingerprint_batch(graphs, D, iterations, repeat))
+
+    for n_nodes in sweep["dag_nodes"]:
+        record("add_edge", {"n_nodes": n_nodes}, bench_add_edge(n_nodes, seed, repeat))
+
+    rng = np.random.default_rng(seed)
+    max_events = sweep["max_events"][len(sweep["max_events"]) // 2]
+    for n, D in product(sweep["corpus"], sweep["D"]):
+        fps = graphs_to_fingerprints(_corpus(n, max_events, seed), D)
+        queries = fps[rng.choice(n, size=sweep["queries"], replace=n < sweep["queries"])]
+        for index in ("flat", "hnsw") if hnsw else ("flat",):
+            record("query", {"n": n, "max_events": max_events, "D": D, "index": index},
+                   bench_query(fps, queries, index))
+    return {"meta": _meta(seed, repeat), "results": results}
+
+def _meta(seed: int, repeat: int) -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "seed": seed, "repeat": repeat, "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine()}
+
+def compare(old: Dict, new: Dict) -> List[Dict]:
+    """Speedup (old / new of the primary metric; > 1 is faster) of every benchmark present in both runs."""
+    key = lambda r: (r["bench"], json.dumps(r["params"], sort_keys=True))
+    before = {key(r): r for r in old["results"]}
+    rows = []
+    for r in new["results"]:
+        o = before.get(key(r))
+        if o is None:
+            continue
+        metric = PRIMARY[r["bench"]]
+        a, b = o["metrics"][metric], r["metrics"][metric]
+        rows.append({"bench": r["bench"], "params": r["params"], "metric": metric,
+                     "old": a, "new": b, "speedup": a / b if b else float("inf")})
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="small sweep")
+    parser.add_argument("--seed", type=int, default=1337)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--hnsw", action="store_true", help="also time HNSWIndex queries (slow to build)")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files")
+    args = parser.parse_args()
+
+    if args.compare:
+        old, new = (json.load(open(p)) for p in args.compare)
+        for row in compare(old, new):
+            print(f"{row['bench']:<18} {json.dumps(row['params']):<55} {row['metric']:<14} "
+                  f"{row['old']:.3g} -> {row['new']:.3g}  x{row['speedup']:.2f}")
+        sys.exit(0)
+
+    report = run(SWEEPS["quick" if args.quick else "default"], args.seed, args.repeat, args.hnsw)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
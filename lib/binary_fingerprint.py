@@ -0,0 +1,177 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from lib import instrumentation
+from classes.event_graph import EventGraph
+from lib.WL2vec import WL_neighborhood_label, attributes_hash, _batch_features
+from lib.local_index import Match, QueryResult, _top_k
+
+# attribute weights are quantized to 1..ATTR_LEVELS bits per feature
+ATTR_LEVELS = 4
+
+def attr_level(weight: float) -> int:
+    """Number of bits an attribute feature of `weight` sets (at least 1)."""
+    return max(1, min(ATTR_LEVELS, int(round(weight * ATTR_LEVELS))))
+
+def _attr_bits(feat_hash: int, weight: float, A: int) -> List[int]:
+    # one 16-bit chunk of the 128-bit feature hash per quantization level
+    return [(feat_hash >> (16 * j)) % A for j in range(attr_level(weight))]
+
+def _pack(bits: np.ndarray) -> np.ndarray:
+    """(n, D) bool -> (n, D/64) uint64, bit i of a row in word i // 64."""
+    return np.packbits(bits, axis=1, bitorder="little").view("<u8")
+
+if hasattr(np, "bitwise_count"):
+    def popcount(words: np.ndarray) -> np.ndarray:
+        """Set bits per row of a packed (n, W) uint64 matrix."""
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+else:
+    _BYTE_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount(words: np.ndarray) -> np.ndarray:
+        """Set bits per row of a packed (n, W) uint64 matrix."""
+        return _BYTE_COUNTS[words.view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+
+@dataclass(frozen=True)
+class BinaryFingerprint:
+    """Structural WL features as D packed bits plus an A-bit quantized attribute code.
+
+    Each attribute feature sets `attr_level(weight)` bits of the code, so
+    heavier attributes (see `data/attribute_weights.py`) count for more in
+    the Tanimoto overlap.
+    """
+    bits: np.ndarray       # uint64, D / 64 words
+    attr_bits: np.ndarray  # uint64, A / 64 words
+
+    @property
+    def words(self) -> np.ndarray:
+        """Structural words followed by attribute words, the row layout of `BinaryIndex`."""
+        return np.concatenate([self.bits, self.attr_bits])
+
+def _check_sizes(D: int, A: int) -> None:
+    if D % 64 or A % 64:
+        raise ValueError(f"D and A must be multiples of 64, got D={D}, A={A}")
+
+def graph_to_binary_fingerprint(graph: EventGraph, D: int = 1024, A: int = 128, iterations: int = 3,
+                                vocab=None, hash_family=None) -> BinaryFingerprint:
+    _check_sizes(D, A)
+    bits = np.zeros((1, D), dtype=bool)
+    for labels in WL_neighborhood_label(graph, iterations, vocab=vocab, hash_family=hash_family):
+        for feat in labels.values():
+            bits[0, feat % D] = True
+    attr = np.zeros((1, A), dtype=bool)
+    for feat_hash, weight in attributes_hash(graph, vocab=vocab, hash_family=hash_family):
+        attr[0, _attr_bits(feat_hash, weight, A)] = True
+    return BinaryFingerprint(_pack(bits)[0], _pack(attr)[0])
+
+def graphs_to_binary_fingerprints(graphs: Sequence[EventGraph], D: int = 1024, A: int = 128, iterations: int = 3,
+                                  vocab=None, hash_family=None) -> np.ndarray:
+    """Packed (len(graphs), (D + A) / 64) uint64 matrix.
+
+    Row i equals `graph_to_binary_fingerprint(graphs[i], D, A, iterations, hash_family=hash_family).words`.
+    """
+    _check_sizes(D, A)
+    struct_keys, attr_graph, attr_hashes, attr_weight = _batch_features(graphs, D, iterations, vocab, hash_family)
+    bits = np.zeros((len(graphs), D), dtype=bool)
+    rows, cols = np.divmod(struct_keys, D)
+    bits[rows, cols] = True
+    attr = np.zeros((len(graphs), A), dtype=bool)
+    for gi, feat_hash, weight in zip(attr_graph.tolist(), attr_hashes, attr_weight.tolist()):
+        attr[gi, _attr_bits(feat_hash, weight, A)] = True
+    return np.ascontiguousarray(np.concatenate([_pack(bits), _pack(attr)], axis=1))
+
+
+class BinaryIndex:
+    """Local Tanimoto (Jaccard) search over packed binary fingerprints.
+
+    Rows are kept in one contiguous uint64 matrix with cached popcounts; a
+    query ANDs it against every row in chunks and ranks by
+    |a & b| / (|a| + |b| - |a & b|).
+    """
+
+    def __init__(self, words: int = (1024 + 128) // 64, capacity: int = 1024, chunk_rows: int = 1 << 16) -> None:
+        self.words = words
+        self.chunk_rows = chunk_rows
+        self._capacity = capacity
+        self._matrix = np.zeros((0, words), dtype=np.uint64)
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._metadata: List[Optional[Dict]] = []
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._matrix[:len(self._ids)]
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes
+
+    # ---- core API ----
+    def upsert(self, fingerprints: Dict[str, BinaryFingerprint], metadata: Optional[Dict] = None) -> None:
+        self.add(list(fingerprints), np.asarray([fp.words for fp in fingerprints.values()]), metadata)
+
+    def add(self, ids: Sequence[str], packed: np.ndarray, metadata: Optional[Dict] = None) -> None:
+        """Insert or overwrite rows from a packed matrix such as `graphs_to_binary_fingerprints` returns."""
+        if not len(ids):
+            return
+        packed = np.asarray(packed, dtype=np.uint64).reshape(len(ids), -1)
+        if packed.shape[1] != self.words:
+            raise ValueError(f"Expected {self.words} words per fingerprint, got {packed.shape[1]}")
+        rows = np.empty(len(ids), dtype=np.int64)
+        for i, fid in enumerate(ids):
+            row = self._rows.get(fid)
+            if row is None:
+                row = len(self._ids)
+                self._rows[fid] = row
+                self._ids.append(fid)
+                self._metadata.append(None)
+            self._metadata[row] = dict(metadata) if metadata is not None else None
+            rows[i] = row
+        self._ensure_capacity(len(self._ids))
+        self._matrix[rows] = packed
+        self._counts[rows] = popcount(packed)
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Tanimoto similarity of packed `query` words against every row."""
+        q = np.asarray(query, dtype=np.uint64)
+        q_count = int(popcount(q[None, :])[0])
+        n = len(self._ids)
+        inter = np.empty(n, dtype=np.int64)
+        for start in range(0, n, self.chunk_rows):
+            block = self._matrix[start:min(start + self.chunk_rows, n)]
+            inter[start:start + len(block)] = popcount(block & q)
+        union = self._counts[:n] + q_count - inter
+        return np.divide(inter, union, out=np.zeros(n, dtype=np.float64), where=union > 0)
+
+    @instrumentation.timed("query.binary", histogram=True)
+    def query(self, fingerprint, top_k: int = 100, include_metadata: bool = True) -> QueryResult:
+        """Return the `top_k` rows by Tanimoto similarity, best first.
+
+        `fingerprint` is a `BinaryFingerprint` or a row of packed words.
+        """
+        if not self._ids:
+            return QueryResult()
+        words = fingerprint.words if isinstance(fingerprint, BinaryFingerprint) else fingerprint
+        scores = self.scores(words)
+        return QueryResult([
+            Match(id=self._ids[row], score=float(scores[row]),
+                  metadata=self._metadata[row] if include_metadata else None)
+            for row in _top_k(scores, top_k)
+        ])
+
+    # ---- internal ----
+    def _ensure_capacity(self, n: int) -> None:
+        if n <= self._matrix.shape[0]:
+            return
+        capacity = max(self._capacity, n, 2 * self._matrix.shape[0])
+        grown = np.zeros((capacity, self.words), dtype=np.uint64)
+        grown[:self._matrix.shape[0]] = self._matrix
+        counts = np.zeros(capacity, dtype=np.int64)
+        counts[:len(self._counts)] = self._counts
+        self._matrix, self._counts = grown, counts
@@ -0,0 +1,261 @@
+"""Content-addressed fingerprint cache and deduplicating index.
+
+    cache = FingerprintCache(D=1024, iterations=3, capacity=100_000)
+    matrix = cache.fingerprints(graphs)          # duplicates are hashed once
+
+    index = DedupIndex(FingerprintIndex(1024))
+    index.upsert_graphs({str(i): g for i, g in enumerate(graphs)})
+    index.resolve("17")                          # id of the stored copy
+    index.query(fp).matches[0].metadata          # {"count": 412}
+
+The canonical hash of a graph is blake2b over its sorted final WL labels and
+its sorted attribute-triple hashes, computed with the vectorized
+`SplitMixFamily`, so it ignores node uuids and insertion order and costs a
+fraction of a blake2b fingerprint. Graphs with equal hashes at `iterations`
+have the same WL features and the same attribute features, but not always
+bit-identical fingerprints: when two attribute triples with different
+weights collide in one slot mod D, the fingerprint keeps the weight of the
+later node, so it depends on node order. The cache and `DedupIndex` then
+hand out the first copy's vector, which differs from the other copy's in
+that slot only.
+"""
+from __future__ import annotations
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+import numpy as np
+from classes.event_graph import EventGraph
+from lib import instrumentation
+from lib.WL2vec import _iter_batch_labels, _pack_graphs, get_hash_family, graphs_to_fingerprints
+from lib.local_index import QueryResult
+from lib.sparse_fingerprint import Fingerprint
+
+
+# ---- canonical hashing ----
+@instrumentation.timed("dedup.canonical_hashes")
+def canonical_hashes(graphs: Sequence[EventGraph], iterations: int = 3) -> List[str]:
+    """Hex canonical content hash of every graph (`EventGraph` or `FrozenEventGraph`)."""
+    packed = _pack_graphs(graphs)
+    node_graph = packed[1]
+    triples, attr_graph, attr_triple = packed[4:7]
+    fam = get_hash_family("splitmix64")
+
+    *_, (labels, hashes) = _iter_batch_labels(packed, iterations, hash_family=fam)
+    final = np.asarray(hashes, dtype=np.uint64)[labels]
+    attrs = np.asarray([fam.key(t) for t in triples], dtype=np.uint64)[attr_triple]
+
+    # sort within each graph; node_graph and attr_graph are already non-decreasing
+    final = final[np.lexsort((final, node_graph))]
+    attrs = attrs[np.lexsort((attrs, attr_graph))]
+    node_start = np.searchsorted(node_graph, np.arange(len(graphs) + 1))
+    attr_start = np.searchsorted(attr_graph, np.arange(len(graphs) + 1))
+
+    keys = []
+    for gi in range(len(graphs)):
+        a, b = node_start[gi], node_start[gi + 1]
+        c, d = attr_start[gi], attr_start[gi + 1]
+        h = hashlib.blake2b(digest_size=16)
+        h.update(np.asarray([b - a, d - c], dtype="<u8").tobytes())
+        h.update(final[a:b].astype("<u8").tobytes())
+        h.update(attrs[c:d].astype("<u8").tobytes())
+        keys.append(h.hexdigest())
+    return keys
+
+def canonical_hash(graph: EventGraph, iterations: int = 3) -> str:
+    return canonical_hashes([graph], iterations)[0]
+
+
+# ---- cache ----
+class FingerprintCache:
+    """Bounded canonical hash -> fingerprint memo for one D / iterations / hash family.
+
+    Entries are keyed by (canonical hash, D, iterations, hash scheme), so
+    changing any of those attributes never hands out a stale vector. At most
+    `capacity` fingerprints are kept, least recently used first out. A
+    shared `vocab` is passed through to `graphs_to_fingerprints` for misses.
+    """
+
+    def __init__(self, D: int = 1024, iterations: int = 3, capacity: int = 100_000, vocab=None,
+                 hash_family=None) -> None:
+        self.D = D
+        self.iterations = iterations
+        self.capacity = capacity
+        self.vocab = vocab
+        self.hash_family = hash_family
+        self._cache: "OrderedDict[Tuple[str, int, int, str], np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @property
+    def hash_scheme(self) -> str:
+        """Name of the hash family, as recorded by `FingerprintStore`."""
+        return get_hash_family(self.hash_family, self.vocab).name
+
+    def _entry(self, key: str) -> Tuple[str, int, int, str]:
+        return key, self.D, self.iterations, self.hash_scheme
+
+    def __contains__(self, key: str) -> bool:
+        return self._entry(key) in self._cache
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        entry = self._entry(key)
+        fp = self._cache.get(entry)
+        if fp is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._cache.move_to_end(entry)
+        return fp
+
+    def put(self, key: str, fingerprint: np.ndarray) -> None:
+        if self.capacity <= 0:
+            return
+        entry = self._entry(key)
+        self._cache[entry] = fingerprint
+        self._cache.move_to_end(entry)
+        if len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+
+    def fingerprints(self, graphs: Sequence[EventGraph], keys: Optional[Sequence[str]] = None) -> np.ndarray:
+        """`graphs_to_fingerprints(graphs, D, iterations)`, hashing each distinct uncached graph once.
+
+        `keys` are the graphs' `canonical_hashes` at `iterations`, if already known.
+        """
+        if keys is None:
+            keys = canonical_hashes(graphs, self.iterations)
+        out = np.empty((len(graphs), self.D), dtype=np.float32)
+        todo: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            fp = self.get(key) if key not in todo else None
+            if fp is not None:
+                out[i] = fp
+            else:
+                todo.setdefault(key, []).append(i)
+        if todo:
+            first = [rows[0] for rows in todo.values()]
+            fresh = graphs_to_fingerprints([graphs[i] for i in first], self.D, self.iterations, self.vocab,
+                                           hash_family=self.hash_family)
+            for (key, rows), fp in zip(todo.items(), fresh):
+                out[rows] = fp
+                self.put(key, fp)
+        if instrumentation.enabled:
+            instrumentation.count("dedup.cache_hits", len(graphs) - len(todo))
+            instrumentation.count("dedup.graphs_hashed", len(todo))
+        return out
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# ---- deduplicating index ----
+class DedupIndex:
+    """Store each distinct graph once in `index`, under the first id seen with that content.
+
+    `index` is anything with the `upsert(dict, metadata)` / `query` contract
+    (`FingerprintIndex`, `HNSWIndex`, `lib.pinecone`). Later ids with the same
+    canonical hash are recorded as duplicates of the stored one, and its
+    metadata carries `count`, the number of ids sharing the vector; count
+    updates re-upsert the vector from `cache`, hashing nothing. An id keeps
+    the content it was first upserted with. Duplicates get the first copy's
+    vector, which can differ from their own fingerprint in colliding
+    attribute slots (see the module docstring).
+    """
+
+    def __init__(self, index, D: int = 1024, iterations: int = 3, cache: Optional[FingerprintCache] = None,
+                 cache_size: int = 100_000, vocab=None, hash_family=None) -> None:
+        self.index = index
+        self.cache = cache if cache is not None else FingerprintCache(D, iterations, cache_size, vocab, hash_family)
+        scheme = get_hash_family(hash_family, vocab).name
+        if (self.cache.D, self.cache.iterations, self.cache.hash_scheme) != (D, iterations, scheme):
+            raise ValueError(f"cache fingerprints D={self.cache.D}, iterations={self.cache.iterations}, "
+                             f"hash_family={self.cache.hash_scheme!r}; "
+                             f"wanted D={D}, iterations={iterations}, hash_family={scheme!r}")
+        self.D = D
+        self.iterations = iterations
+        self._key_of: Dict[str, str] = {}          # id -> canonical hash
+        self._members: Dict[str, List[str]] = {}   # canonical hash -> ids, stored id first
+        self._metadata: Dict[str, Optional[Dict]] = {}
+
+    def __len__(self) -> int:
+        """Number of stored (distinct) vectors."""
+        return len(self._members)
+
+    def __contains__(self, fid: str) -> bool:
+        return fid in self._key_of
+
+    def upsert_graphs(self, graphs: Mapping[str, EventGraph], metadata: Optional[Dict] = None) -> int:
+        """Index a batch of graphs by id; returns how many new vectors were stored.
+
+        `metadata` is attached to vectors first stored by this call.
+        """
+        ids = list(graphs)
+        values = list(graphs.values())
+        keys = canonical_hashes(values, self.iterations)
+
+        touched: Dict[str, int] = {}   # canonical hash -> a row of this batch with that content
+        fresh = 0
+        for i, (fid, key) in enumerate(zip(ids, keys)):
+            old = self._key_of.get(fid)
+            if old is not None:
+                if old != key:
+                    raise ValueError(f"Id {fid!r} is already indexed with different content")
+                continue
+            self._key_of[fid] = key
+            members = self._members.get(key)
+            if members is None:
+                members = self._members[key] = []
+                self._metadata[key] = metadata
+                fresh += 1
+            members.append(fid)
+            touched.setdefault(key, i)
+        if instrumentation.enabled:
+            instrumentation.count("dedup.graphs", len(ids))
+            instrumentation.count("dedup.stored", fresh)
+        if not touched:
+            return fresh
+
+        matrix = self.cache.fingerprints([values[i] for i in touched.values()], list(touched))
+        # one upsert per distinct (metadata, count), since metadata applies to a whole call
+        groups: Dict[tuple, Dict[str, np.ndarray]] = {}
+        for key, fp in zip(touched, matrix):
+            members = self._members[key]
+            groups.setdefault((id(self._metadata[key]), len(members)), {})[members[0]] = fp
+        for (_, count), batch in groups.items():
+            base = self._metadata[self._key_of[next(iter(batch))]]
+            self.index.upsert(batch, {**(base or {}), "count": count})
+        return fresh
+
+    def resolve(self, fid: str) -> str:
+        """Id under which `fid`'s vector is stored."""
+        return self._members[self._key_of[fid]][0]
+
+    def duplicates(self, fid: str) -> List[str]:
+        """Every id sharing `fid`'s vector, the stored one first."""
+        return list(self._members[self._key_of[fid]])
+
+    def count(self, fid: str) -> int:
+        return len(self._members[self._key_of[fid]])
+
+    def canonical_hash(self, fid: str) -> str:
+        return self._key_of[fid]
+
+    def query(self, fingerprint: Fingerprint, top_k: int = 100, include_metadata: bool = True) -> QueryResult:
+        """Query the wrapped index; matches are stored ids, one per distinct graph."""
+        return self.index.query(fingerprint, top_k, include_metadata=include_metadata)
+
+    def stats(self) -> Dict[str, float]:
+        ids = len(self._key_of)
+        return {"ids": ids, "vectors": len(self._members), "duplicates": ids - len(self._members),
+                "cache": self.cache.stats()}
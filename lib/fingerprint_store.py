@@ -0,0 +1,268 @@
+"""On-disk fingerprint store: an append-only matrix reopened with `mmap` instead of rehashing.
+
+A store is a directory holding
+
+    header.json   D, iterations, hash scheme, rule-set checksum, row count
+    vectors.bin   raw row-major matrix: float32 (D columns) or packed uint64 words
+    ids.txt       one fingerprint id per line, in row order
+
+    store = FingerprintStore.create("corpus.fps", D=1024, iterations=3,
+                                    rules_checksum=rules_checksum(RULES_PATH))
+    store.append_graphs({str(i): g for i, g in enumerate(graphs)})
+    ...
+    store = FingerprintStore.open("corpus.fps")   # no hashing, no copy
+    index = store.to_index()
+"""
+from __future__ import annotations
+import json, os
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+import numpy as np
+from classes.event_graph import EventGraph
+from lib.WL2vec import SplitMixFamily, get_hash_family, graphs_to_fingerprints
+from lib.binary_fingerprint import BinaryFingerprint, BinaryIndex, graphs_to_binary_fingerprints
+from lib.local_index import FingerprintIndex, _normalize_rows
+from lib.sparse_fingerprint import Fingerprint, as_dense
+
+FORMAT_VERSION = 1
+_HEADER, _VECTORS, _IDS = "header.json", "vectors.bin", "ids.txt"
+_DTYPES = {"dense": np.dtype("<f4"), "binary": np.dtype("<u8")}
+
+
+class StoreMismatch(ValueError):
+    """The store on disk was built with different parameters than requested."""
+
+
+class FingerprintStore:
+    """Append-only fingerprint matrix backed by a memory-mapped file.
+
+    `kind="dense"` rows are float32 fingerprints of length D; `kind="binary"`
+    rows are the packed words of `lib.binary_fingerprint` ((D + A) / 64 each).
+    The header row count is written last on every append, so a crash mid-write
+    leaves the previous contents readable. Appending an id that is already
+    stored overwrites its row in place. With `normalized=True` dense rows are
+    stored L2-normalized, so `to_index` can search the mapping without a copy.
+    """
+
+    def __init__(self, path: Union[str, Path], header: Dict[str, Any], ids: List[str], writable: bool) -> None:
+        self.path = Path(path)
+        self.header = header
+        self.writable = writable
+        self._ids = ids
+        self._rows = {fid: row for row, fid in enumerate(ids)}
+        self._matrix: Optional[np.ndarray] = None
+
+    # ---- create / open ----
+    @classmethod
+    def create(cls, path: Union[str, Path], D: int = 1024, iterations: int = 3, kind: str = "dense",
+               A: int = 128, rules_checksum: Optional[str] = None, normalized: bool = False,
+               overwrite: bool = False, hash_family=None, **info) -> "FingerprintStore":
+        """Start an empty store. Extra keyword arguments (e.g. seed, max_events) are kept in the header.
+
+        `hash_family` (see `lib.WL2vec.get_hash_family`) is recorded by name and
+        used by `append_graphs`.
+        """
+        if kind not in _DTYPES:
+            raise ValueError(f"kind must be one of {sorted(_DTYPES)}, got {kind!r}")
+        path = Path(path)
+        if (path / _HEADER).exists() and not overwrite:
+            raise FileExistsError(f"{path} already holds a fingerprint store")
+        path.mkdir(parents=True, exist_ok=True)
+        width = D if kind == "dense" else (D + A) // 64
+        header = {
+            "format": FORMAT_VERSION, "kind": kind, "dtype": _DTYPES[kind].str, "width": width,
+            "D": D, "A": A if kind == "binary" else None, "iterations": iterations,
+            "hash_scheme": get_hash_family(hash_family).name, "rules_checksum": rules_checksum,
+            "normalized": normalized and kind == "dense", "count": 0, "ids_bytes": 0, "info": info,
+        }
+        for name in (_VECTORS, _IDS):
+            open(path / name, "wb").close()
+        store = cls(path, header, [], writable=True)
+        store._write_header()
+        return store
+
+    @classmethod
+    def open(cls, path: Union[str, Path], writable: bool = False) -> "FingerprintStore":
+        """Map an existing store; only the header and the id list are read eagerly."""
+        path = Path(path)
+        with open(path / _HEADER) as f:
+            header = json.load(f)
+        if header.get("format") != FORMAT_VERSION:
+            raise StoreMismatch(f"Unsupported store format {header.get('format')!r}")
+        with open(path / _IDS, "rb") as f:
+            text = f.read(header["ids_bytes"]).decode("utf-8")
+        ids = text.split("\n")[:-1] if text else []
+        return cls(path, header, ids, writable)
+
+    @classmethod
+    def open_or_build(cls, path: Union[str, Path], graphs: Union[Mapping[str, EventGraph],
+                      Callable[[], Mapping[str, EventGraph]]], D: int = 1024, iterations: int = 3,
+                      kind: str = "dense", A: int = 128, rules_checksum: Optional[str] = None,
+                      normalized: bool = False, batch_size: int = 4096, hash_family=None,
+                      **info) -> "FingerprintStore":
+        """Reopen the store at `path` if it matches these parameters, else rebuild it from `graphs`.
+
+        `graphs` may be a callable so the corpus is only generated on a miss.
+        """
+        try:
+            store = cls.open(path)
+            store.check(D, iterations, kind=kind, A=A, rules_checksum=rules_checksum, hash_family=hash_family,
+                        **info)
+            return store
+        except (FileNotFoundError, StoreMismatch):
+            pass
+        store = cls.create(path, D, iterations, kind, A, rules_checksum, normalized, overwrite=True,
+                           hash_family=hash_family, **info)
+        store.append_graphs(graphs() if callable(graphs) else graphs, batch_size=batch_size)
+        return store
+
+    def check(self, D: int, iterations: int, kind: str = "dense", A: int = 128,
+              rules_checksum: Optional[str] = None, hash_family=None, **info) -> None:
+        """Raise `StoreMismatch` unless the store was built with these parameters."""
+        h = self.header
+        expected = {"D": D, "iterations": iterations, "kind": kind, "hash_scheme": get_hash_family(hash_family).name,
+                    "rules_checksum": rules_checksum}
+        if kind == "binary":
+            expected["A"] = A
+        diffs = [f"{k}: stored {h.get(k)!r}, wanted {v!r}" for k, v in expected.items() if h.get(k) != v]
+        diffs += [f"info.{k}: stored {h['info'].get(k)!r}, wanted {v!r}"
+                  for k, v in info.items() if h["info"].get(k) != v]
+        if diffs:
+            raise StoreMismatch(f"{self.path}: " + "; ".join(diffs))
+
+    # ---- read ----
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, fid: str) -> bool:
+        return fid in self._rows
+
+    def __getitem__(self, fid: str) -> np.ndarray:
+        return self.matrix[self._rows[fid]]
+
+    @property
+    def ids(self) -> List[str]:
+        return self._ids
+
+    @property
+    def kind(self) -> str:
+        return self.header["kind"]
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """(len, width) memory-mapped view of every stored row; pages are read on first touch."""
+        if self._matrix is None:
+            n, width = self.header["count"], self.header["width"]
+            dtype = np.dtype(self.header["dtype"])
+            if n == 0:
+                self._matrix = np.zeros((0, width), dtype=dtype)
+            else:
+                self._matrix = np.memmap(self.path / _VECTORS, dtype=dtype, mode="r+" if self.writable else "r",
+                                         shape=(n, width))
+        return self._matrix
+
+    def row(self, fid: str) -> int:
+        return self._rows[fid]
+
+    def items(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[str, np.ndarray]]:
+        """(id, row) pairs in row order, e.g. to feed `lib.pinecone_bulk.bulk_upsert`."""
+        matrix = self.matrix
+        for row in range(start, len(self) if stop is None else min(stop, len(self))):
+            yield self._ids[row], matrix[row]
+
+    def to_index(self, metadata: Optional[Dict] = None):
+        """A `FingerprintIndex` (dense) or `BinaryIndex` (binary) over every stored row."""
+        if self.kind == "binary":
+            index = BinaryIndex(words=self.header["width"], capacity=max(1, len(self)))
+            index.add(self._ids, self.matrix, metadata)
+            return index
+        return FingerprintIndex.from_matrix(self._ids, self.matrix, metadata, normalized=self.header["normalized"])
+
+    # ---- write ----
+    def append(self, fingerprints: Union[Mapping[str, Union[Fingerprint, BinaryFingerprint]], Sequence[str]],
+               matrix: Optional[np.ndarray] = None) -> None:
+        """Append rows, given as an id -> fingerprint mapping or as ids plus a matching matrix."""
+        if matrix is None:
+            ids = list(fingerprints)
+            values = list(fingerprints.values())
+            if self.kind == "binary":
+                matrix = np.asarray([fp.words if isinstance(fp, BinaryFingerprint) else fp for fp in values])
+            else:
+                matrix = np.asarray([as_dense(fp) for fp in values])
+        else:
+            ids = list(fingerprints)
+        self._append(ids, matrix)
+
+    def append_graphs(self, graphs: Mapping[str, EventGraph], batch_size: int = 4096, vocab=None) -> None:
+        """Fingerprint `graphs` with the batch engine at this store's D / iterations / hash family and append them."""
+        ids = list(graphs)
+        values = list(graphs.values())
+        h = self.header
+        family = self._hash_family()
+        for start in range(0, len(ids), batch_size):
+            batch = values[start:start + batch_size]
+            if self.kind == "binary":
+                matrix = graphs_to_binary_fingerprints(batch, h["D"], h["A"], h["iterations"], vocab, family)
+            else:
+                matrix = graphs_to_fingerprints(batch, h["D"], h["iterations"], vocab, hash_family=family)
+            self._append(ids[start:start + batch_size], matrix)
+
+    def _hash_family(self):
+        scheme = self.header["hash_scheme"]
+        if scheme == get_hash_family().name:
+            return None
+        name, _, seed = scheme.partition("/")
+        if name != "splitmix64":
+            raise StoreMismatch(f"Unknown hash scheme {scheme!r}")
+        return SplitMixFamily(int(seed))
+
+    def _append(self, ids: List[str], matrix: np.ndarray) -> None:
+        if not self.writable:
+            raise PermissionError(f"{self.path} was opened read-only; pass writable=True")
+        dtype = np.dtype(self.header["dtype"])
+        width = self.header["width"]
+        matrix = np.ascontiguousarray(matrix, dtype=dtype).reshape(len(ids), -1)
+        if matrix.shape[1] != width:
+            raise ValueError(f"Expected rows of width {width}, got {matrix.shape[1]}")
+        for fid in ids:
+            if "\n" in fid:
+                raise ValueError(f"Fingerprint ids may not contain newlines: {fid!r}")
+        if self.header["normalized"]:
+            matrix = _normalize_rows(matrix)
+
+        # later duplicates within the call win, like dict assignment
+        last = {fid: i for i, fid in enumerate(ids)}
+        old = [(self._rows[fid], i) for fid, i in last.items() if fid in self._rows]
+        new = [(fid, i) for fid, i in last.items() if fid not in self._rows]
+        if old:
+            rows, src = map(list, zip(*old))
+            self.matrix[rows] = matrix[src]
+            self.matrix.flush()
+        if new:
+            count = self.header["count"]
+            with open(self.path / _VECTORS, "r+b") as f:
+                f.seek(count * width * dtype.itemsize)  # overwrite any torn tail past `count`
+                f.write(matrix[[i for _, i in new]].tobytes())
+                f.truncate()
+                os.fsync(f.fileno())
+            encoded = "".join(f"{fid}\n" for fid, _ in new).encode("utf-8")
+            with open(self.path / _IDS, "r+b") as f:
+                f.seek(self.header["ids_bytes"])
+                f.write(encoded)
+                f.truncate()
+                os.fsync(f.fileno())
+            for fid, _ in new:
+                self._rows[fid] = len(self._ids)
+                self._ids.append(fid)
+            self.header["count"] = count + len(new)
+            self.header["ids_bytes"] += len(encoded)
+            self._write_header()
+            self._matrix = None  # remap to the grown file on next access
+
+    def _write_header(self) -> None:
+        tmp = self.path / (_HEADER + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.header, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path / _HEADER)
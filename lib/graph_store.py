@@ -0,0 +1,265 @@
+"""Compact columnar file format for `EventGraph` corpora.
+
+    with GraphWriter("noise.egc", seed=1337) as w:
+        w.write_many(generate_noise_graphs(100_000, rules_json_path=RULES_PATH))
+    graphs = GraphReader("noise.egc")        # memory-mapped, decoded on demand
+    g = graphs[42]                           # FrozenEventGraph (frozen=False: EventGraph)
+    for chunk in graphs.iter_chunks(): ...
+
+Layout (all integers little-endian):
+
+    b"EGC1"
+    chunk*    graphs [i, i + chunk_size) as columns:
+              "<IIIIB" n_graphs, n_nodes, n_edges, n_attrs, index width (2 or 4 bytes)
+              u4 nodes per graph | i2 event type id per node | u4 out-degree per node
+              u2/u4 edge targets (node index within the graph) | u2 attributes per node
+              u4 attribute codes
+    footer    JSON: event type names by id, attribute dictionary [[name, value], ...],
+              chunk index [[byte offset, first graph, n_graphs], ...], graph count, info
+    trailer   "<QQ" footer offset, footer length, then b"EGC1"
+
+Event types are the interned ids of `classes.frozen_event_graph` (seeded from
+`data/event_types.py`); every distinct (attr_name, attr_value) pair is
+stored once in the dictionary. Node uuids are not stored: graphs come back
+with node indices (frozen) or fresh `EventNode`s (thawed).
+"""
+from __future__ import annotations
+import bisect, json, mmap, struct
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from classes.event_graph import EventGraph
+from classes.frozen_event_graph import FrozenEventGraph, event_type_name, intern_event_type
+
+MAGIC = b"EGC1"
+_CHUNK_HEAD = struct.Struct("<IIIIB")
+_TRAILER = struct.Struct("<QQ")
+_ATTR_TYPES = (str, int, float, bool, type(None))
+
+def _pad8(n: int) -> int:
+    return -n % 8
+
+
+class GraphWriter:
+    """Stream graphs to a `.egc` file, buffering at most one chunk of `chunk_size` graphs."""
+
+    def __init__(self, path: Union[str, Path], chunk_size: int = 1024, **info) -> None:
+        self.path = Path(path)
+        self.chunk_size = chunk_size
+        self.info = info
+        self._f = open(self.path, "wb")
+        self._f.write(MAGIC)
+        self._pos = len(MAGIC)
+        self._codes: Dict[Tuple[str, type, object], int] = {}
+        self._attrs: List[Tuple[str, object]] = []
+        self._chunks: List[Tuple[int, int, int]] = []
+        self._pending: List[FrozenEventGraph] = []
+        self._used_types: set = set()
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> "GraphWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def write(self, graph: Union[EventGraph, FrozenEventGraph]) -> int:
+        """Append one graph; returns its index in the file."""
+        self._pending.append(graph if isinstance(graph, FrozenEventGraph) else FrozenEventGraph.from_graph(graph))
+        self._count += 1
+        if len(self._pending) >= self.chunk_size:
+            self._flush()
+        return self._count - 1
+
+    def write_many(self, graphs: Iterable[Union[EventGraph, FrozenEventGraph]]) -> None:
+        for g in graphs:
+            self.write(g)
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        self._flush()
+        used = max(self._used_types, default=-1)
+        footer = json.dumps({
+            "types": [event_type_name(t) for t in range(used + 1)],
+            "attrs": self._attrs,
+            "chunks": self._chunks,
+            "count": self._count,
+            "info": self.info,
+        }).encode("utf-8")
+        self._f.write(footer)
+        self._f.write(_TRAILER.pack(self._pos, len(footer)) + MAGIC)
+        self._f.close()
+
+    def _code(self, item: Tuple[str, object]) -> int:
+        name, value = item
+        if not isinstance(value, _ATTR_TYPES):
+            raise TypeError(f"Attribute {name!r} has unsupported value type {type(value).__name__}")
+        key = (name, type(value), value)  # keep 1, 1.0 and True apart
+        code = self._codes.get(key)
+        if code is None:
+            code = self._codes[key] = len(self._attrs)
+            self._attrs.append(item)
+        return code
+
+    def _flush(self) -> None:
+        graphs, self._pending = self._pending, []
+        if not graphs:
+            return
+        node_counts = np.asarray([len(g) for g in graphs], dtype="<u4")
+        type_ids = np.concatenate([g.type_ids for g in graphs]).astype("<i2")
+        degrees = np.concatenate([np.diff(g.offsets) for g in graphs]).astype("<u4")
+        width = 2 if node_counts.max(initial=0) <= 1 << 16 else 4
+        targets = np.concatenate([g.targets for g in graphs]).astype(f"<u{width}")
+        attr_counts = np.concatenate([np.diff(g.attr_offsets) for g in graphs]).astype("<u2")
+        codes = np.asarray([self._code(item) for g in graphs for item in g.attr_items], dtype="<u4")
+        self._used_types.update(np.unique(type_ids).tolist())
+
+        parts = [_CHUNK_HEAD.pack(len(graphs), len(type_ids), len(targets), len(codes), width)]
+        for a in (node_counts, type_ids, degrees, targets, attr_counts, codes):
+            parts.append(a.tobytes())
+            parts.append(b"\0" * _pad8(a.nbytes))
+        data = b"".join(parts)
+        self._chunks.append((self._pos, self._count - len(graphs), len(graphs)))
+        self._f.write(data)
+        self._pos += len(data)
+
+
+class _Chunk:
+    """Decoded column views of one chunk, plus per-graph/per-node offsets."""
+
+    __slots__ = ("node_start", "type_ids", "edge_start", "targets", "attr_start", "codes")
+
+    def __init__(self, buf, offset: int, type_map: np.ndarray) -> None:
+        n_graphs, n_nodes, n_edges, n_attrs, width = _CHUNK_HEAD.unpack_from(buf, offset)
+        pos = offset + _CHUNK_HEAD.size
+        cols = []
+        for dtype, n in (("<u4", n_graphs), ("<i2", n_nodes), ("<u4", n_nodes), (f"<u{width}", n_edges),
+                         ("<u2", n_nodes), ("<u4", n_attrs)):
+            a = np.frombuffer(buf, dtype=dtype, count=n, offset=pos)
+            cols.append(a)
+            pos += a.nbytes + _pad8(a.nbytes)
+        node_counts, types, degrees, self.targets, attr_counts, self.codes = cols
+        self.node_start = _cumsum(node_counts)
+        self.type_ids = type_map[types]
+        self.edge_start = _cumsum(degrees)
+        self.attr_start = _cumsum(attr_counts)
+
+def _cumsum(counts: np.ndarray) -> np.ndarray:
+    out = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=out[1:])
+    return out
+
+
+class GraphReader:
+    """Random-access, memory-mapped reader of a `.egc` file; behaves like a read-only sequence.
+
+    Only the footer is parsed on open. Chunks are decoded on first access and
+    the `cache_chunks` most recently used are kept. `frozen=False` returns
+    mutable `EventGraph`s instead of `FrozenEventGraph`s.
+    """
+
+    def __init__(self, path: Union[str, Path], frozen: bool = True, cache_chunks: int = 4) -> None:
+        self.path = Path(path)
+        self.frozen = frozen
+        self.cache_chunks = cache_chunks
+        self._file = open(self.path, "rb")
+        self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._buf[:len(MAGIC)] != MAGIC or self._buf[-len(MAGIC):] != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a complete graph corpus file")
+        footer_at, footer_len = _TRAILER.unpack_from(self._buf, len(self._buf) - len(MAGIC) - _TRAILER.size)
+        footer = json.loads(self._buf[footer_at:footer_at + footer_len])
+        self.info: Dict = footer["info"]
+        self._count: int = footer["count"]
+        # file type ids -> this process's interned ids
+        self._type_map = np.asarray([intern_event_type(name) for name in footer["types"]] or [0], dtype=np.int16)
+        self._attrs = [tuple(item) for item in footer["attrs"]]
+        self._chunk_offsets = [c[0] for c in footer["chunks"]]
+        self._chunk_first = [c[1] for c in footer["chunks"]]
+        self._cache: "OrderedDict[int, _Chunk]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> "GraphReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._cache = OrderedDict()
+        if not self._buf.closed:
+            self._buf.close()
+        self._file.close()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[i] for i in range(*key.indices(self._count))]
+        index = key + self._count if key < 0 else key
+        if not 0 <= index < self._count:
+            raise IndexError(key)
+        ci = bisect.bisect_right(self._chunk_first, index) - 1
+        return self._decode(self._chunk(ci), index - self._chunk_first[ci])
+
+    def __iter__(self) -> Iterator[Union[EventGraph, FrozenEventGraph]]:
+        for chunk in self.iter_chunks():
+            yield from chunk
+
+    def iter_chunks(self, chunk_size: Optional[int] = None) -> Iterator[List[Union[EventGraph, FrozenEventGraph]]]:
+        """Yield graphs in lists of `chunk_size` (default: the file's own chunks), reading sequentially."""
+        batch: List[Union[EventGraph, FrozenEventGraph]] = []
+        for ci in range(len(self._chunk_offsets)):
+            # decoded straight from the mapping, bypassing the random-access cache
+            chunk = _Chunk(self._buf, self._chunk_offsets[ci], self._type_map)
+            graphs = [self._decode(chunk, j) for j in range(len(chunk.node_start) - 1)]
+            if chunk_size is None:
+                yield graphs
+                continue
+            batch.extend(graphs)
+            while len(batch) >= chunk_size:
+                yield batch[:chunk_size]
+                batch = batch[chunk_size:]
+        if batch:
+            yield batch
+
+    def _chunk(self, ci: int) -> _Chunk:
+        chunk = self._cache.get(ci)
+        if chunk is None:
+            chunk = self._cache[ci] = _Chunk(self._buf, self._chunk_offsets[ci], self._type_map)
+            if len(self._cache) > self.cache_chunks:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(ci)
+        return chunk
+
+    def _decode(self, chunk: _Chunk, j: int) -> Union[EventGraph, FrozenEventGraph]:
+        a, b = chunk.node_start[j], chunk.node_start[j + 1]
+        e0, a0 = chunk.edge_start[a], chunk.attr_start[a]
+        attrs = self._attrs
+        g = FrozenEventGraph(
+            chunk.type_ids[a:b],
+            chunk.edge_start[a:b + 1] - e0,
+            chunk.targets[e0:chunk.edge_start[b]].astype(np.int32),
+            chunk.attr_start[a:b + 1] - a0,
+            tuple(attrs[c] for c in chunk.codes[a0:chunk.attr_start[b]].tolist()),
+        )
+        return g if self.frozen else g.thaw()
+
+
+def save_graphs(path: Union[str, Path], graphs: Iterable[Union[EventGraph, FrozenEventGraph]],
+                chunk_size: int = 1024, **info) -> int:
+    """Write `graphs` to `path`; returns the number written."""
+    with GraphWriter(path, chunk_size, **info) as w:
+        w.write_many(graphs)
+        return len(w)
+
+def load_graphs(path: Union[str, Path], frozen: bool = True) -> List[Union[EventGraph, FrozenEventGraph]]:
+    """Read a whole file into a list."""
+    with GraphReader(path, frozen) as r:
+        return [g for chunk in r.iter_chunks() for g in chunk]
@@ -0,0 +1,258 @@
+from __future__ import annotations
+import heapq, json, math, random
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from lib import instrumentation
+from lib.local_index import Match, QueryResult, _normalize_rows
+from lib.sparse_fingerprint import Fingerprint, as_dense
+
+
+class HNSWIndex:
+    """Approximate cosine index: a hierarchical navigable-small-world graph in NumPy.
+
+    - `M` bounds the links per node (2*M on the bottom layer).
+    - `ef_construction` is the candidate list size while inserting.
+    - `ef` is the default candidate list size while querying; raise it per
+      query for higher recall, lower it for lower latency.
+
+    Exposes the same `upsert`/`query` surface as `lib.pinecone` and
+    `lib.local_index.FingerprintIndex`.
+    """
+
+    def __init__(self, dim: Optional[int] = None, M: int = 16, ef_construction: int = 200,
+                 ef: int = 50, seed: int = 0, capacity: int = 1024) -> None:
+        if M < 2:
+            raise ValueError("M must be at least 2")
+        self.dim = dim
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef = ef
+        self.seed = seed
+        self._ml = 1.0 / math.log(M)
+        self._rng = random.Random(seed)
+        self._capacity = capacity
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._metadata: List[Optional[Dict]] = []
+        self._levels: List[int] = []
+        self._links: List[List[List[int]]] = []  # node -> layer -> neighbour rows
+        self._entry: Optional[int] = None
+        self._max_level = -1
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, fid: str) -> bool:
+        return fid in self._rows
+
+    # ---- core API ----
+    def upsert(self, fingerprints: Dict[str, Fingerprint], metadata: Optional[Dict] = None) -> None:
+        """Insert fingerprints one by one into the graph.
+
+        Re-upserting an existing id overwrites its vector and metadata in place
+        but keeps its links, so heavily edited vectors may be reached less reliably.
+        """
+        if not fingerprints:
+            return
+        vectors = np.asarray([as_dense(fp) for fp in fingerprints.values()], dtype=np.float32)
+        if vectors.ndim != 2:
+            raise ValueError("Fingerprints must all have the same length.")
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected fingerprints of length {self.dim}, got {vectors.shape[1]}")
+        vectors = _normalize_rows(vectors)
+
+        for fid, vec in zip(fingerprints, vectors):
+            meta = dict(metadata) if metadata is not None else None
+            row = self._rows.get(fid)
+            if row is not None:
+                self._matrix[row] = vec
+                self._metadata[row] = meta
+                continue
+            row = len(self._ids)
+            self._ensure_capacity(row + 1)
+            self._matrix[row] = vec
+            self._rows[fid] = row
+            self._ids.append(fid)
+            self._metadata.append(meta)
+            self._insert(row)
+
+    @instrumentation.timed("query.hnsw", histogram=True)
+    def query(self, fingerprint: Fingerprint, top_k: int = 100, ef: Optional[int] = None,
+              include_metadata: bool = True) -> QueryResult:
+        """Approximate `top_k` by cosine similarity, best first. `ef` trades latency for recall."""
+        if self._entry is None or top_k <= 0:
+            return QueryResult()
+        q = as_dense(fingerprint)
+        norm = np.linalg.norm(q)
+        if norm > 0.0:
+            q = q / norm
+        ef = max(ef if ef is not None else self.ef, top_k)
+
+        ep = [self._entry]
+        for layer in range(self._max_level, 0, -1):
+            ep = [self._search_layer(q, ep, 1, layer)[0][1]]
+        found = self._search_layer(q, ep, ef, 0)[:top_k]
+        return QueryResult([
+            Match(
+                id=self._ids[row],
+                score=1.0 - dist,
+                metadata=self._metadata[row] if include_metadata else None,
+            )
+            for dist, row in found
+        ])
+
+    def query_many(self, fingerprints: Sequence[Fingerprint], top_k: int = 100, ef: Optional[int] = None,
+                   include_metadata: bool = True) -> List[QueryResult]:
+        """`query` for each fingerprint, in input order (graph search does not batch into one product)."""
+        return [self.query(fp, top_k, ef, include_metadata) for fp in fingerprints]
+
+    # ---- persistence ----
+    def save(self, path: Union[str, Path]) -> None:
+        """Write the index to a single `.npz` file."""
+        n = len(self._ids)
+        counts = [len(layer) for links in self._links for layer in links]
+        data = [nbr for links in self._links for layer in links for nbr in layer]
+        params = {
+            "dim": self.dim, "M": self.M, "ef_construction": self.ef_construction,
+            "ef": self.ef, "seed": self.seed, "entry": self._entry, "max_level": self._max_level,
+        }
+        np.savez(
+            path,
+            matrix=self._matrix[:n] if self._matrix is not None else np.zeros((0, self.dim or 0), np.float32),
+            ids=np.asarray(self._ids, dtype=str),
+            levels=np.asarray(self._levels, dtype=np.int32),
+            link_counts=np.asarray(counts, dtype=np.int32),
+            link_data=np.asarray(data, dtype=np.int64),
+            metadata=np.asarray(json.dumps(self._metadata)),
+            params=np.asarray(json.dumps(params)),
+        )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "HNSWIndex":
+        with np.load(path, allow_pickle=False) as f:
+            params = json.loads(str(f["params"]))
+            index = cls(params["dim"], params["M"], params["ef_construction"], params["ef"], params["seed"])
+            matrix = f["matrix"]
+            index._ids = [str(i) for i in f["ids"]]
+            index._rows = {fid: row for row, fid in enumerate(index._ids)}
+            index._metadata = json.loads(str(f["metadata"]))
+            index._levels = f["levels"].tolist()
+            counts = f["link_counts"].tolist()
+            data = f["link_data"].tolist()
+        if len(matrix):  # an empty index may not know its dim yet
+            index._ensure_capacity(len(matrix))
+            index._matrix[:len(matrix)] = matrix
+        pos = 0
+        it = iter(counts)
+        for level in index._levels:
+            links = []
+            for _ in range(level + 1):
+                c = next(it)
+                links.append(data[pos:pos + c])
+                pos += c
+            index._links.append(links)
+        index._entry = params["entry"]
+        index._max_level = params["max_level"]
+        # keep level draws for later inserts independent of what was loaded
+        index._rng = random.Random(f"{params['seed']}:{len(index._ids)}")
+        return index
+
+    # ---- internal ----
+    def _dist(self, q: np.ndarray, rows: List[int]) -> np.ndarray:
+        return 1.0 - self._matrix[rows] @ q
+
+    def _search_layer(self, q: np.ndarray, entries: List[int], ef: int, layer: int) -> List[Tuple[float, int]]:
+        """Best-first beam search on one layer; returns up to `ef` (distance, row) pairs, nearest first."""
+        visited = set(entries)
+        dists = self._dist(q, entries).tolist()
+        candidates = list(zip(dists, entries))
+        heapq.heapify(candidates)
+        results = [(-d, e) for d, e in candidates]
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            d, c = heapq.heappop(candidates)
+            if d > -results[0][0]:
+                break
+            nbrs = [n for n in self._links[c][layer] if n not in visited]
+            if not nbrs:
+                continue
+            visited.update(nbrs)
+            for dn, n in zip(self._dist(q, nbrs).tolist(), nbrs):
+                if len(results) < ef or dn < -results[0][0]:
+                    heapq.heappush(candidates, (dn, n))
+                    heapq.heappush(results, (-dn, n))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        return sorted((-d, n) for d, n in results)
+
+    def _select_neighbors(self, candidates: List[Tuple[float, int]], m: int) -> List[int]:
+        """Diversity heuristic: keep a candidate only if it is closer to the base than to any kept one.
+
+        `candidates` are (distance, row) pairs, nearest first. Slots the
+        heuristic leaves empty are filled with the nearest pruned candidates,
+        so a node keeps `m` links whenever it has that many candidates.
+        """
+        rows = [n for _, n in candidates]
+        if len(rows) <= m:
+            return rows
+        vecs = self._matrix[rows]
+        closest = np.full(len(rows), np.inf, dtype=np.float32)  # distance to the nearest kept candidate
+        kept: List[int] = []
+        pruned: List[int] = []
+        for i, (d, _) in enumerate(candidates):
+            if len(kept) >= m:
+                break
+            if closest[i] < d:
+                pruned.append(i)
+            else:
+                kept.append(i)
+                np.minimum(closest, 1.0 - vecs @ vecs[i], out=closest)
+        kept += pruned[:m - len(kept)]
+        return [rows[i] for i in kept]
+
+    def _insert(self, row: int) -> None:
+        q = self._matrix[row]
+        level = int(-math.log(1.0 - self._rng.random()) * self._ml)
+        self._levels.append(level)
+        self._links.append([[] for _ in range(level + 1)])
+        if self._entry is None:
+            self._entry, self._max_level = row, level
+            return
+
+        ep = [self._entry]
+        for layer in range(self._max_level, level, -1):
+            ep = [self._search_layer(q, ep, 1, layer)[0][1]]
+
+        for layer in range(min(level, self._max_level), -1, -1):
+            found = self._search_layer(q, ep, self.ef_construction, layer)
+            nbrs = self._select_neighbors(found, self.M)
+            self._links[row][layer] = nbrs
+            m_max = 2 * self.M if layer == 0 else self.M
+            for n in nbrs:
+                links = self._links[n][layer]
+                links.append(row)
+                if len(links) > m_max:
+                    d = self._dist(self._matrix[n], links).tolist()
+                    self._links[n][layer] = self._select_neighbors(sorted(zip(d, links)), m_max)
+            ep = [n for _, n in found]
+
+        if level > self._max_level:
+            self._entry, self._max_level = row, level
+
+    def _ensure_capacity(self, n: int) -> None:
+        if self._matrix is not None and n <= self._matrix.shape[0]:
+            return
+        capacity = max(self._capacity, n)
+        if self._matrix is not None:
+            capacity = max(capacity, 2 * self._matrix.shape[0])
+        grown = np.zeros((capacity, self.dim), dtype=np.float32)
+        if self._matrix is not None:
+            grown[:self._matrix.shape[0]] = self._matrix
+        self._matrix = grown
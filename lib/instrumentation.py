@@ -0,0 +1,168 @@
+"""Opt-in counters, timers and latency histograms for the hot paths.
+
+    from lib import instrumentation
+    with instrumentation.instrumented():
+        graphs_to_fingerprints(graphs)
+    print(instrumentation.snapshot())
+
+    with instrumentation.profile("wl.prof"):    # cProfile; view with snakeviz / flameprof
+        graphs_to_fingerprints(graphs)
+
+Instrumented code checks the module-level `enabled` flag before doing any
+bookkeeping, so the disabled cost is one attribute lookup per call site.
+Counters live in the current process only: work done on process pools
+(`workers` > 1) is not counted.
+"""
+from __future__ import annotations
+import bisect, cProfile, io, pstats, threading, time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Union
+
+enabled = False
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = {}
+_timers: Dict[str, List[float]] = {}   # name -> [calls, seconds]
+_histograms: Dict[str, "Histogram"] = {}
+
+
+class Histogram:
+    """Latency histogram with log-spaced buckets from 1 us to ~2 min (about 19% resolution)."""
+
+    BOUNDS = [1e-6 * 2 ** (i / 4) for i in range(108)]
+
+    def __init__(self) -> None:
+        self.buckets = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.buckets[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile, clamped to the observed max."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min(self.BOUNDS[i] if i < len(self.BOUNDS) else self.max, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {"count": self.count, "mean_ms": 1e3 * self.total / self.count if self.count else 0.0,
+                "min_ms": 1e3 * self.min if self.count else 0.0, "max_ms": 1e3 * self.max,
+                "p50_ms": 1e3 * self.quantile(0.50), "p90_ms": 1e3 * self.quantile(0.90),
+                "p99_ms": 1e3 * self.quantile(0.99)}
+
+
+# ---- switches ----
+def enable(on: bool = True) -> None:
+    global enabled
+    enabled = on
+
+def disable() -> None:
+    enable(False)
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+        _histograms.clear()
+
+@contextmanager
+def instrumented(fresh: bool = True) -> Iterator[None]:
+    """Enable instrumentation for a block (clearing previous data unless `fresh=False`)."""
+    was = enabled
+    if fresh:
+        reset()
+    enable()
+    try:
+        yield
+    finally:
+        enable(was)
+
+# ---- recording (callers check `enabled` first) ----
+def count(name: str, n: int = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def add_time(name: str, seconds: float, calls: int = 1) -> None:
+    with _lock:
+        t = _timers.get(name)
+        if t is None:
+            t = _timers[name] = [0, 0.0]
+        t[0] += calls
+        t[1] += seconds
+
+def observe(name: str, seconds: float) -> None:
+    """Record one latency sample in histogram `name` (also counted as a timer)."""
+    with _lock:
+        h = _histograms.get(name)
+        if h is None:
+            h = _histograms[name] = Histogram()
+        h.add(seconds)
+    add_time(name, seconds)
+
+@contextmanager
+def timer(name: str, histogram: bool = False) -> Iterator[None]:
+    if not enabled:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        (observe if histogram else add_time)(name, time.perf_counter() - t0)
+
+def timed(name: str, histogram: bool = False) -> Callable:
+    """Decorator: time every call of the function under `name` while enabled."""
+    def decorate(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                (observe if histogram else add_time)(name, time.perf_counter() - t0)
+        return wrapper
+    return decorate
+
+# ---- reporting ----
+def snapshot() -> Dict:
+    """Plain-dict copy of everything recorded so far."""
+    with _lock:
+        return {
+            "enabled": enabled,
+            "counters": dict(sorted(_counters.items())),
+            "timers": {k: {"calls": int(c), "seconds": s} for k, (c, s) in sorted(_timers.items())},
+            "histograms": {k: h.summary() for k, h in sorted(_histograms.items())},
+        }
+
+@contextmanager
+def profile(path: Optional[Union[str, Path]] = None, top: int = 25,
+            sort: str = "cumulative") -> Iterator[cProfile.Profile]:
+    """cProfile a block; dump pstats to `path` (for snakeviz, flameprof, gprof2dot) or print the top entries."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if path is not None:
+            profiler.dump_stats(str(path))
+        else:
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats(sort).print_stats(top)
+            print(out.getvalue())
@@ -0,0 +1,85 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple, Union
+import numpy as np
+from scipy import sparse
+from classes.event_graph import EventGraph
+from lib.WL2vec import _iter_batch_labels, _pack_graphs
+
+def label_count_matrix(graphs: Sequence[EventGraph], iterations: int = 3,
+                       vocab=None) -> Tuple[sparse.csr_matrix, List[int]]:
+    """Sparse (n_graphs, n_labels) matrix counting each WL label (iterations 0..h) per graph.
+
+    Returns the matrix and the label hash of every column. Rows are the WL
+    subtree feature maps used by `lib.rerank.wl_histogram`, so `X @ X.T` is
+    the WL subtree kernel.
+    """
+    packed = _pack_graphs(graphs)
+    node_graph = packed[1]
+    columns: Dict[int, int] = {}
+    rows, cols = [], []
+    for labels, hashes in _iter_batch_labels(packed, iterations, vocab):
+        col_of = np.asarray([columns.setdefault(lab, len(columns)) for lab in hashes], dtype=np.int64)
+        rows.append(node_graph)
+        cols.append(col_of[labels])
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    X = sparse.coo_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                          shape=(len(graphs), len(columns))).tocsr()  # duplicates are summed
+    return X, list(columns)
+
+def _inverse_norms(X: sparse.csr_matrix) -> np.ndarray:
+    norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    return np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+
+def normalize_rows(X: sparse.csr_matrix) -> sparse.csr_matrix:
+    """Scale rows to unit length, so products give the normalized kernel k(a,b)/sqrt(k(a,a)k(b,b))."""
+    return sparse.diags(_inverse_norms(X)).dot(X).tocsr()
+
+def kernel_matrix(X: sparse.csr_matrix, normalize: bool = True, dense: bool = True):
+    """Full n x n WL kernel matrix from a label count matrix, via one sparse product."""
+    if normalize:
+        X = normalize_rows(X)
+    K = X @ X.T
+    return K.toarray() if dense else K.tocsr()
+
+def iter_kernel_tiles(X: sparse.csr_matrix, block: int = 4096,
+                      normalize: bool = True) -> Iterator[Tuple[int, int, np.ndarray]]:
+    """Yield (row0, col0, dense tile) over the upper triangle (row0 <= col0) of the kernel matrix.
+
+    Only one `block` x `block` tile is materialized at a time; the lower
+    triangle is the transpose of these tiles.
+    """
+    if normalize:
+        X = normalize_rows(X)
+    n = X.shape[0]
+    XT = X.T.tocsc()
+    for i in range(0, n, block):
+        A = X[i:i + block]
+        for j in range(i, n, block):
+            yield i, j, (A @ XT[:, j:j + block]).toarray().astype(np.float32, copy=False)
+
+def tiled_kernel_matrix(X: sparse.csr_matrix, path: Union[str, Path], block: int = 4096,
+                        normalize: bool = True) -> np.memmap:
+    """Stream the n x n kernel matrix to a float32 `.npy` file on disk, one tile at a time.
+
+    Memory stays bounded by a few tiles regardless of n; the returned
+    memmap can be read back with `np.load(path, mmap_mode="r")`.
+    """
+    n = X.shape[0]
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n, n))
+    for i, j, tile in iter_kernel_tiles(X, block, normalize):
+        out[i:i + tile.shape[0], j:j + tile.shape[1]] = tile
+        if i != j:
+            out[j:j + tile.shape[1], i:i + tile.shape[0]] = tile.T
+    out.flush()
+    return out
+
+def similar_pairs(X: sparse.csr_matrix, threshold: float = 0.95, block: int = 4096,
+                  normalize: bool = True) -> Iterator[Tuple[int, int, float]]:
+    """Yield (i, j, k) with i < j and kernel k >= `threshold`, e.g. for near-duplicate removal."""
+    for i0, j0, tile in iter_kernel_tiles(X, block, normalize):
+        ii, jj = np.nonzero(tile >= threshold)
+        for a, b in zip((ii + i0).tolist(), (jj + j0).tolist()):
+            if a < b:
+                yield a, b, float(tile[a - i0, b - j0])
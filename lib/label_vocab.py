@@ -0,0 +1,116 @@
+from __future__ import annotations
+import pickle
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Hashable, Optional, Sequence, Union
+from lib.WL2vec import _memo_key, stable_hash
+
+
+class LabelVocabulary:
+    """Corpus-wide memo of WL labels shared by every graph of a corpus.
+
+    Keys are what WL2vec hashes: event type names (hashed as-is), WL
+    signatures `(label, (neighbour labels...))` and attribute triples
+    `(event_type, attr_name, attr_value)` (hashed via `repr`). `hash(key)`
+    returns the same value as the uncached path but skips string building
+    and blake2b on a hit; `signature(label, neighbours)` also skips the
+    `repr` sort of the neighbours. `id(key)` maps keys to compact int ids.
+
+    At most `capacity` keys and `max_labels` ids (default `capacity`) are
+    kept, least recently used first out. Ids are never reused: a label stays
+    on its id while it is kept, and gets a fresh one if seen after eviction.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, max_labels: Optional[int] = None) -> None:
+        self.capacity = capacity
+        self.max_labels = capacity if max_labels is None else max_labels
+        self._cache: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._ids: "OrderedDict[int, int]" = OrderedDict()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def hash(self, key: Hashable) -> int:
+        memo = _memo_key(key)
+        label = self._lookup(memo)
+        if label is None:
+            label = self._store(memo, stable_hash(key if isinstance(key, str) else repr(key)))
+        return label
+
+    def signature(self, label: int, neighbours: Sequence[int]) -> int:
+        """`hash((label, neighbours sorted by repr))`, memoized on the numerically sorted neighbours."""
+        memo = (label, tuple(sorted(neighbours)))
+        found = self._lookup(memo)
+        if found is None:
+            found = self._store(memo, stable_hash(repr((label, tuple(sorted(neighbours, key=repr))))))
+        return found
+
+    def _lookup(self, memo: Hashable) -> Optional[int]:
+        label = self._cache.get(memo)
+        if label is not None:
+            self.hits += 1
+            self._cache.move_to_end(memo)
+        else:
+            self.misses += 1
+        return label
+
+    def _store(self, memo: Hashable, label: int) -> int:
+        self.label_id(label)
+        if self.capacity > 0:
+            self._cache[memo] = label
+            if len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        return label
+
+    def id(self, key: Hashable) -> int:
+        return self.label_id(self.hash(key))
+
+    def label_id(self, label: int) -> int:
+        """Compact id of an already hashed label, assigning a new one if unseen."""
+        lid = self._ids.get(label)
+        if lid is not None:
+            self._ids.move_to_end(label)
+            return lid
+        lid = self._ids[label] = self._next_id
+        self._next_id += 1
+        if len(self._ids) > self.max_labels:
+            self._ids.popitem(last=False)
+        return lid
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "cached": len(self._cache),
+            "capacity": self.capacity,
+            "labels": len(self._ids),
+        }
+
+    # ---- persistence ----
+    def save(self, path: Union[str, Path]) -> None:
+        with open(path, "wb") as f:
+            pickle.dump({"capacity": self.capacity, "max_labels": self.max_labels,
+                         "cache": list(self._cache.items()), "ids": list(self._ids.items()),
+                         "next_id": self._next_id}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "LabelVocabulary":
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        vocab = cls(state["capacity"], state.get("max_labels"))
+        if "next_id" not in state:   # saved before keys carried their type; start the memo afresh
+            vocab._ids = OrderedDict(state["ids"])
+            vocab._next_id = max(vocab._ids.values(), default=-1) + 1
+            return vocab
+        vocab._cache = OrderedDict(state["cache"])
+        vocab._ids = OrderedDict(state["ids"])
+        vocab._next_id = state["next_id"]
+        return vocab
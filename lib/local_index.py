@@ -0,0 +1,258 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from classes.event_graph import EventGraph
+from lib import instrumentation
+from lib.metadata_filter import BitmapFilter
+from lib.sparse_fingerprint import Fingerprint, as_dense
+
+
+@dataclass
+class Match:
+    id: str
+    score: float
+    metadata: Optional[Dict] = None
+
+@dataclass
+class QueryResult:
+    matches: List[Match] = field(default_factory=list)
+
+
+# filtered search: above this fraction of matching rows a full scan plus -inf mask beats gathering
+_FULL_SCAN_FRACTION = 0.25
+_GATHER_BLOCK = 4096
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0.0] = 1.0  # all-zero fingerprints stay zero and score 0
+    return vectors / norms
+
+def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the `top_k` highest scores, best first (ties keep row order)."""
+    k = min(top_k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        idx = np.argpartition(-scores, k - 1)[:k]
+        idx.sort()
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+def _top_k_rows(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Row-wise `_top_k` over an (m, n) score matrix; returns (m, min(top_k, n)) column indices."""
+    m, n = scores.shape
+    k = min(top_k, n)
+    if k <= 0:
+        return np.empty((m, 0), dtype=np.int64)
+    if k < n:
+        idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        idx.sort(axis=1)
+    else:
+        idx = np.broadcast_to(np.arange(n), (m, n))
+    order = np.argsort(-np.take_along_axis(scores, idx, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1)
+
+
+class FingerprintIndex:
+    """In-process exact cosine index with the `upsert`/`query` contract of `lib.pinecone`.
+
+    Fingerprints live L2-normalized in one contiguous float32 matrix, so a query
+    is a single matrix-vector product followed by a partial sort.
+    """
+
+    def __init__(self, dim: Optional[int] = None, capacity: int = 1024) -> None:
+        self.dim = dim
+        self._capacity = capacity
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._metadata: List[Optional[Dict]] = []
+        self._filter: Optional[BitmapFilter] = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, fid: str) -> bool:
+        return fid in self._rows
+
+    @classmethod
+    def from_matrix(cls, ids: Sequence[str], matrix: np.ndarray, metadata: Optional[Dict] = None,
+                    normalized: bool = False) -> "FingerprintIndex":
+        """Build an index over an (n, dim) matrix, e.g. a `FingerprintStore` mapping.
+
+        With `normalized=True` the rows are used as-is (no copy), so a memory-mapped
+        matrix is searched in place; a later `upsert` copies it into memory.
+        """
+        if len(set(ids)) != len(ids):
+            raise ValueError("Fingerprint ids must be unique.")
+        index = cls(matrix.shape[1], capacity=max(1, len(ids)))
+        if len(ids):
+            index._matrix = matrix if normalized and matrix.dtype == np.float32 else \
+                _normalize_rows(np.asarray(matrix, dtype=np.float32))
+        index._ids = list(ids)
+        index._rows = {fid: row for row, fid in enumerate(index._ids)}
+        index._metadata = [dict(metadata) if metadata is not None else None for _ in index._ids]
+        return index
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Normalized fingerprints of all stored rows (a view, not a copy)."""
+        if self._matrix is None:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return self._matrix[:len(self._ids)]
+
+    # ---- core API ----
+    def upsert(self, fingerprints: Dict[str, Fingerprint], metadata: Optional[Dict] = None,
+               graphs: Optional[Dict[str, EventGraph]] = None) -> None:
+        """Insert or overwrite fingerprints (dense or sparse) by id.
+
+        `metadata` is attached to every vector in the call. `graphs` (by id, a
+        subset of `fingerprints`) are indexed for `query(..., filter=...)`;
+        ids upserted without a graph never match a filter.
+        """
+        if not fingerprints:
+            return
+        vectors = np.asarray([as_dense(fp) for fp in fingerprints.values()], dtype=np.float32)
+        if vectors.ndim != 2:
+            raise ValueError("Fingerprints must all have the same length.")
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected fingerprints of length {self.dim}, got {vectors.shape[1]}")
+        vectors = _normalize_rows(vectors)
+
+        rows = np.empty(len(vectors), dtype=np.int64)
+        for i, fid in enumerate(fingerprints):
+            row = self._rows.get(fid)
+            if row is None:
+                row = len(self._ids)
+                self._rows[fid] = row
+                self._ids.append(fid)
+                self._metadata.append(None)
+            self._metadata[row] = dict(metadata) if metadata is not None else None
+            rows[i] = row
+
+        self._ensure_capacity(len(self._ids))
+        self._matrix[rows] = vectors
+
+        if graphs:
+            if self._filter is None:
+                self._filter = BitmapFilter()
+            missing = [fid for fid in graphs if fid not in fingerprints]
+            if missing:
+                raise KeyError(f"graphs given for ids not in this upsert: {missing[:5]}")
+            self._filter.add([self._rows[fid] for fid in graphs], graphs.values())
+        if self._filter is not None:
+            self._filter.remove(self._rows[fid] for fid in fingerprints if not graphs or fid not in graphs)
+
+    @instrumentation.timed("query.flat", histogram=True)
+    def query(self, fingerprint: Fingerprint, top_k: int = 100, include_metadata: bool = True,
+              filter: Optional[Dict] = None) -> QueryResult:
+        """Return the `top_k` stored fingerprints by cosine similarity, best first.
+
+        With a `filter` (see `lib.metadata_filter`) only matching rows are scored.
+        """
+        if not self._ids:
+            return QueryResult()
+        # sparse queries are densified: one contiguous mat-vec beats gathering nnz columns of every row
+        q = as_dense(fingerprint)
+        norm = np.linalg.norm(q)
+        if norm > 0.0:
+            q = q / norm
+        scores, rows, k = self._scores(q[None, :], self._filter_mask(filter), top_k)
+        scores = scores[0]
+        return QueryResult([self._match(row if rows is None else rows[row], scores[row], include_metadata)
+                            for row in _top_k(scores, k)])
+
+    @instrumentation.timed("query.flat_batch", histogram=True)
+    def query_many(self, fingerprints: Sequence[Fingerprint], top_k: int = 100, include_metadata: bool = True,
+                   max_scores: int = 1 << 26, filter: Optional[Dict] = None) -> List[QueryResult]:
+        """Run a batch of queries as matrix-matrix products; results are in input order.
+
+        Queries are processed in blocks so at most `max_scores` scores are held at once.
+        A `filter` applies to every query and is evaluated once.
+        """
+        if not len(fingerprints):
+            return []
+        if not self._ids:
+            return [QueryResult() for _ in fingerprints]
+        queries = _normalize_rows(np.asarray([as_dense(fp) for fp in fingerprints], dtype=np.float32))
+        mask = self._filter_mask(filter)
+        block = max(1, max_scores // len(self._ids))
+        results: List[QueryResult] = []
+        for start in range(0, len(queries), block):
+            scores, rows, k = self._scores(queries[start:start + block], mask, top_k)
+            for qi, top in enumerate(_top_k_rows(scores, k)):
+                results.append(QueryResult([self._match(row if rows is None else rows[row], scores[qi, row],
+                                                        include_metadata) for row in top]))
+        return results
+
+    # ---- internal ----
+    def _filter_mask(self, filter: Optional[Dict]) -> Optional[np.ndarray]:
+        if filter is None:
+            return None
+        if self._filter is None:
+            raise ValueError("filter needs graph content; pass graphs= to upsert")
+        return self._filter.mask(filter, len(self._ids))
+
+    def _scores(self, queries: np.ndarray, mask: Optional[np.ndarray],
+                top_k: int) -> Tuple[np.ndarray, Optional[np.ndarray], int]:
+        """Scores of normalized `queries` against the rows selected by `mask` (all rows if None).
+
+        Returns (scores, rows, k): column j scores row `rows[j]` (row j when
+        `rows` is None), and k caps `top_k` at the number of matching rows.
+        Broad filters score every row and mask the rest with -inf; selective
+        ones gather the matching rows in blocks of `_GATHER_BLOCK`, so a query
+        never copies more than one block.
+        """
+        # a single query stays a mat-vec
+        dot = (lambda m: (m @ queries[0])[None, :]) if len(queries) == 1 else (lambda m: queries @ m.T)
+        matrix = self.matrix
+        if mask is None:
+            return dot(matrix), None, top_k
+        rows = np.flatnonzero(mask)
+        k = min(top_k, len(rows))
+        if len(rows) >= _FULL_SCAN_FRACTION * len(mask):
+            scores = dot(matrix)
+            scores[:, ~mask] = -np.inf
+            return scores, None, k
+        scores = np.empty((len(queries), len(rows)), dtype=np.float32)
+        for start in range(0, len(rows), _GATHER_BLOCK):
+            block = rows[start:start + _GATHER_BLOCK]
+            scores[:, start:start + len(block)] = dot(matrix[block])
+        return scores, rows, k
+
+    def _match(self, row: int, score: float, include_metadata: bool) -> Match:
+        return Match(
+            id=self._ids[row],
+            score=float(score),
+            metadata=self._metadata[row] if include_metadata else None,
+        )
+
+    def _ensure_capacity(self, n: int) -> None:
+        # a matrix adopted by `from_matrix` (e.g. a read-only memmap) is copied before the first write
+        owned = type(self._matrix) is np.ndarray and self._matrix.flags.writeable
+        if self._matrix is not None and n <= self._matrix.shape[0] and owned:
+            return
+        capacity = max(self._capacity, n)
+        if self._matrix is not None:
+            capacity = max(capacity, 2 * self._matrix.shape[0])
+        grown = np.zeros((capacity, self.dim), dtype=np.float32)
+        if self._matrix is not None:
+            grown[:self._matrix.shape[0]] = self._matrix
+        self._matrix = grown
+
+
+# module-level index mirroring `lib.pinecone.upsert` / `lib.pinecone.query`
+default_index = FingerprintIndex()
+
+def upsert(fingerprints: Dict[str, Fingerprint], metadata = None, graphs = None) -> None:
+    default_index.upsert(fingerprints, metadata, graphs)
+
+def query(fingerprint: Fingerprint, top_k=100, filter = None) -> QueryResult:
+    return default_index.query(fingerprint, top_k, filter=filter)
+
+def query_many(fingerprints: Sequence[Fingerprint], top_k=100, filter = None) -> List[QueryResult]:
+    return default_index.query_many(fingerprints, top_k, filter=filter)
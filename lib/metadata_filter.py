@@ -0,0 +1,334 @@
+"""Inverted bitmap index over graph content, for filtered similarity search.
+
+    index = FingerprintIndex(1024)
+    index.upsert(fingerprints, graphs=graphs)     # same ids as `fingerprints`
+    index.query(fp, top_k=10, filter={"$and": [
+        {"event_type": "moved_country"},
+        {"event_type": "started_work", "industry": "tech"},
+        {"event_type": "started_school", "age": {"$gte": 18, "$lt": 25}},
+    ]})
+
+A filter is a dict in the style of Pinecone metadata filters. Its plain keys
+form a node predicate — "the graph has a node with this `event_type` and
+these attribute conditions" (a missing `event_type` means any type) — and
+`$and` / `$or` / `$not` combine sub-filters; sibling keys are ANDed.
+Attribute conditions are a value (`$eq`) or a dict of `$eq`, `$ne`, `$in`,
+`$nin`, `$gt`, `$gte`, `$lt`, `$lte`; `event_type` takes a name or `$in`.
+
+Each row sets one bit per event type, per categorical (event_type, attr,
+value) and per numeric (event_type, attr, bucket), numeric values falling in
+buckets of `NUMERIC_BUCKETS` width. A predicate is answered from the
+bitmaps; only rows that bitmaps cannot decide (edge buckets of a range,
+several conditions on one node) are checked against the stored node records.
+"""
+from __future__ import annotations
+import math
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from classes.event_graph import EventGraph
+from classes.frozen_event_graph import FrozenEventGraph, event_type_name
+from data.event_types import event_types
+
+NUMERIC_BUCKETS = {"age": 5, "time": 10}
+DEFAULT_BUCKET = 10
+
+_SCHEMA: Dict[str, Set[str]] = {spec["event_type"]: set(spec["attributes"]) for spec in event_types.values()}
+_OPS = {"$eq", "$ne", "$in", "$nin", "$gt", "$gte", "$lt", "$lte"}
+_RANGE_OPS = {"$gt", "$gte", "$lt", "$lte"}
+
+NodeRecord = Tuple[str, Tuple[Tuple[str, object], ...]]
+
+def _numeric(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def node_records(graph: EventGraph) -> Tuple[NodeRecord, ...]:
+    """(event_type, attribute items) of every node, for `EventGraph`s and `FrozenEventGraph`s."""
+    if isinstance(graph, FrozenEventGraph):
+        bounds = graph.attr_offsets.tolist()
+        return tuple((event_type_name(t), graph.attr_items[a:b])
+                     for t, a, b in zip(graph.type_ids.tolist(), bounds[:-1], bounds[1:]))
+    return tuple((node.event_type, tuple(node.event_attributes.items())) for node in graph.nodes.values())
+
+# ---- value predicates ----
+def _equal(a, b) -> bool:
+    return _numeric(a) == _numeric(b) and a == b
+
+def _match_value(ops: Dict[str, object], value) -> bool:
+    for op, x in ops.items():
+        if op == "$eq":
+            ok = _equal(value, x)
+        elif op == "$ne":
+            ok = not _equal(value, x)
+        elif op == "$in":
+            ok = any(_equal(value, v) for v in x)
+        elif op == "$nin":
+            ok = not any(_equal(value, v) for v in x)
+        elif not _numeric(value):
+            ok = False
+        elif op == "$gt":
+            ok = value > x
+        elif op == "$gte":
+            ok = value >= x
+        elif op == "$lt":
+            ok = value < x
+        else:
+            ok = value <= x
+        if not ok:
+            return False
+    return True
+
+def _classify_bucket(ops: Dict[str, object], lo: float, hi: float) -> Tuple[bool, bool]:
+    """(every value in [lo, hi) matches, some value may match)."""
+    certain = possible = True
+    for op, x in ops.items():
+        if op in ("$eq", "$in"):
+            xs = [x] if op == "$eq" else x
+            certain, possible = False, possible and any(_numeric(v) and lo <= v < hi for v in xs)
+        elif op in ("$ne", "$nin"):
+            xs = [x] if op == "$ne" else x
+            certain = certain and not any(_numeric(v) and lo <= v < hi for v in xs)
+        elif op == "$gt":
+            certain, possible = certain and lo > x, possible and hi > x
+        elif op == "$gte":
+            certain, possible = certain and lo >= x, possible and hi > x
+        elif op == "$lt":
+            certain, possible = certain and hi <= x, possible and lo < x
+        else:
+            certain, possible = certain and hi <= x, possible and lo <= x
+    return certain and possible, possible
+
+
+class BitmapFilter:
+    """Per-row bitmaps over event types and attribute values of the indexed graphs.
+
+    Rows are the integer rows of the owning index. Bitmaps are packed uint64
+    words grown on demand; a row's node records are kept to refine the rows
+    bitmaps alone cannot decide, and to clear its bits when it is re-added.
+    """
+
+    def __init__(self, buckets: Optional[Dict[str, float]] = None, default_bucket: float = DEFAULT_BUCKET) -> None:
+        self.buckets = dict(NUMERIC_BUCKETS if buckets is None else buckets)
+        self.default_bucket = default_bucket
+        self._bitmaps: Dict[Hashable, np.ndarray] = {}
+        self._present = np.zeros(0, dtype="<u8")               # rows with records
+        self._values: Dict[Tuple[str, str], Set] = defaultdict(set)   # categorical values seen
+        self._bucket_ids: Dict[Tuple[str, str], Set[int]] = defaultdict(set)
+        self._types_with: Dict[str, Set[str]] = defaultdict(set)      # attr -> event types
+        self._types: Set[str] = set()
+        self._records: List[Optional[Tuple[NodeRecord, ...]]] = []
+
+    def __len__(self) -> int:
+        return sum(r is not None for r in self._records)
+
+    def width(self, attr: str) -> float:
+        return self.buckets.get(attr, self.default_bucket)
+
+    # ---- maintenance ----
+    def add(self, rows: Sequence[int], graphs: Iterable[EventGraph]) -> None:
+        """Index `graphs[i]` under `rows[i]`, replacing whatever those rows held."""
+        rows = list(rows)
+        self.remove(rows)
+        postings: Dict[Hashable, List[int]] = defaultdict(list)
+        for row, graph in zip(rows, graphs):
+            records = node_records(graph)
+            if row >= len(self._records):
+                self._records.extend([None] * (row + 1 - len(self._records)))
+            self._records[row] = records
+            for key in self._keys(records):
+                postings[key].append(row)
+        for key, key_rows in postings.items():
+            self._set(key, np.asarray(key_rows, dtype=np.int64), True)
+        self._present = self._update(self._present, np.asarray(rows, dtype=np.int64), True)
+
+    def remove(self, rows: Iterable[int]) -> None:
+        """Forget the content of `rows` (no-op for rows never added)."""
+        postings: Dict[Hashable, List[int]] = defaultdict(list)
+        dropped = []
+        for row in rows:
+            records = self._records[row] if row < len(self._records) else None
+            if records is None:
+                continue
+            for key in self._keys(records, track=False):
+                postings[key].append(row)
+            self._records[row] = None
+            dropped.append(row)
+        for key, key_rows in postings.items():
+            self._set(key, np.asarray(key_rows, dtype=np.int64), False)
+        if dropped:
+            self._present = self._update(self._present, np.asarray(dropped, dtype=np.int64), False)
+
+    def _keys(self, records: Tuple[NodeRecord, ...], track: bool = True) -> Set[Hashable]:
+        keys: Set[Hashable] = set()
+        for event_type, items in records:
+            keys.add(("type", event_type))
+            if track:
+                self._types.add(event_type)
+            for attr, value in items:
+                if _numeric(value):
+                    if math.isnan(value):
+                        continue
+                    bucket = math.floor(value / self.width(attr))
+                    keys.add(("bucket", event_type, attr, bucket))
+                    if track:
+                        self._bucket_ids[event_type, attr].add(bucket)
+                else:
+                    try:
+                        keys.add(("value", event_type, attr, value))
+                    except TypeError:  # unhashable values are only matched by refinement
+                        continue
+                    if track:
+                        self._values[event_type, attr].add(value)
+                if track:
+                    self._types_with[attr].add(event_type)
+        return keys
+
+    def _set(self, key: Hashable, rows: np.ndarray, on: bool) -> None:
+        self._bitmaps[key] = self._update(self._bitmaps.get(key, np.zeros(0, dtype="<u8")), rows, on)
+
+    @staticmethod
+    def _update(words: np.ndarray, rows: np.ndarray, on: bool) -> np.ndarray:
+        if not len(rows):
+            return words
+        need = int(rows.max()) // 64 + 1
+        if need > len(words):
+            grown = np.zeros(max(need, 2 * len(words)), dtype="<u8")
+            grown[:len(words)] = words
+            words = grown
+        bits = np.left_shift(np.uint64(1), (rows & 63).astype(np.uint64))
+        if on:
+            np.bitwise_or.at(words, rows >> 6, bits)
+        else:
+            np.bitwise_and.at(words, rows >> 6, ~bits)
+        return words
+
+    # ---- evaluation ----
+    def mask(self, filter: Dict, n: int) -> np.ndarray:
+        """Boolean mask over rows 0..n-1 of the rows matching `filter`."""
+        words = self._eval(filter, (n + 63) // 64)
+        return np.unpackbits(words.view(np.uint8), bitorder="little")[:n].view(bool)
+
+    def rows(self, filter: Dict, n: int) -> np.ndarray:
+        """Sorted row numbers below `n` matching `filter`."""
+        return np.flatnonzero(self.mask(filter, n))
+
+    def _words(self, key: Hashable, nw: int) -> np.ndarray:
+        out = np.zeros(nw, dtype="<u8")
+        words = self._bitmaps.get(key)
+        if words is not None:
+            m = min(nw, len(words))
+            out[:m] = words[:m]
+        return out
+
+    def _eval(self, filter: Dict, nw: int) -> np.ndarray:
+        if not isinstance(filter, dict):
+            raise ValueError(f"A filter must be a dict, got {type(filter).__name__}")
+        result = self._present_words(nw)
+        leaf = {}
+        for key, value in filter.items():
+            if key == "$and":
+                for sub in value:
+                    result &= self._eval(sub, nw)
+            elif key == "$or":
+                any_ = np.zeros(nw, dtype="<u8")
+                for sub in value:
+                    any_ |= self._eval(sub, nw)
+                result &= any_
+            elif key == "$not":
+                result &= ~self._eval(value, nw)
+            elif key.startswith("$"):
+                raise ValueError(f"Unknown filter operator {key!r}")
+            else:
+                leaf[key] = value
+        if leaf:
+            result &= self._eval_leaf(leaf, nw)
+        return result
+
+    def _present_words(self, nw: int) -> np.ndarray:
+        out = np.zeros(nw, dtype="<u8")
+        m = min(nw, len(self._present))
+        out[:m] = self._present[:m]
+        return out
+
+    def _eval_leaf(self, leaf: Dict, nw: int) -> np.ndarray:
+        conds = []
+        for attr, cond in leaf.items():
+            if attr == "event_type":
+                continue
+            ops = cond if isinstance(cond, dict) else {"$eq": cond}
+            for op, x in ops.items():
+                if op not in _OPS:
+                    raise ValueError(f"Unknown operator {op!r} for {attr!r}")
+                if op in _RANGE_OPS and not _numeric(x):
+                    raise ValueError(f"{op} on {attr!r} needs a number, got {x!r}")
+                if op in ("$in", "$nin") and not isinstance(x, (list, tuple, set)):
+                    raise ValueError(f"{op} on {attr!r} needs a list, got {x!r}")
+            conds.append((attr, ops))
+        types = self._leaf_types(leaf.get("event_type"), [attr for attr, _ in conds])
+
+        certain = np.zeros(nw, dtype="<u8")
+        possible = np.zeros(nw, dtype="<u8")
+        for event_type in types:
+            if not conds:
+                words = self._words(("type", event_type), nw)
+                certain |= words
+                possible |= words
+                continue
+            t_possible = None
+            for attr, ops in conds:
+                c, p = self._eval_condition(event_type, attr, ops, nw)
+                t_possible = p if t_possible is None else t_possible & p
+                if len(conds) == 1:
+                    certain |= c
+            possible |= t_possible
+
+        # rows the bitmaps cannot decide: check the node records
+        undecided = np.flatnonzero(np.unpackbits((possible & ~certain).view(np.uint8), bitorder="little"))
+        type_set = set(types)
+        matched = [row for row in undecided.tolist()
+                   if any(t in type_set and _node_matches(items, conds) for t, items in self._records[row])]
+        return self._update(certain, np.asarray(matched, dtype=np.int64), True)
+
+    def _leaf_types(self, spec, attrs: List[str]) -> List[str]:
+        if spec is None:
+            if not attrs:
+                return sorted(self._types)
+            return sorted(set.intersection(*(self._types_with.get(a, set()) for a in attrs)))
+        if isinstance(spec, str):
+            names = [spec]
+        elif isinstance(spec, dict) and set(spec) <= {"$eq", "$in"}:
+            names = ([spec["$eq"]] if "$eq" in spec else []) + list(spec.get("$in", []))
+        else:
+            raise ValueError(f"event_type takes a name, {{'$eq': name}} or {{'$in': [...]}}, got {spec!r}")
+        for name in names:
+            known = _SCHEMA.get(name)
+            if known is None and name not in self._types:
+                raise ValueError(f"Unknown event type {name!r}")
+            for attr in attrs:
+                if known is not None and attr not in known and name not in self._types_with.get(attr, ()):
+                    raise ValueError(f"Event type {name!r} has no attribute {attr!r}")
+        return names
+
+    def _eval_condition(self, event_type: str, attr: str, ops: Dict[str, object],
+                        nw: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(certain, possible) rows having an `event_type` node whose `attr` matches `ops`."""
+        certain = np.zeros(nw, dtype="<u8")
+        possible = np.zeros(nw, dtype="<u8")
+        for value in self._values.get((event_type, attr), ()):
+            if _match_value(ops, value):
+                words = self._words(("value", event_type, attr, value), nw)
+                certain |= words
+                possible |= words
+        width = self.width(attr)
+        for bucket in self._bucket_ids.get((event_type, attr), ()):
+            c, p = _classify_bucket(ops, bucket * width, (bucket + 1) * width)
+            if p:
+                words = self._words(("bucket", event_type, attr, bucket), nw)
+                possible |= words
+                if c:
+                    certain |= words
+        return certain, possible
+
+def _node_matches(items: Tuple[Tuple[str, object], ...], conds: List[Tuple[str, Dict]]) -> bool:
+    attrs = dict(items)
+    return all(attr in attrs and _match_value(ops, attrs[attr]) for attr, ops in conds)
@@ -0,0 +1,154 @@
+from __future__ import annotations
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+import numpy as np
+from lib import instrumentation
+from classes.event_graph import EventGraph
+from lib.WL2vec import WL_neighborhood_label, _iter_batch_labels, _pack_graphs
+from lib.local_index import Match, QueryResult
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+
+def wl_label_set(graph: EventGraph, iterations: int = 3, vocab=None) -> Set[int]:
+    """Distinct WL labels of `graph` across iterations 0..h."""
+    out: Set[int] = set()
+    for labels in WL_neighborhood_label(graph, iterations, vocab=vocab):
+        out.update(labels.values())
+    return out
+
+def _fold32(labels: Iterable[int]) -> np.ndarray:
+    # xor-fold 128-bit labels to 32 bits so a * x + b below cannot overflow uint64
+    return np.fromiter(
+        ((lab ^ (lab >> 32) ^ (lab >> 64) ^ (lab >> 96)) & 0xFFFFFFFF for lab in labels),
+        dtype=np.uint64,
+    )
+
+
+class MinHasher:
+    """MinHash signatures of WL label sets with `num_perm` universal hashes (a * x + b) mod (2^61 - 1)."""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1) -> None:
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.seed = seed
+        self._a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_MERSENNE), size=num_perm, dtype=np.uint64)
+
+    def _permute(self, x: np.ndarray) -> np.ndarray:
+        return (self._a[:, None] * x[None, :] + self._b[:, None]) % _MERSENNE
+
+    def signature(self, labels: Iterable[int]) -> np.ndarray:
+        """uint64 signature of one label set; an empty set maps to all (2^61 - 1)."""
+        x = _fold32(labels)
+        if not len(x):
+            return np.full(self.num_perm, _MERSENNE, dtype=np.uint64)
+        return self._permute(x).min(axis=1)
+
+    def graph_signature(self, graph: EventGraph, iterations: int = 3, vocab=None) -> np.ndarray:
+        return self.signature(wl_label_set(graph, iterations, vocab))
+
+    def graph_signatures(self, graphs: Sequence[EventGraph], iterations: int = 3, vocab=None,
+                         chunk: int = 4096) -> np.ndarray:
+        """(len(graphs), num_perm) signatures, computed with the batched WL engine."""
+        out = np.empty((len(graphs), self.num_perm), dtype=np.uint64)
+        for start in range(0, len(graphs), chunk):
+            batch = graphs[start:start + chunk]
+            packed = _pack_graphs(batch)
+            node_graph = packed[1]
+            owners, values = [], []
+            for labels, hashes in _iter_batch_labels(packed, iterations, vocab):
+                owners.append(node_graph)
+                values.append(_fold32(hashes)[labels])
+            owners = np.concatenate(owners)
+            values = np.concatenate(values)
+            # one (graph, label) pair per distinct label, grouped by graph
+            pairs = np.unique(np.stack([owners.astype(np.uint64), values], axis=1), axis=0)
+            sig = np.full((len(batch), self.num_perm), _MERSENNE, dtype=np.uint64)
+            if len(pairs):
+                hashed = self._permute(pairs[:, 1])
+                bounds = np.flatnonzero(np.r_[True, pairs[1:, 0] != pairs[:-1, 0]])
+                sig[pairs[bounds, 0].astype(np.int64)] = np.minimum.reduceat(hashed, bounds, axis=1).T
+            out[start:start + len(batch)] = sig
+        return out
+
+def jaccard_estimate(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+
+class LSHIndex:
+    """Banded LSH over MinHash signatures: `bands` bands of `rows` values each.
+
+    Two sets collide in some band with probability 1 - (1 - J^rows)^bands,
+    a step around J ~ (1 / bands)^(1 / rows). Lookups touch only the buckets
+    the query hashes to, so their cost does not grow with the corpus.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, rows: int = 4) -> None:
+        if bands * rows > num_perm:
+            raise ValueError(f"bands * rows ({bands * rows}) exceeds num_perm ({num_perm})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = rows
+        self._buckets: List[Dict[bytes, Set[str]]] = [defaultdict(set) for _ in range(bands)]
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._metadata: Dict[str, Optional[Dict]] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._signatures
+
+    @property
+    def threshold(self) -> float:
+        """Approximate Jaccard similarity at which collision becomes likely."""
+        return (1.0 / self.bands) ** (1.0 / self.rows)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        sig = np.ascontiguousarray(signature[:self.bands * self.rows], dtype=np.uint64)
+        return [sig[b * self.rows:(b + 1) * self.rows].tobytes() for b in range(self.bands)]
+
+    def insert(self, key: str, signature: np.ndarray, metadata: Optional[Dict] = None) -> None:
+        if key in self._signatures:
+            self.remove(key)
+        for band, bkey in zip(self._buckets, self._band_keys(signature)):
+            band[bkey].add(key)
+        self._signatures[key] = np.asarray(signature, dtype=np.uint64)
+        self._metadata[key] = dict(metadata) if metadata is not None else None
+
+    def upsert(self, signatures: Dict[str, np.ndarray], metadata: Optional[Dict] = None) -> None:
+        for key, signature in signatures.items():
+            self.insert(key, signature, metadata)
+
+    def remove(self, key: str) -> None:
+        signature = self._signatures.pop(key)
+        self._metadata.pop(key, None)
+        for band, bkey in zip(self._buckets, self._band_keys(signature)):
+            bucket = band.get(bkey)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del band[bkey]
+
+    def candidates(self, signature: np.ndarray) -> Set[str]:
+        """Keys sharing at least one band bucket with `signature`."""
+        out: Set[str] = set()
+        for band, bkey in zip(self._buckets, self._band_keys(signature)):
+            bucket = band.get(bkey)
+            if bucket:
+                out |= bucket
+        return out
+
+    @instrumentation.timed("query.lsh", histogram=True)
+    def query(self, signature: np.ndarray, top_k: int = 100, include_metadata: bool = True) -> QueryResult:
+        """Candidates ranked by estimated Jaccard similarity, best first."""
+        keys = list(self.candidates(signature))
+        if not keys:
+            return QueryResult()
+        sigs = np.stack([self._signatures[k] for k in keys])
+        scores = (sigs == np.asarray(signature, dtype=np.uint64)).mean(axis=1)
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return QueryResult([
+            Match(id=keys[i], score=float(scores[i]), metadata=self._metadata[keys[i]] if include_metadata else None)
+            for i in order.tolist()
+        ])
@@ -1,10 +1,14 @@
 # sampler.py
-import re, json, random
+import re, json, random, hashlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
 from classes.event_graph import EventGraph
 from classes.event_node import EventNode
 from data.event_types import event_types  # {int: 'name'}
+from lib import instrumentation
 from pathlib import Path
 
 # small vocabularies for attribute sampling
@@ -91,6 +95,12 @@ def compile_rules(raw: Dict) -> List[Rule]:
         ))
     return rules
 
+def rules_checksum(rules_json_path: Optional[str] = None) -> str:
+    """Digest of a rules file's parsed content (key order and whitespace do not matter)."""
+    raw = json.load(open(rules_json_path)) if rules_json_path else {}
+    canonical = json.dumps(raw, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
 def match_rules(rules: List[Rule], name: str) -> List[Rule]:
     return [r for r in rules if r.pattern.search(name)]
 
@@ -119,6 +129,96 @@ def max_count_for(rules_for_e: List[Rule]) -> Optional[int]:
     caps=[r.max_count for r in rules_for_e if r.max_count is not None]
     return min(caps) if caps else None
 
+# ---------- Compiled sampler plan ----------
+_NO_CAP = np.iinfo(np.int64).max
+
+@dataclass
+class SamplerPlan:
+    """Rule set evaluated once against an event vocabulary.
+
+    - `ages[a]` holds the ids (into `names`) of events allowed at age `a` with a
+      positive base rate, in vocabulary order, and `rates[a]` their probabilities.
+    - `prereqs[i]` is a bitmask over event ids that must have occurred first.
+    - `caps[i]` is the max count of event i (int64 max when uncapped).
+    """
+    names: List[str]
+    matched: List[List[Rule]]
+    default_rate: float
+    prereqs: np.ndarray
+    caps: np.ndarray
+    ages: List[np.ndarray] = field(default_factory=list)
+    rates: List[np.ndarray] = field(default_factory=list)
+
+    def table(self, age: int) -> Tuple[np.ndarray, np.ndarray]:
+        while len(self.ages) <= age:
+            self._compile_age(len(self.ages))
+        return self.ages[age], self.rates[age]
+
+    def _compile_age(self, age: int) -> None:
+        ids, rates = [], []
+        for i, rs in enumerate(self.matched):
+            if self.prereqs[i] == _UNSATISFIABLE or not allowed_by_age(rs, age):
+                continue
+            p = base_rate_for_age(rs, age, self.default_rate)
+            if p > 0.0:
+                ids.append(i)
+                rates.append(p)
+        self.ages.append(np.asarray(ids, dtype=np.int64))
+        self.rates.append(np.asarray(rates, dtype=np.float64))
+
+# prerequisite naming an event outside the vocabulary: can never be met
+_UNSATISFIABLE = np.uint64(np.iinfo(np.uint64).max)
+
+def compile_plan(rules: List[Rule], names: Optional[List[str]] = None, default_rate: float = 0.01,
+                 max_age: int = 90) -> SamplerPlan:
+    """Precompile `rules` for `sample_graph`: per-age candidate tables, prerequisite bitmasks and caps."""
+    if names is None:
+        names = [v["event_type"] for v in event_types.values()]
+    if len(names) > 64:
+        raise ValueError(f"SamplerPlan supports at most 64 event types, got {len(names)}")
+    index = {name: i for i, name in enumerate(names)}
+    matched = [match_rules(rules, n) for n in names]
+
+    prereqs = np.zeros(len(names), dtype=np.uint64)
+    caps = np.full(len(names), _NO_CAP, dtype=np.int64)
+    for i, rs in enumerate(matched):
+        mask = 0
+        for req in prereqs_for(rs):
+            if req not in index:
+                mask = None
+                break
+            mask |= 1 << index[req]
+        prereqs[i] = _UNSATISFIABLE if mask is None else np.uint64(mask)
+        cap = max_count_for(rs)
+        if cap is not None:
+            caps[i] = cap
+
+    plan = SamplerPlan(names, matched, default_rate, prereqs, caps)
+    plan.table(max_age)
+    return plan
+
+# plans compiled from raw rule lists, keyed by the rules' content
+_PLANS: "OrderedDict[tuple, SamplerPlan]" = OrderedDict()
+_MAX_PLANS = 8
+
+def _rule_key(r: Rule) -> tuple:
+    return (r.pattern.pattern, r.pattern.flags, tuple(r.prereqs), r.age_min, r.age_max, r.max_count,
+            tuple(r.base_rates))
+
+def plan_for(rules: Union[List[Rule], SamplerPlan], default_rate: float = 0.01) -> SamplerPlan:
+    """`rules` itself if already a `SamplerPlan`, else `compile_plan(rules)`, compiled once per distinct rule set."""
+    if isinstance(rules, SamplerPlan):
+        return rules
+    key = (default_rate, tuple(_rule_key(r) for r in rules))
+    plan = _PLANS.get(key)
+    if plan is None:
+        plan = _PLANS[key] = compile_plan(rules, default_rate=default_rate)
+        if len(_PLANS) > _MAX_PLANS:
+            _PLANS.popitem(last=False)
+    else:
+        _PLANS.move_to_end(key)
+    return plan
+
 # ---------- Sampler (name-agnostic) ----------
 def add_event(graph, name, last, *, age: Optional[int] = None, rng: Optional[random.Random] = None):
     """Add an EventNode to `graph`. If `rng` is provided, synthesize attributes using `generate_event_attributes`.
@@ -134,21 +234,26 @@ def add_event(graph, name, last, *, age: Optional[int] = None, rng: Optional[ran
         graph.add_edge(last, node)
     return node
 
-def sample_graph(rng: random.Random, max_events: int, rules: List[Rule],
+@instrumentation.timed("sampler.sample_graph")
+def sample_graph(rng: random.Random, max_events: int, rules: Union[List[Rule], SamplerPlan],
                  age_max_dist=(70,75,80,85,90), age_max_w=(0.1,0.2,0.35,0.25,0.1),
                  default_rate=0.01) -> EventGraph:
+    """Sample one life-event graph.
+
+    `rules` is best passed as a `SamplerPlan` from `compile_plan`, which carries
+    its own `default_rate`; a raw rule list goes through `plan_for`, so it
+    is compiled once and reused by later calls with the same rules.
+    """
+    plan = plan_for(rules, default_rate)
     g = EventGraph()
     last = None
-    names = [v["event_type"] for v in event_types.values()]
-    seen_counts: Dict[str,int] = {}
-
-    # quick index of name -> matched rules
-    matched: Dict[str, List[Rule]] = {n: match_rules(rules, n) for n in names}
+    names = plan.names
+    counts = np.zeros(len(names), dtype=np.int64)
 
     age_max = rng.choices(age_max_dist, weights=age_max_w, k=1)[0]
 
     # track which prereqs are satisfied: any event’s occurrence satisfies itself
-    occurred = set()
+    occurred = np.uint64(0)
 
     # sample a random target number of events: 2 - max_events
     target_events = rng.randint(2, max_events)
@@ -157,28 +262,16 @@ def sample_graph(rng: random.Random, max_events: int, rules: List[Rule],
         if len(g.nodes) >= target_events:
             break
         
-        # collect candidates allowed by age, prereqs, and caps
-        candidates=[]
-        for name in names:
-            rs = matched[name]
-            if not allowed_by_age(rs, age): 
-                continue
-            reqs = prereqs_for(rs)
-            if any(req not in occurred for req in reqs):
-                continue
-            cap = max_count_for(rs)
-            if cap is not None and seen_counts.get(name,0) >= cap:
-                continue
-            p = base_rate_for_age(rs, age, default_rate)
-            if p > 0.0:
-                candidates.append((name, p))
+        # candidates allowed by age (precompiled), then by prereqs and caps
+        ids, rates = plan.table(age)
+        ok = ((plan.prereqs[ids] & ~occurred) == 0) & (counts[ids] < plan.caps[ids])
+        ids, rates = ids[ok], rates[ok]
 
-        # Bernoulli per candidate, then sort by probability to stabilize density
-        rng.shuffle(candidates)
-        fired=[]
-        for name, p in candidates:
-            if rng.random() < p:
-                fired.append(name)
+        # Bernoulli per candidate in shuffled order; draws stay on `rng` so runs are reproducible
+        order = list(range(len(ids)))
+        rng.shuffle(order)
+        draws = np.fromiter((rng.random() for _ in order), dtype=np.float64, count=len(order))
+        fired = [names[i] for i in ids[order][draws < rates[order]].tolist()]
 
         # optional: enforce at most K events per age to keep chains reasonable
         K = 3
@@ -189,16 +282,126 @@ def sample_graph(rng: random.Random, max_events: int, rules: List[Rule],
         for name in sorted(fired):
             # pass current age and RNG so attributes get sampled per event
             last = add_event(g, name, last, age=age, rng=rng)
-            occurred.add(name)
-            seen_counts[name] = seen_counts.get(name,0) + 1
+            i = names.index(name)
+            occurred |= np.uint64(1 << i)
+            counts[i] += 1
 
+    if instrumentation.enabled:
+        instrumentation.count("sampler.graphs")
+        instrumentation.count("sampler.events", len(g.nodes))
     return g
 
-def generate_noise_graphs(n: int, max_events: int=80, rules_json_path: Optional[str]=None, seed: int=1337) -> List[EventGraph]:
-    rng = random.Random(seed)
+def graph_seed(seed: int, index: int) -> int:
+    """Seed for graph `index` of a corpus, independent of every other graph in it."""
+    h = hashlib.blake2b(f"{seed}:{index}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(h, "little")
+
+def sample_indexed_graph(index: int, seed: int, max_events: int, rules: Union[List[Rule], SamplerPlan],
+                         freeze: bool=False):
+    """Sample graph `index` of the corpus `seed` from its own derived RNG."""
+    g = sample_graph(random.Random(graph_seed(seed, index)), max_events, rules)
+    return g.freeze() if freeze else g
+
+# per-process state for pooled generation, set once by the pool initializer
+_worker_args: Optional[Tuple] = None
+
+def _init_worker(seed: int, max_events: int, rules: SamplerPlan, freeze: bool) -> None:
+    global _worker_args
+    _worker_args = (seed, max_events, rules, freeze)
+
+def _sample_in_worker(index: int):
+    seed, max_events, rules, freeze = _worker_args
+    return sample_indexed_graph(index, seed, max_events, rules, freeze)
+
+class NoiseCorpus:
+    """Lazy, reproducible corpus: graph i is re-sampled from `graph_seed(seed, i)` when accessed.
+
+    Supports `len()`, indexing and slicing (a slice is another lazy view).
+    `+` with a list or another corpus materializes both into a plain list.
+    The `cache_size` most recently used graphs are kept; anything evicted is
+    regenerated on demand with the same structure and attributes, but fresh
+    node uuids unless `freeze=True`.
+    """
+
+    def __init__(self, n: int, max_events: int, plan: SamplerPlan, seed: int, freeze: bool = False,
+                 cache_size: int = 128, _indices: Optional[range] = None,
+                 _cache: Optional["OrderedDict[int, object]"] = None) -> None:
+        self.max_events = max_events
+        self.plan = plan
+        self.seed = seed
+        self.freeze = freeze
+        self.cache_size = cache_size
+        self._indices = _indices if _indices is not None else range(n)
+        self._cache: "OrderedDict[int, object]" = _cache if _cache is not None else OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return NoiseCorpus(0, self.max_events, self.plan, self.seed, self.freeze, self.cache_size,
+                               _indices=self._indices[key], _cache=self._cache)
+        return self._get(self._indices[key])
+
+    def __add__(self, other):
+        if not isinstance(other, (list, NoiseCorpus)):
+            return NotImplemented
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        if not isinstance(other, list):
+            return NotImplemented
+        return other + list(self)
+
+    def __iter__(self):
+        # streaming access: regenerate without churning the cache
+        for index in self._indices:
+            cached = self._cache.get(index)
+            yield cached if cached is not None else self._sample(index)
+
+    def _sample(self, index: int):
+        return sample_indexed_graph(index, self.seed, self.max_events, self.plan, self.freeze)
+
+    def _get(self, index: int):
+        g = self._cache.get(index)
+        if g is not None:
+            self._cache.move_to_end(index)
+            return g
+        g = self._sample(index)
+        if self.cache_size > 0:
+            self._cache[index] = g
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return g
+
+def generate_noise_graphs(n: int, max_events: int=80, rules_json_path: Optional[str]=None, seed: int=1337,
+                          freeze: bool=False, workers: Optional[int]=None, lazy: bool=False,
+                          cache_size: int=128) -> Union[List[EventGraph], NoiseCorpus]:
+    """Sample `n` graphs. With `freeze=True` each is returned as a read-only `FrozenEventGraph`.
+
+    By default all graphs are drawn from one shared `random.Random(seed)`, so
+    graph i depends on graphs 0..i-1. Passing `workers` switches to per-graph
+    seeds from `graph_seed(seed, i)` and samples over a process pool of that
+    size; the result is the same for every worker count (but differs from the
+    shared-stream default). `lazy=True` returns a `NoiseCorpus` over the same
+    per-graph seeds instead of materializing any graph.
+    """
     # empty rules if none provided
     rules = compile_rules(json.load(open(rules_json_path))) if rules_json_path else []
-    return [sample_graph(rng, max_events, rules) for _ in range(n)]
+    plan = compile_plan(rules)
+    if lazy:
+        return NoiseCorpus(n, max_events, plan, seed, freeze=freeze, cache_size=cache_size)
+    if workers is None:
+        rng = random.Random(seed)
+        graphs = (sample_graph(rng, max_events, plan) for _ in range(n))
+        return [g.freeze() for g in graphs] if freeze else list(graphs)
+
+    if workers <= 1:
+        return [sample_indexed_graph(i, seed, max_events, plan, freeze) for i in range(n)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(seed, max_events, plan, freeze)) as pool:
+        chunksize = max(1, n // (workers * 4))
+        return list(pool.map(_sample_in_worker, range(n), chunksize=chunksize))
 
 # ---------- Example usage ----------
 if __name__ == "__main__":
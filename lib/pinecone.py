@@ -1,7 +1,10 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from pinecone import Pinecone
 from dotenv import load_dotenv
 import os
+from concurrent.futures import ThreadPoolExecutor
+from lib import instrumentation
+from lib.sparse_fingerprint import SparseFingerprint
 
 load_dotenv()
 pc = Pinecone(api_key=os.getenv("PINECONE_KEY"))
@@ -9,6 +12,9 @@ vdb = pc.Index(host=os.getenv("PINECONE_HOST"))
 
 def upsert(fingerprints: Dict[str, List[float]], metadata = None) -> None:
     vectors = [{"id": fid, "values": fingerprint} for fid, fingerprint in fingerprints.items()]
+    if instrumentation.enabled:
+        instrumentation.count("upsert.batches")
+        instrumentation.count("upsert.vectors", len(vectors))
 
     vdb.upsert(
         vectors=vectors,
@@ -16,7 +22,19 @@ def upsert(fingerprints: Dict[str, List[float]], metadata = None) -> None:
         metadata=metadata
     )
 
-def query(fingerprint: List[float], top_k=100):
+def upsert_sparse(fingerprints: Dict[str, SparseFingerprint], metadata = None) -> None:
+    """Upsert sparse fingerprints as Pinecone sparse vectors (needs a sparse index)."""
+    vectors = [{"id": fid, "sparse_values": fingerprint.to_pinecone()} for fid, fingerprint in fingerprints.items()]
+
+    vdb.upsert(
+        vectors=vectors,
+        namespace="wwmp",
+        metadata=metadata
+    )
+
+@instrumentation.timed("query.pinecone", histogram=True)
+def query(fingerprint: List[float], top_k=100, filter: Optional[Dict] = None):
+    """`filter` is a Pinecone metadata filter; graph-content filters are local only (`lib.metadata_filter`)."""
     results = vdb.query_namespaces(
         vector=fingerprint,
         namespaces=['wwmp'],
@@ -24,7 +42,12 @@ def query(fingerprint: List[float], top_k=100):
         top_k=top_k,
         include_values=False,
         include_metadata=True,
-        # filter={"genre": { "$eq": "comedy" }},
+        filter=filter,
         show_progress=False,
     )
-    return results
\ No newline at end of file
+    return results
+
+def query_many(fingerprints: List[List[float]], top_k=100, concurrency: int = 8, filter: Optional[Dict] = None):
+    """Issue `query` for every fingerprint concurrently; results come back in input order."""
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(lambda fp: query(fp, top_k, filter), fingerprints))
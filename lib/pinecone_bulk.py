@@ -0,0 +1,236 @@
+from __future__ import annotations
+import http.client, json, os, queue, random, threading, time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+import numpy as np
+from dotenv import load_dotenv
+from lib import instrumentation
+from lib.local_index import Match, QueryResult
+from lib.sparse_fingerprint import Fingerprint, SparseFingerprint
+
+load_dotenv()
+
+# Pinecone caps a request at 2 MB and 1000 vectors
+MAX_REQUEST_BYTES = 2 * 1024 * 1024
+MAX_REQUEST_VECTORS = 1000
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class PineconeHTTPError(RuntimeError):
+    def __init__(self, status: int, body: str) -> None:
+        super().__init__(f"Pinecone request failed with HTTP {status}: {body[:200]}")
+        self.status = status
+        self.body = body
+
+
+@dataclass
+class UpsertStats:
+    vectors: int = 0
+    batches: int = 0
+    bytes: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+
+    @property
+    def vectors_per_sec(self) -> float:
+        return self.vectors / self.seconds if self.seconds else 0.0
+
+    @property
+    def mb_per_sec(self) -> float:
+        return self.bytes / 1e6 / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.vectors} vectors in {self.batches} batches, {self.bytes / 1e6:.1f} MB, "
+                f"{self.retries} retries, {self.seconds:.2f}s "
+                f"({self.vectors_per_sec:,.0f} vec/s, {self.mb_per_sec:.1f} MB/s)")
+
+
+class PineconeHTTPClient:
+    """Minimal Pinecone data-plane client over a pool of keep-alive connections.
+
+    At most `concurrency` requests are in flight, one per pooled connection.
+    Requests failing with 429/5xx or a connection error are retried up to
+    `max_retries` times with exponential backoff plus jitter.
+    """
+
+    def __init__(self, host: Optional[str] = None, api_key: Optional[str] = None, concurrency: int = 8,
+                 timeout: float = 30.0, max_retries: int = 5, backoff: float = 0.25) -> None:
+        host = host or os.getenv("PINECONE_HOST")
+        if not host:
+            raise ValueError("No Pinecone host given and PINECONE_HOST is not set")
+        parts = urlsplit(host if "://" in host else f"https://{host}")
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.api_key = api_key if api_key is not None else os.getenv("PINECONE_KEY", "")
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._pool: "queue.LifoQueue[Optional[http.client.HTTPConnection]]" = queue.LifoQueue()
+        for _ in range(concurrency):
+            self._pool.put(None)  # connections are opened lazily
+        self._retries = 0
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        while not self._pool.empty():
+            conn = self._pool.get_nowait()
+            if conn is not None:
+                conn.close()
+
+    def __enter__(self) -> "PineconeHTTPClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def retries(self) -> int:
+        return self._retries
+
+    def post(self, path: str, payload: Union[Dict, bytes]) -> Dict:
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        headers = {"Api-Key": self.api_key, "Content-Type": "application/json", "Accept": "application/json"}
+        conn = self._pool.get()
+        try:
+            for attempt in range(self.max_retries + 1):
+                status, text = None, ""
+                try:
+                    if conn is None:
+                        conn = self._connect()
+                    conn.request("POST", path, body=body, headers=headers)
+                    resp = conn.getresponse()
+                    status, text = resp.status, resp.read().decode("utf-8")
+                    if resp.will_close:
+                        conn.close()
+                        conn = None
+                    if status < 300:
+                        return json.loads(text) if text else {}
+                    if status not in _RETRY_STATUS:
+                        raise PineconeHTTPError(status, text)
+                except (OSError, http.client.HTTPException):
+                    if conn is not None:
+                        conn.close()
+                    conn = None
+                    if attempt == self.max_retries:
+                        raise
+                if attempt == self.max_retries:
+                    raise PineconeHTTPError(status, text)
+                with self._lock:
+                    self._retries += 1
+                if instrumentation.enabled:
+                    instrumentation.count("pinecone.retries")
+                time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+        finally:
+            self._pool.put(conn)
+
+    @instrumentation.timed("query.pinecone", histogram=True)
+    def query(self, fingerprint: Fingerprint, top_k: int = 100, namespace: str = "wwmp",
+              include_metadata: bool = True) -> QueryResult:
+        payload = {"namespace": namespace, "topK": top_k, "includeMetadata": include_metadata,
+                   "includeValues": False}
+        if isinstance(fingerprint, SparseFingerprint):
+            payload["sparseVector"] = fingerprint.to_pinecone()
+        else:
+            payload["vector"] = fingerprint.tolist() if isinstance(fingerprint, np.ndarray) else list(fingerprint)
+        resp = self.post("/query", payload)
+        return QueryResult([Match(m["id"], m.get("score", 0.0), m.get("metadata")) for m in resp.get("matches", [])])
+
+    def query_many(self, fingerprints: Iterable[Fingerprint], top_k: int = 100, namespace: str = "wwmp",
+                   include_metadata: bool = True) -> List[QueryResult]:
+        """Pipeline queries over every pooled connection at once; results are in input order."""
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            return list(pool.map(lambda fp: self.query(fp, top_k, namespace, include_metadata), fingerprints))
+
+    def _connect(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.netloc, timeout=self.timeout)
+
+
+def _as_vector(fid: str, fingerprint: Fingerprint, metadata: Optional[Dict]) -> Dict:
+    if isinstance(fingerprint, SparseFingerprint):
+        vector = {"id": fid, "sparseValues": fingerprint.to_pinecone()}
+    else:
+        values = fingerprint.tolist() if isinstance(fingerprint, np.ndarray) else list(fingerprint)
+        vector = {"id": fid, "values": values}
+    if metadata:
+        vector["metadata"] = metadata
+    return vector
+
+def iter_batches(fingerprints: Union[Dict[str, Fingerprint], Iterable[Tuple[str, Fingerprint]]],
+                 metadata: Optional[Dict] = None, namespace: str = "wwmp",
+                 max_bytes: int = MAX_REQUEST_BYTES, max_vectors: int = MAX_REQUEST_VECTORS) -> Iterator[Tuple[bytes, int]]:
+    """Yield (encoded upsert request body, vector count), each within `max_bytes` and `max_vectors`."""
+    items = fingerprints.items() if isinstance(fingerprints, dict) else fingerprints
+    head = b'{"namespace": ' + json.dumps(namespace).encode("utf-8") + b', "vectors": ['
+    tail = b"]}"
+    chunks: List[bytes] = []
+    size = len(head) + len(tail)
+    for fid, fingerprint in items:
+        encoded = json.dumps(_as_vector(fid, fingerprint, metadata)).encode("utf-8")
+        if len(head) + len(tail) + len(encoded) > max_bytes:
+            raise ValueError(f"Vector {fid!r} alone exceeds the {max_bytes}-byte request limit")
+        if chunks and (size + len(encoded) + 1 > max_bytes or len(chunks) >= max_vectors):
+            yield head + b",".join(chunks) + tail, len(chunks)
+            chunks, size = [], len(head) + len(tail)
+        chunks.append(encoded)
+        size += len(encoded) + 1
+    if chunks:
+        yield head + b",".join(chunks) + tail, len(chunks)
+
+def bulk_upsert(fingerprints: Union[Dict[str, Fingerprint], Iterable[Tuple[str, Fingerprint]]],
+                metadata: Optional[Dict] = None, namespace: str = "wwmp",
+                client: Optional[PineconeHTTPClient] = None, concurrency: int = 8,
+                max_bytes: int = MAX_REQUEST_BYTES, max_vectors: int = MAX_REQUEST_VECTORS) -> UpsertStats:
+    """Upsert fingerprints in size-bounded batches sent concurrently; returns throughput stats.
+
+    `fingerprints` may be a dict or any iterable of (id, fingerprint) pairs,
+    such as `FingerprintStore.items()` streaming rows straight off disk;
+    batches are encoded lazily, so at most about 2 * concurrency requests
+    are held in memory at once.
+    """
+    own_client = client is None
+    client = client or PineconeHTTPClient(concurrency=concurrency)
+    stats = UpsertStats()
+    retries_before = client.retries
+    in_flight = threading.BoundedSemaphore(2 * client.concurrency)
+    start = time.perf_counter()
+
+    def send(body: bytes, count: int) -> Tuple[int, int]:
+        try:
+            with instrumentation.timer("upsert.request", histogram=True):
+                client.post("/vectors/upsert", body)
+            if instrumentation.enabled:
+                instrumentation.count("upsert.batches")
+                instrumentation.count("upsert.vectors", count)
+                instrumentation.count("upsert.bytes", len(body))
+            return count, len(body)
+        finally:
+            in_flight.release()
+
+    try:
+        with ThreadPoolExecutor(max_workers=client.concurrency) as pool:
+            pending: Deque[Future] = deque()
+
+            def collect(fut: Future) -> None:
+                count, nbytes = fut.result()
+                stats.vectors += count
+                stats.batches += 1
+                stats.bytes += nbytes
+
+            for body, count in iter_batches(fingerprints, metadata, namespace, max_bytes, max_vectors):
+                in_flight.acquire()
+                pending.append(pool.submit(send, body, count))
+                while pending and pending[0].done():
+                    collect(pending.popleft())
+            while pending:
+                collect(pending.popleft())
+    finally:
+        if own_client:
+            client.close()
+    stats.seconds = time.perf_counter() - start
+    stats.retries = client.retries - retries_before
+    return stats
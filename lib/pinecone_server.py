@@ -0,0 +1,155 @@
+"""Local HTTP stand-in for the Pinecone data plane, for offline ingest/query benchmarks.
+
+Serves `POST /vectors/upsert`, `POST /query` and `POST /describe_index_stats`
+with Pinecone's JSON shapes, backed by one `FingerprintIndex` per namespace.
+
+    python -m lib.pinecone_server --port 5081 --dimension 1024
+"""
+from __future__ import annotations
+import argparse, json, random, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+import numpy as np
+from lib.local_index import FingerprintIndex
+from lib.sparse_fingerprint import SparseFingerprint
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, dimension: int = 1024,
+                 fail_rate: float = 0.0, latency: float = 0.0, seed: int = 0) -> None:
+        super().__init__((host, port), _Handler)
+        self.dimension = dimension
+        self.fail_rate = fail_rate      # fraction of requests answered with 503, to exercise retries
+        self.latency = latency          # seconds added to every request
+        self.indexes: Dict[str, FingerprintIndex] = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def index(self, namespace: str) -> FingerprintIndex:
+        idx = self.indexes.get(namespace)
+        if idx is None:
+            idx = self.indexes[namespace] = FingerprintIndex(self.dimension)
+        return idx
+
+    def start(self) -> "StandInServer":
+        """Serve from a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            self.requests += 1
+            return self.fail_rate > 0.0 and self._rng.random() < self.fail_rate
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so client connection pooling is exercised
+    server: StandInServer
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.should_fail():
+            return self._send(503, {"error": "injected failure"})
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            return self._send(400, {"error": "invalid JSON"})
+
+        if self.path == "/vectors/upsert":
+            return self._send(200, self._upsert(payload))
+        if self.path == "/query":
+            return self._send(200, self._query(payload))
+        if self.path == "/describe_index_stats":
+            return self._send(200, self._stats())
+        self._send(404, {"error": f"unknown path {self.path}"})
+
+    def _values(self, vector: Dict):
+        if "values" in vector and vector["values"]:
+            return vector["values"]
+        sparse = vector.get("sparseValues") or vector.get("sparse_values") or {}
+        return SparseFingerprint(np.asarray(sparse.get("indices", []), dtype=np.int64),
+                                 np.asarray(sparse.get("values", []), dtype=np.float32), self.server.dimension)
+
+    def _upsert(self, payload: Dict) -> Dict:
+        vectors = payload.get("vectors", [])
+        # group by metadata, since FingerprintIndex.upsert attaches one metadata dict per call
+        groups: Dict[str, Dict] = {}
+        for v in vectors:
+            key = json.dumps(v.get("metadata"), sort_keys=True)
+            groups.setdefault(key, {})[v["id"]] = self._values(v)
+        with self.server.lock:
+            idx = self.server.index(payload.get("namespace", ""))
+            for key, fingerprints in groups.items():
+                idx.upsert(fingerprints, json.loads(key))
+        return {"upsertedCount": len(vectors)}
+
+    def _query(self, payload: Dict) -> Dict:
+        namespace = payload.get("namespace", "")
+        vector = payload.get("vector")
+        if vector is None:
+            vector = self._values({"sparseValues": payload.get("sparseVector", {})})
+        with self.server.lock:
+            idx = self.server.indexes.get(namespace)
+            result = idx.query(vector, int(payload.get("topK", 10)), payload.get("includeMetadata", False)) if idx else None
+        matches = [] if result is None else [
+            {"id": m.id, "score": m.score, **({"metadata": m.metadata} if m.metadata is not None else {})}
+            for m in result.matches
+        ]
+        return {"matches": matches, "namespace": namespace}
+
+    def _stats(self) -> Dict:
+        with self.server.lock:
+            namespaces = {ns: {"vectorCount": len(idx)} for ns, idx in self.server.indexes.items()}
+        return {
+            "dimension": self.server.dimension,
+            "namespaces": namespaces,
+            "totalVectorCount": sum(ns["vectorCount"] for ns in namespaces.values()),
+        }
+
+    def _send(self, status: int, payload: Dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5081)
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    server = StandInServer(args.host, args.port, args.dimension, args.fail_rate, args.latency)
+    print(f"Pinecone stand-in listening on {server.url}")
+    server.serve_forever()
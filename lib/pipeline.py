@@ -0,0 +1,258 @@
+"""Streaming generate -> fingerprint -> index pipeline with bounded memory.
+
+    index = FingerprintIndex(1024)
+    stats = run_pipeline(index, n=1_000_000, rules_json_path=RULES_PATH, fp_workers=4)
+    print(stats)
+
+Each stage runs in its own thread and hands chunks of `chunk_size` graphs to
+the next through a `queue.Queue(queue_size)`; a stage blocks when its
+downstream queue is full, so at most about
+(queue_size + in-flight work) * chunk_size graphs exist at once, whatever `n`.
+Stages given `workers` > 1 farm chunks out to a process pool and keep
+results in order.
+"""
+from __future__ import annotations
+import json, queue, threading, time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from lib.WL2vec import get_hash_family, graphs_to_fingerprints
+from lib.noise_sampler import compile_plan, compile_rules, sample_indexed_graph
+
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    name: str
+    chunks: int = 0
+    items: int = 0
+    busy: float = 0.0      # seconds spent producing output
+    blocked: float = 0.0   # seconds waiting for the downstream queue
+
+    @property
+    def items_per_sec(self) -> float:
+        return self.items / self.busy if self.busy else 0.0
+
+
+@dataclass
+class PipelineStats:
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+    seconds: float = 0.0
+
+    @property
+    def items(self) -> int:
+        return next(reversed(self.stages.values())).items if self.stages else 0
+
+    @property
+    def items_per_sec(self) -> float:
+        return self.items / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        lines = [f"{self.items} graphs in {self.seconds:.2f}s ({self.items_per_sec:,.0f} graphs/s)"]
+        for s in self.stages.values():
+            lines.append(f"  {s.name:<12} {s.items:>10} items  busy {s.busy:8.2f}s  "
+                         f"blocked {s.blocked:8.2f}s  {s.items_per_sec:12,.0f} items/s")
+        return "\n".join(lines)
+
+
+# ---- stage functions (module-level so process pools can pickle them) ----
+def _generate_chunk(span: Tuple[int, int], seed: int, max_events: int, plan) -> Tuple[int, List]:
+    start, stop = span
+    return start, [sample_indexed_graph(i, seed, max_events, plan, freeze=True) for i in range(start, stop)]
+
+def _fingerprint_chunk(chunk: Tuple[int, List], D: int, iterations: int, vocab=None,
+                       hash_family=None) -> Tuple[int, np.ndarray]:
+    start, graphs = chunk
+    return start, graphs_to_fingerprints(graphs, D, iterations, vocab, hash_family=hash_family)
+
+def _cached_fingerprint_chunk(chunk: Tuple[int, List], cache) -> Tuple[int, np.ndarray]:
+    start, graphs = chunk
+    return start, cache.fingerprints(graphs)
+
+def _chunked(graphs: Iterable, chunk_size: int) -> Iterator[Tuple[int, List]]:
+    start, batch = 0, []
+    for g in graphs:
+        batch.append(g)
+        if len(batch) == chunk_size:
+            yield start, batch
+            start, batch = start + chunk_size, []
+    if batch:
+        yield start, batch
+
+def as_sink(target) -> Callable[[List[str], np.ndarray], None]:
+    """Adapt an index writer to `sink(ids, matrix)`.
+
+    Accepts a `FingerprintStore` (append), anything with the `upsert(dict)`
+    contract (`FingerprintIndex`, `HNSWIndex`, `lib.pinecone`), or a callable
+    taking (ids, matrix) as is, e.g. `lambda ids, m: bulk_upsert(zip(ids, m), client=client)`.
+    """
+    if hasattr(target, "append") and hasattr(target, "header"):
+        return target.append
+    if hasattr(target, "upsert"):
+        return lambda ids, matrix: target.upsert(dict(zip(ids, matrix)))
+    if callable(target):
+        return target
+    raise TypeError(f"Cannot write fingerprints to {type(target).__name__}")
+
+
+class _Stage(threading.Thread):
+    """Apply `fn` to every item of `source` and put the results on `outbox`, in order."""
+
+    def __init__(self, name: str, fn: Callable, source: Iterable, outbox: Optional[queue.Queue],
+                 stop: threading.Event, stats: StageStats, size: Callable[[Any], int],
+                 pool: Optional[Executor] = None, max_in_flight: int = 1) -> None:
+        super().__init__(name=f"pipeline-{name}", daemon=True)
+        self.fn, self.source, self.outbox = fn, source, outbox
+        self.stop, self.stats, self.size = stop, stats, size
+        self.pool, self.max_in_flight = pool, max_in_flight
+        self.error: Optional[BaseException] = None
+
+    def run(self) -> None:
+        try:
+            if self.pool is None:
+                for item in self.source:
+                    if self.stop.is_set():
+                        return
+                    t0 = time.perf_counter()
+                    result = self.fn(item)
+                    self.stats.busy += time.perf_counter() - t0
+                    self._emit(result)
+            else:
+                self._run_pooled()
+        except BaseException as e:
+            self.error = e
+            self.stop.set()
+        finally:
+            if self.outbox is not None:
+                self._put(_DONE)
+
+    def _run_pooled(self) -> None:
+        pending: Deque[Future] = deque()
+        t0 = time.perf_counter()
+        for item in self.source:
+            if self.stop.is_set():
+                return
+            pending.append(self.pool.submit(self.fn, item))
+            while len(pending) >= self.max_in_flight or (pending and pending[0].done()):
+                self._emit_pooled(pending.popleft().result(), t0)
+                t0 = time.perf_counter()
+        while pending:
+            self._emit_pooled(pending.popleft().result(), t0)
+            t0 = time.perf_counter()
+
+    def _emit_pooled(self, result, t0: float) -> None:
+        # wall time between outputs, i.e. the pool's effective throughput
+        self.stats.busy += time.perf_counter() - t0
+        self._emit(result)
+
+    def _emit(self, result) -> None:
+        self.stats.chunks += 1
+        self.stats.items += self.size(result)
+        if self.outbox is not None:
+            t0 = time.perf_counter()
+            self._put(result)
+            self.stats.blocked += time.perf_counter() - t0
+
+    def _put(self, item) -> None:
+        while True:
+            try:
+                self.outbox.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self.stop.is_set():  # downstream failed; nobody will drain the queue
+                    return
+
+def _drain(inbox: queue.Queue, stop: threading.Event) -> Iterator:
+    while True:
+        try:
+            item = inbox.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                return
+            continue
+        if item is _DONE:
+            return
+        yield item
+
+def run_pipeline(sink, n: int = 0, max_events: int = 80, rules_json_path: Optional[str] = None,
+                 seed: int = 1337, graphs: Optional[Iterable] = None, D: int = 1024, iterations: int = 3,
+                 vocab=None, chunk_size: int = 1024, queue_size: int = 4, gen_workers: int = 1,
+                 fp_workers: int = 1, id_prefix: str = "", hash_family=None, cache=None) -> PipelineStats:
+    """Stream `n` noise graphs (or the given `graphs` iterable) into `sink` chunk by chunk.
+
+    Generated graph i is `sample_indexed_graph(i, seed, ...)`, the corpus of
+    `generate_noise_graphs(n, ..., workers=k)`, and gets id `f"{id_prefix}{i}"`.
+    `graphs` may be any iterable, e.g. a `GraphReader` or a lazy `NoiseCorpus`.
+    A shared `vocab` only applies with `fp_workers=1`. See `as_sink` for
+    accepted sinks. A `lib.dedup.FingerprintCache` given as `cache` (with
+    `fp_workers=1`) fingerprints each distinct graph once and must match
+    `D`, `iterations` and `hash_family`; every id is still written. Returns per-stage throughput.
+    """
+    if cache is not None:
+        if fp_workers > 1:
+            raise ValueError("cache only applies with fp_workers=1")
+        scheme = get_hash_family(hash_family).name
+        if (cache.D, cache.iterations, cache.hash_scheme) != (D, iterations, scheme):
+            raise ValueError(f"cache fingerprints D={cache.D}, iterations={cache.iterations}, "
+                             f"hash_family={cache.hash_scheme!r}; "
+                             f"wanted D={D}, iterations={iterations}, hash_family={scheme!r}")
+    write = as_sink(sink)
+    stop = threading.Event()
+    stats = PipelineStats()
+    pools: List[Executor] = []
+    to_fp: queue.Queue = queue.Queue(queue_size)
+    to_sink: queue.Queue = queue.Queue(queue_size)
+
+    def pool_for(workers: int) -> Optional[Executor]:
+        if workers <= 1:
+            return None
+        pools.append(ProcessPoolExecutor(max_workers=workers))
+        return pools[-1]
+
+    if graphs is None:
+        rules = compile_rules(json.load(open(rules_json_path))) if rules_json_path else []
+        spans = ((s, min(s + chunk_size, n)) for s in range(0, n, chunk_size))
+        source_fn, source = partial(_generate_chunk, seed=seed, max_events=max_events, plan=compile_plan(rules)), spans
+        source_name, source_workers = "generate", gen_workers
+    else:
+        source_fn, source = (lambda chunk: chunk), _chunked(graphs, chunk_size)
+        source_name, source_workers = "read", 1
+
+    def write_chunk(chunk: Tuple[int, np.ndarray]) -> Tuple[int, np.ndarray]:
+        start, matrix = chunk
+        write([f"{id_prefix}{i}" for i in range(start, start + len(matrix))], matrix)
+        return chunk
+
+    size = lambda chunk: len(chunk[1])
+    names = (source_name, "fingerprint", "write")
+    for name in names:
+        stats.stages[name] = StageStats(name)
+    fp_vocab = vocab if fp_workers <= 1 else None
+    fp_fn = partial(_cached_fingerprint_chunk, cache=cache) if cache is not None else \
+        partial(_fingerprint_chunk, D=D, iterations=iterations, vocab=fp_vocab, hash_family=hash_family)
+    stages = [
+        _Stage(names[0], source_fn, source, to_fp, stop, stats.stages[names[0]], size,
+               pool_for(source_workers), 2 * source_workers),
+        _Stage(names[1], fp_fn, _drain(to_fp, stop), to_sink, stop, stats.stages[names[1]], size,
+               pool_for(fp_workers), 2 * fp_workers),
+        _Stage(names[2], write_chunk, _drain(to_sink, stop), None, stop, stats.stages[names[2]], size),
+    ]
+    start = time.perf_counter()
+    try:
+        for stage in stages:
+            stage.start()
+        for stage in stages:
+            stage.join()
+    finally:
+        stop.set()
+        for pool in pools:
+            pool.shutdown(cancel_futures=True)
+    stats.seconds = time.perf_counter() - start
+    for stage in stages:
+        if stage.error is not None:
+            raise stage.error
+    return stats
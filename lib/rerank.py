@@ -0,0 +1,88 @@
+from __future__ import annotations
+import atexit, math
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, Iterable, Mapping, Optional, Sequence, Union
+from classes.event_graph import EventGraph
+from lib.WL2vec import WL_neighborhood_label
+from lib.local_index import Match, QueryResult
+
+def wl_histogram(graph: EventGraph, iterations: int = 3, vocab=None) -> Counter:
+    """WL subtree feature map: how often each label occurs across iterations 0..h."""
+    counts: Counter = Counter()
+    for labels in WL_neighborhood_label(graph, iterations, vocab=vocab):
+        counts.update(labels.values())
+    return counts
+
+def wl_kernel(a: Counter, b: Counter) -> float:
+    """Normalized WL subtree kernel k(a,b) / sqrt(k(a,a) k(b,b)) of two label histograms."""
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(c * b[label] for label, c in a.items() if label in b)
+    norm = math.sqrt(sum(c * c for c in a.values()) * sum(c * c for c in b.values()))
+    return dot / norm if norm else 0.0
+
+# below this many candidates a pool costs more in pickling than it saves
+MIN_PARALLEL_CANDIDATES = 256
+
+# shared pools by worker count, so repeated rerank calls do not respawn processes
+_pools: Dict[int, ProcessPoolExecutor] = {}
+
+def _shared_pool(workers: int) -> ProcessPoolExecutor:
+    pool = _pools.get(workers)
+    if pool is None:
+        pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+    return pool
+
+@atexit.register
+def _shutdown_pools() -> None:
+    for pool in _pools.values():
+        pool.shutdown(cancel_futures=True)
+    _pools.clear()
+
+def _histogram_job(args):
+    graph, iterations = args
+    return wl_histogram(graph, iterations)
+
+def _candidate_graph(graphs: Union[Sequence[EventGraph], Mapping[str, EventGraph]], fid: str) -> EventGraph:
+    # notebook ids are positions in the corpus; mappings are looked up by id as given
+    return graphs[fid] if isinstance(graphs, Mapping) else graphs[int(fid)]
+
+def rerank(query_graph: EventGraph, candidates: Union[QueryResult, Iterable[Match], Iterable[str]],
+           graphs: Union[Sequence[EventGraph], Mapping[str, EventGraph]], top_k: int = 10,
+           iterations: int = 3, workers: Union[None, int, Executor] = None) -> QueryResult:
+    """Re-order vector-search candidates by the exact normalized WL subtree kernel.
+
+    Over-fetch cheaply (e.g. top 100 by hashed cosine), then call this to get
+    an exactly ordered top `top_k`. `graphs` resolves candidate ids to graphs:
+    a sequence indexed by `int(id)` (a list or a `NoiseCorpus`) or a mapping.
+    Candidate histograms are computed on a process pool when `workers` > 1
+    and there are at least `MIN_PARALLEL_CANDIDATES` candidates; the pool is
+    created once per worker count and reused. `workers` may also be an
+    `Executor` of the caller's, which is always used.
+    Returned matches keep their metadata; `score` becomes the kernel value.
+    """
+    if isinstance(candidates, QueryResult):
+        candidates = candidates.matches
+    matches = [c if isinstance(c, Match) else Match(id=str(c), score=0.0) for c in candidates]
+    if not matches:
+        return QueryResult()
+
+    query_hist = wl_histogram(query_graph, iterations)
+    cand_graphs = [_candidate_graph(graphs, m.id) for m in matches]
+    if isinstance(workers, Executor):
+        pool, chunks = workers, 16
+    elif workers is not None and workers > 1 and len(cand_graphs) >= MIN_PARALLEL_CANDIDATES:
+        pool, chunks = _shared_pool(workers), workers * 4
+    else:
+        pool = None
+    if pool is not None:
+        chunksize = max(1, len(cand_graphs) // chunks)
+        hists = list(pool.map(_histogram_job, [(g, iterations) for g in cand_graphs], chunksize=chunksize))
+    else:
+        hists = [wl_histogram(g, iterations) for g in cand_graphs]
+
+    rescored = [Match(id=m.id, score=wl_kernel(query_hist, h), metadata=m.metadata) for m, h in zip(matches, hists)]
+    # stable sort: equal kernels keep the vector-search order
+    rescored.sort(key=lambda m: -m.score)
+    return QueryResult(rescored[:top_k])
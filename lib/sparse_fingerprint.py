@@ -0,0 +1,95 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Union
+import numpy as np
+from scipy import sparse
+
+
+@dataclass(frozen=True)
+class SparseFingerprint:
+    """Fingerprint as sorted slot indices plus float32 values; every other slot is 0."""
+    indices: np.ndarray  # int64, strictly increasing
+    values: np.ndarray   # float32, same length
+    D: int
+
+    @classmethod
+    def from_slots(cls, slots: Dict[int, float], D: int) -> "SparseFingerprint":
+        indices = np.fromiter(sorted(slots), dtype=np.int64, count=len(slots))
+        values = np.fromiter((slots[i] for i in indices.tolist()), dtype=np.float32, count=len(slots))
+        return cls(indices, values, D)
+
+    @classmethod
+    def from_dense(cls, fingerprint: Sequence[float]) -> "SparseFingerprint":
+        dense = np.asarray(fingerprint, dtype=np.float32)
+        indices = np.flatnonzero(dense)
+        return cls(indices.astype(np.int64), dense[indices], len(dense))
+
+    @property
+    def nnz(self) -> int:
+        return len(self.indices)
+
+    def norm(self) -> float:
+        return float(np.linalg.norm(self.values))
+
+    def to_dense(self) -> np.ndarray:
+        dense = np.zeros(self.D, dtype=np.float32)
+        dense[self.indices] = self.values
+        return dense
+
+    def to_pinecone(self) -> Dict[str, List]:
+        """Pinecone `sparse_values` payload."""
+        return {"indices": self.indices.tolist(), "values": self.values.tolist()}
+
+
+Fingerprint = Union[SparseFingerprint, Sequence[float], np.ndarray]
+
+def as_dense(fingerprint: Fingerprint) -> np.ndarray:
+    if isinstance(fingerprint, SparseFingerprint):
+        return fingerprint.to_dense()
+    return np.asarray(fingerprint, dtype=np.float32)
+
+def cosine_similarity(a: Fingerprint, b: Fingerprint) -> float:
+    """Cosine similarity of two fingerprints, sparse or dense, without densifying sparse pairs."""
+    if isinstance(a, SparseFingerprint) and isinstance(b, SparseFingerprint):
+        _, ia, ib = np.intersect1d(a.indices, b.indices, assume_unique=True, return_indices=True)
+        dot = float(np.dot(a.values[ia], b.values[ib]))
+        denom = a.norm() * b.norm()
+    elif isinstance(a, SparseFingerprint) or isinstance(b, SparseFingerprint):
+        sp, dense = (a, as_dense(b)) if isinstance(a, SparseFingerprint) else (b, as_dense(a))
+        dot = float(np.dot(sp.values, dense[sp.indices]))
+        denom = sp.norm() * float(np.linalg.norm(dense))
+    else:
+        va, vb = as_dense(a), as_dense(b)
+        dot = float(np.dot(va, vb))
+        denom = float(np.linalg.norm(va) * np.linalg.norm(vb))
+    return dot / denom if denom else 0.0
+
+def to_csr(fingerprints: Sequence[SparseFingerprint], D: Optional[int] = None) -> sparse.csr_matrix:
+    """Stack sparse fingerprints into an (n, D) float32 CSR matrix."""
+    if D is None:
+        D = fingerprints[0].D if fingerprints else 0
+    indptr = np.zeros(len(fingerprints) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([fp.nnz for fp in fingerprints])
+    indices = np.concatenate([fp.indices for fp in fingerprints]) if fingerprints else np.zeros(0, np.int64)
+    data = np.concatenate([fp.values for fp in fingerprints]) if fingerprints else np.zeros(0, np.float32)
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(fingerprints), D))
+
+def csr_from_coo(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, shape) -> sparse.csr_matrix:
+    """CSR matrix from coordinates already sorted by (row, col) with no duplicates."""
+    indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=shape[0]), out=indptr[1:])
+    return sparse.csr_matrix((values.astype(np.float32), cols, indptr), shape=shape)
+
+def row(matrix: sparse.csr_matrix, i: int) -> SparseFingerprint:
+    start, end = matrix.indptr[i], matrix.indptr[i + 1]
+    return SparseFingerprint(matrix.indices[start:end].astype(np.int64),
+                             matrix.data[start:end].astype(np.float32), matrix.shape[1])
+
+def cosine_scores(matrix: sparse.csr_matrix, query: Fingerprint) -> np.ndarray:
+    """Cosine similarity of `query` against every row of a CSR fingerprint matrix."""
+    q = query if isinstance(query, SparseFingerprint) else SparseFingerprint.from_dense(query)
+    qvec = sparse.csr_matrix((q.values, q.indices, [0, q.nnz]), shape=(1, matrix.shape[1]))
+    dots = np.asarray((matrix @ qvec.T).todense()).ravel()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    denom = norms * q.norm()
+    return np.divide(dots, denom, out=np.zeros_like(dots), where=denom > 0)
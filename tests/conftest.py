@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# modules import each other from the repo root (`from lib.X import ...`)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
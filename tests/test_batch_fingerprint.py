@@ -0,0 +1,68 @@
+"""The batch engine, frozen graphs and sparse fingerprints must agree with `graph_to_fingerprint`."""
+from pathlib import Path
+import numpy as np
+import pytest
+from classes.event_graph import EventGraph
+from classes.event_node import EventNode
+from lib.WL2vec import get_hash_family, graph_to_fingerprint, graph_to_sparse_fingerprint, graphs_to_fingerprints
+from lib.noise_sampler import generate_noise_graphs
+
+RULES_PATH = Path(__file__).resolve().parent.parent / "lib" / "sampling_rules.json"
+D, ITERATIONS = 256, 3
+FAMILIES = [None, "splitmix64"]
+
+
+@pytest.fixture(scope="module")
+def graphs():
+    return generate_noise_graphs(40, 30, str(RULES_PATH), seed=7)
+
+@pytest.fixture(scope="module")
+def frozen(graphs):
+    return [g.freeze() for g in graphs]
+
+def _reference(graphs, hash_family):
+    return np.asarray([graph_to_fingerprint(g, D, ITERATIONS, hash_family=hash_family) for g in graphs],
+                      dtype=np.float32)
+
+
+@pytest.mark.parametrize("hash_family", FAMILIES)
+def test_batch_matches_per_graph(graphs, hash_family):
+    batch = graphs_to_fingerprints(graphs, D, ITERATIONS, hash_family=hash_family)
+    assert np.array_equal(batch, _reference(graphs, hash_family))
+
+@pytest.mark.parametrize("hash_family", FAMILIES)
+def test_frozen_matches_mutable(graphs, frozen, hash_family):
+    expected = _reference(graphs, hash_family)
+    assert np.array_equal(_reference(frozen, hash_family), expected)
+    assert np.array_equal(graphs_to_fingerprints(frozen, D, ITERATIONS, hash_family=hash_family), expected)
+
+@pytest.mark.parametrize("hash_family", FAMILIES)
+def test_sparse_matches_dense(graphs, frozen, hash_family):
+    expected = _reference(graphs, hash_family)
+    sparse = graphs_to_fingerprints(graphs, D, ITERATIONS, sparse=True, hash_family=hash_family)
+    assert np.array_equal(sparse.toarray(), expected)
+    for g, f, row in zip(graphs, frozen, expected):
+        assert np.array_equal(graph_to_sparse_fingerprint(g, D, ITERATIONS, hash_family=hash_family).to_dense(), row)
+        assert np.array_equal(graph_to_sparse_fingerprint(f, D, ITERATIONS, hash_family=hash_family).to_dense(), row)
+
+def test_empty_batch():
+    assert graphs_to_fingerprints([], D, ITERATIONS).shape == (0, D)
+
+@pytest.mark.parametrize("hash_family", FAMILIES)
+def test_batch_keeps_value_types(hash_family):
+    # 1 == 1.0 == True, but each hashes by its own repr in the per-graph path
+    graphs = []
+    for value in (1, 1.0, True, 0, False):
+        g = EventGraph()
+        g.add_node(EventNode("started_school", {"age": value}))
+        graphs.append(g)
+    batch = graphs_to_fingerprints(graphs, D, ITERATIONS, hash_family=hash_family)
+    assert np.array_equal(batch, _reference(graphs, hash_family))
+    assert np.array_equal(graphs_to_fingerprints([g.freeze() for g in graphs], D, ITERATIONS,
+                                                 hash_family=hash_family), batch)
+
+def test_splitmix_keys_keep_value_types():
+    fam = get_hash_family("splitmix64")
+    labels = [fam.key(("started_school", "age", value)) for value in (1, 1.0, True)]
+    assert len(set(labels)) == 3
+    assert labels == [fam.key(("started_school", "age", value)) for value in (1, 1.0, True)]
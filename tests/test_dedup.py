@@ -0,0 +1,39 @@
+"""`FingerprintCache` must only hand out vectors for its current D / iterations / hash family."""
+from pathlib import Path
+import numpy as np
+import pytest
+from lib.WL2vec import graphs_to_fingerprints
+from lib.dedup import DedupIndex, FingerprintCache
+from lib.local_index import FingerprintIndex
+from lib.noise_sampler import generate_noise_graphs
+
+RULES_PATH = Path(__file__).resolve().parent.parent / "lib" / "sampling_rules.json"
+
+
+@pytest.fixture(scope="module")
+def graphs():
+    corpus = generate_noise_graphs(10, 20, str(RULES_PATH), seed=3)
+    return corpus + corpus[:5]
+
+def test_cache_matches_uncached(graphs):
+    cache = FingerprintCache(256, 2)
+    assert np.array_equal(cache.fingerprints(graphs), graphs_to_fingerprints(graphs, 256, 2))
+    assert cache.stats()["size"] == 10
+    assert np.array_equal(cache.fingerprints(graphs), graphs_to_fingerprints(graphs, 256, 2))
+    assert cache.stats()["hits"] == len(graphs)
+
+def test_cache_never_returns_stale_vectors(graphs):
+    cache = FingerprintCache(256, 2)
+    cache.fingerprints(graphs)
+    cache.hash_family = "splitmix64"
+    expected = graphs_to_fingerprints(graphs, 256, 2, hash_family="splitmix64")
+    assert np.array_equal(cache.fingerprints(graphs), expected)
+    cache.D = 128
+    assert np.array_equal(cache.fingerprints(graphs),
+                          graphs_to_fingerprints(graphs, 128, 2, hash_family="splitmix64"))
+
+def test_dedup_index_rejects_mismatched_cache():
+    with pytest.raises(ValueError):
+        DedupIndex(FingerprintIndex(256), 256, 2, cache=FingerprintCache(256, 2), hash_family="splitmix64")
+    with pytest.raises(ValueError):
+        DedupIndex(FingerprintIndex(256), 256, 3, cache=FingerprintCache(256, 2))
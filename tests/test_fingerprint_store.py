@@ -0,0 +1,97 @@
+"""`FingerprintStore` must reopen exactly what was appended and survive a torn append."""
+from pathlib import Path
+import numpy as np
+import pytest
+from lib.WL2vec import graphs_to_fingerprints
+from lib.binary_fingerprint import graphs_to_binary_fingerprints
+from lib.fingerprint_store import FingerprintStore, StoreMismatch
+from lib.noise_sampler import generate_noise_graphs
+
+RULES_PATH = Path(__file__).resolve().parent.parent / "lib" / "sampling_rules.json"
+D, ITERATIONS = 256, 2
+
+
+@pytest.fixture(scope="module")
+def graphs():
+    return {str(i): g for i, g in enumerate(generate_noise_graphs(30, 30, str(RULES_PATH), seed=4))}
+
+def _expected(graphs, ids, hash_family=None):
+    return graphs_to_fingerprints([graphs[i] for i in ids], D, ITERATIONS, hash_family=hash_family)
+
+@pytest.mark.parametrize("hash_family", [None, "splitmix64"])
+def test_reopen_and_append(tmp_path, graphs, hash_family):
+    ids = list(graphs)
+    store = FingerprintStore.create(tmp_path / "s", D, ITERATIONS, hash_family=hash_family, seed=4)
+    store.append_graphs({i: graphs[i] for i in ids[:20]}, batch_size=7)
+
+    reopened = FingerprintStore.open(tmp_path / "s", writable=True)
+    assert reopened.ids == ids[:20]
+    assert np.array_equal(reopened.matrix, _expected(graphs, ids[:20], hash_family))
+    reopened.check(D, ITERATIONS, hash_family=hash_family, seed=4)
+    reopened.append_graphs({i: graphs[i] for i in ids[20:]})   # uses the recorded hash family
+
+    final = FingerprintStore.open(tmp_path / "s")
+    assert final.ids == ids and len(final) == len(ids)
+    assert np.array_equal(final.matrix, _expected(graphs, ids, hash_family))
+    assert np.array_equal(final["25"], final.matrix[25])
+    with pytest.raises(PermissionError):
+        final.append({"x": final.matrix[0]})
+
+def test_overwrite_existing_ids(tmp_path, graphs):
+    ids = list(graphs)
+    store = FingerprintStore.create(tmp_path / "s", D, ITERATIONS)
+    store.append_graphs({i: graphs[i] for i in ids[:10]})
+    m = _expected(graphs, ids)
+    # "3" and "7" are overwritten in place, "new" is appended once with its later value
+    store.append(["3", "new", "7", "new"], np.stack([m[20], m[21], m[22], m[23]]))
+    reopened = FingerprintStore.open(tmp_path / "s")
+    assert reopened.ids == ids[:10] + ["new"]
+    assert np.array_equal(reopened["3"], m[20])
+    assert np.array_equal(reopened["7"], m[22])
+    assert np.array_equal(reopened["new"], m[23])
+    assert np.array_equal(reopened["0"], m[0])
+
+def test_binary_store(tmp_path, graphs):
+    ids = list(graphs)
+    store = FingerprintStore.create(tmp_path / "b", D, ITERATIONS, kind="binary", A=128)
+    store.append_graphs(graphs)
+    expected = graphs_to_binary_fingerprints(list(graphs.values()), D, 128, ITERATIONS)
+    reopened = FingerprintStore.open(tmp_path / "b")
+    assert reopened.kind == "binary" and reopened.ids == ids
+    assert np.array_equal(reopened.matrix, expected)
+    assert len(reopened.to_index()) == len(ids)
+    with pytest.raises(StoreMismatch):
+        reopened.check(D, ITERATIONS, kind="binary", A=64)
+
+def test_torn_append_keeps_previous_contents(tmp_path, graphs):
+    ids = list(graphs)
+    store = FingerprintStore.create(tmp_path / "s", D, ITERATIONS)
+    store.append_graphs({i: graphs[i] for i in ids[:10]})
+    # a crash after the data files grew but before the header count was rewritten
+    with open(tmp_path / "s" / "vectors.bin", "ab") as f:
+        f.write(np.ones((3, D), dtype="<f4").tobytes()[:-5])
+    with open(tmp_path / "s" / "ids.txt", "ab") as f:
+        f.write(b"torn-1\ntorn-2\ntor")
+
+    reopened = FingerprintStore.open(tmp_path / "s", writable=True)
+    assert reopened.ids == ids[:10]
+    assert np.array_equal(reopened.matrix, _expected(graphs, ids[:10]))
+    reopened.append_graphs({i: graphs[i] for i in ids[10:15]})
+
+    final = FingerprintStore.open(tmp_path / "s")
+    assert final.ids == ids[:15]
+    assert np.array_equal(final.matrix, _expected(graphs, ids[:15]))
+    assert (tmp_path / "s" / "vectors.bin").stat().st_size == 15 * D * 4
+
+def test_open_or_build(tmp_path, graphs):
+    calls = []
+    def build():
+        calls.append(1)
+        return graphs
+    first = FingerprintStore.open_or_build(tmp_path / "s", build, D, ITERATIONS, rules_checksum="a")
+    again = FingerprintStore.open_or_build(tmp_path / "s", build, D, ITERATIONS, rules_checksum="a")
+    assert len(calls) == 1 and again.ids == first.ids
+    FingerprintStore.open_or_build(tmp_path / "s", build, D, ITERATIONS, rules_checksum="b")
+    assert len(calls) == 2
+    with pytest.raises(FileExistsError):
+        FingerprintStore.create(tmp_path / "s", D, ITERATIONS)
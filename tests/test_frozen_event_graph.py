@@ -0,0 +1,27 @@
+"""`FrozenEventGraph` must keep every attribute value exactly as the mutable graph had it."""
+from classes.event_graph import EventGraph
+from classes.event_node import EventNode
+from lib.WL2vec import graph_to_fingerprint
+
+
+def _graph(value) -> EventGraph:
+    g = EventGraph()
+    a, b = EventNode("started_school", {"age": value}), EventNode("finished_school", {"age": 2})
+    g.add_node(a)
+    g.add_node(b)
+    g.add_edge(a, b)
+    return g
+
+def test_freeze_keeps_value_types():
+    graphs = [_graph(v) for v in (1, 1.0, True)]
+    for g in graphs:   # the first freeze must not decide the type the later ones get
+        frozen = g.freeze()
+        value = next(iter(g.nodes.values())).event_attributes["age"]
+        assert type(frozen.attributes(0)["age"]) is type(value)
+        assert graph_to_fingerprint(frozen) == graph_to_fingerprint(g)
+
+def test_thaw_round_trip():
+    g = _graph(1.0)
+    thawed = g.freeze().thaw()
+    assert [n.event_attributes for n in thawed.nodes.values()] == [n.event_attributes for n in g.nodes.values()]
+    assert graph_to_fingerprint(thawed) == graph_to_fingerprint(g)
@@ -0,0 +1,79 @@
+"""Graphs written with `GraphWriter` must read back unchanged, frozen or thawed."""
+from pathlib import Path
+import pytest
+from classes.event_graph import EventGraph
+from classes.event_node import EventNode
+from classes.frozen_event_graph import FrozenEventGraph
+from lib.WL2vec import graph_to_fingerprint, graphs_to_fingerprints
+from lib.graph_store import GraphReader, load_graphs, save_graphs
+from lib.noise_sampler import generate_noise_graphs
+
+RULES_PATH = Path(__file__).resolve().parent.parent / "lib" / "sampling_rules.json"
+
+
+def _chain(*nodes: EventNode) -> EventGraph:
+    g = EventGraph()
+    for node in nodes:
+        g.add_node(node)
+    for u, v in zip(nodes, nodes[1:]):
+        g.add_edge(u, v)
+    return g
+
+def _content(graph):
+    """Event types, edges and typed attributes, independent of node ids."""
+    frozen = graph if isinstance(graph, FrozenEventGraph) else graph.freeze()
+    attrs = [[(k, type(v), v) for k, v in frozen.attributes(i).items()] for i in range(len(frozen))]
+    return frozen.event_types, frozen.to_edge_list(), attrs
+
+@pytest.fixture
+def graphs():
+    typed = _chain(EventNode("started_school", {"age": 1, "time": 1.0, "city": True, "hobby": "1", "company": None}),
+                   EventNode("started_school", {"age": 1.0, "time": True, "city": 1, "hobby": "True"}),
+                   EventNode("finished_school", {"age": True, "time": 0, "city": False}))
+    unknown = _chain(EventNode("graph_store_test_event", {"city": "not in data/event_types.py"}),
+                     EventNode("started_school", {}))
+    fan = EventGraph()
+    root, *leaves = [EventNode("moved_country", {"time": t}) for t in (1990, 1995.5, 2000)]
+    for node in (root, *leaves):
+        fan.add_node(node)
+    for leaf in leaves:
+        fan.add_edge(root, leaf)
+    return [typed, EventGraph(), unknown, fan, EventGraph()] + generate_noise_graphs(7, 30, str(RULES_PATH), seed=2)
+
+@pytest.mark.parametrize("frozen", [True, False])
+def test_round_trip(tmp_path, graphs, frozen):
+    path = tmp_path / "corpus.egc"
+    assert save_graphs(path, graphs, chunk_size=3, seed=2) == len(graphs)
+    loaded = load_graphs(path, frozen=frozen)
+    assert len(loaded) == len(graphs)
+    for g, back in zip(graphs, loaded):
+        assert isinstance(back, FrozenEventGraph if frozen else EventGraph)
+        assert _content(back) == _content(g)
+        assert graph_to_fingerprint(back) == graph_to_fingerprint(g)
+
+def test_frozen_input_and_random_access(tmp_path, graphs):
+    path = tmp_path / "corpus.egc"
+    save_graphs(path, [g.freeze() for g in graphs], chunk_size=4)
+    with GraphReader(path, cache_chunks=1) as reader:
+        assert len(reader) == len(graphs)
+        for i in [5, 0, -1, 11, 3, 3]:
+            assert _content(reader[i]) == _content(graphs[i])
+        assert [_content(g) for g in reader[2:9:3]] == [_content(g) for g in graphs[2:9:3]]
+        sizes = [len(chunk) for chunk in reader.iter_chunks(5)]
+        assert sizes == [5, 5, 2]
+        with pytest.raises(IndexError):
+            reader[len(graphs)]
+    assert (graphs_to_fingerprints(load_graphs(path)) == graphs_to_fingerprints(graphs)).all()
+
+def test_empty_corpus(tmp_path):
+    path = tmp_path / "empty.egc"
+    assert save_graphs(path, []) == 0
+    with GraphReader(path) as reader:
+        assert len(reader) == 0 and list(reader) == []
+
+def test_rejects_truncated_file(tmp_path, graphs):
+    path = tmp_path / "corpus.egc"
+    save_graphs(path, graphs)
+    path.write_bytes(path.read_bytes()[:-3])
+    with pytest.raises(ValueError):
+        GraphReader(path)
@@ -0,0 +1,60 @@
+"""`HNSWIndex` must find (nearly) the exact cosine neighbours and survive a save/load round trip."""
+from pathlib import Path
+import numpy as np
+import pytest
+from lib.WL2vec import graphs_to_fingerprints
+from lib.hnsw import HNSWIndex
+from lib.local_index import FingerprintIndex
+from lib.noise_sampler import generate_noise_graphs
+
+RULES_PATH = Path(__file__).resolve().parent.parent / "lib" / "sampling_rules.json"
+D, TOP_K = 256, 10
+
+
+@pytest.fixture(scope="module")
+def fingerprints():
+    graphs = generate_noise_graphs(640, 40, str(RULES_PATH), seed=9)
+    return graphs_to_fingerprints(graphs, D)
+
+@pytest.fixture(scope="module")
+def index(fingerprints):
+    index = HNSWIndex(D, M=8, ef_construction=100)
+    index.upsert({str(i): v for i, v in enumerate(fingerprints[:600])}, {"source": "noise"})
+    return index
+
+def _recall(index, fingerprints, ef):
+    exact = FingerprintIndex(D)
+    exact.upsert({str(i): v for i, v in enumerate(fingerprints[:600])})
+    hits = 0
+    for q in fingerprints[600:]:
+        # score ties make the exact id set ambiguous; count any match at least as good as the k-th
+        kth = exact.query(q, TOP_K).matches[-1].score
+        hits += sum(m.score >= kth - 1e-5 for m in index.query(q, TOP_K, ef=ef).matches)
+    return hits / (TOP_K * len(fingerprints[600:]))
+
+def test_recall_against_brute_force(index, fingerprints):
+    assert _recall(index, fingerprints, ef=100) >= 0.95
+    assert _recall(index, fingerprints, ef=20) >= 0.8
+
+def test_nodes_keep_m_links(index):
+    # pruned candidates top the diversity heuristic back up, so no node is left with fewer than M links
+    assert min(len(links[0]) for links in index._links) >= index.M
+    assert all(len(layer) <= (2 * index.M if level == 0 else index.M)
+               for links in index._links for level, layer in enumerate(links))
+
+def test_save_load_round_trip(tmp_path, index, fingerprints):
+    path = tmp_path / "index.npz"
+    index.save(path)
+    loaded = HNSWIndex.load(path)
+    assert len(loaded) == len(index) and loaded._links == index._links
+    for q in fingerprints[600:610]:
+        a, b = index.query(q, TOP_K), loaded.query(q, TOP_K)
+        assert [(m.id, m.score, m.metadata) for m in a.matches] == [(m.id, m.score, m.metadata) for m in b.matches]
+    loaded.upsert({"extra": fingerprints[-1]})
+    assert loaded.query(fingerprints[-1], 1).matches[0].id == "extra"
+
+def test_empty_index_round_trip(tmp_path):
+    path = tmp_path / "empty.npz"
+    HNSWIndex().save(path)
+    loaded = HNSWIndex.load(path)
+    assert len(loaded) == 0 and loaded.query(np.ones(D, dtype=np.float32)).matches == []
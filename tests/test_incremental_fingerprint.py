@@ -0,0 +1,53 @@
+"""`IncrementalFingerprint` must match a full recompute after every edit."""
+import random
+from pathlib import Path
+import pytest
+from classes.event_node import EventNode
+from lib.WL2vec import IncrementalFingerprint, WL_neighborhood_label, graph_to_fingerprint
+from lib.noise_sampler import generate_noise_graphs
+
+RULES_PATH = Path(__file__).resolve().parent.parent / "lib" / "sampling_rules.json"
+D, ITERATIONS, EDITS = 128, 3, 40
+
+
+def _random_edit(g, rng: random.Random) -> None:
+    ids = list(g.nodes)
+    op = rng.random()
+    try:
+        if op < 0.25 or len(ids) < 2:
+            g.add_node(EventNode(rng.choice(["moved_city", "got_pet", "started_school"]),
+                                 {"age": rng.randint(1, 3), "time": 2000}))
+        elif op < 0.5:
+            g.add_edge(g.nodes[rng.choice(ids)], g.nodes[rng.choice(ids)])
+        elif op < 0.65:
+            edges = g.to_edge_list()
+            if edges:
+                g.remove_edge(*rng.choice(edges))
+        elif op < 0.8:
+            g.remove_node(rng.choice(ids))
+        else:
+            edges = g.to_edge_list()
+            if edges:
+                u, v = rng.choice(edges)
+                g.insert_between(u, v, EventNode("got_pet", {"age": 1}))
+    except ValueError:  # self-loop or cycle; the graph is unchanged
+        pass
+
+
+@pytest.mark.parametrize("hash_family", [None, "splitmix64"])
+def test_incremental_matches_recompute(hash_family):
+    rng = random.Random(3)
+    for g in generate_noise_graphs(8, 24, str(RULES_PATH), seed=4):
+        inc = IncrementalFingerprint(g, D, ITERATIONS, hash_family=hash_family)
+        for _ in range(EDITS):
+            _random_edit(g, rng)
+            assert inc.history == WL_neighborhood_label(g, ITERATIONS, hash_family=hash_family)
+            assert inc.fingerprint == graph_to_fingerprint(g, D, ITERATIONS, hash_family=hash_family)
+
+def test_detach_stops_updates():
+    g = generate_noise_graphs(1, 10, str(RULES_PATH), seed=1)[0]
+    inc = IncrementalFingerprint(g, D, ITERATIONS)
+    before = list(inc.fingerprint)
+    inc.detach()
+    g.add_node(EventNode("moved_city", {"age": 2}))
+    assert inc.fingerprint == before
@@ -0,0 +1,39 @@
+"""`LabelVocabulary` must hash exactly like the uncached path and stay bounded."""
+from classes.event_graph import EventGraph
+from classes.event_node import EventNode
+from lib.WL2vec import graph_to_fingerprint, key_hash
+from lib.label_vocab import LabelVocabulary
+
+
+def _graph(value) -> EventGraph:
+    g = EventGraph()
+    g.add_node(EventNode("started_school", {"age": value}))
+    return g
+
+
+def test_hash_keeps_value_types():
+    vocab = LabelVocabulary()
+    for value in (1, 1.0, True, 1, 1.0, True):
+        key = ("started_school", "age", value)
+        assert vocab.hash(key) == key_hash(key)
+    for value in (1, 1.0, True):
+        assert graph_to_fingerprint(_graph(value), vocab=vocab) == graph_to_fingerprint(_graph(value))
+
+def test_signature_matches_key_hash():
+    vocab = LabelVocabulary()
+    label, neighbours = key_hash("a"), [key_hash("b"), key_hash("c"), key_hash("b")]
+    expected = key_hash((label, tuple(sorted(neighbours, key=repr))))
+    assert vocab.signature(label, neighbours) == expected
+    assert vocab.signature(label, neighbours[::-1]) == expected
+    assert vocab.hits == 1
+
+def test_ids_are_bounded_and_never_reused(tmp_path):
+    vocab = LabelVocabulary(capacity=10)
+    ids = [vocab.id(str(i)) for i in range(100)]
+    assert ids == list(range(100))
+    assert len(vocab) == 10 and len(vocab._cache) == 10
+    assert vocab.id("99") == 99
+    assert vocab.id("0") == 100   # evicted, so it comes back under a fresh id
+    vocab.save(tmp_path / "vocab.pkl")
+    loaded = LabelVocabulary.load(tmp_path / "vocab.pkl")
+    assert loaded.id("99") == 99 and loaded.id("1") == 101
@@ -0,0 +1,117 @@
+"""Filtered `query` / `query_many` must return the brute-force top_k among the graphs a filter matches."""
+from pathlib import Path
+import numpy as np
+import pytest
+from lib.WL2vec import graphs_to_fingerprints
+from lib.local_index import FingerprintIndex
+from lib.metadata_filter import node_records
+from lib.noise_sampler import generate_noise_graphs
+
+RULES_PATH = Path(__file__).resolve().parent.parent / "lib" / "sampling_rules.json"
+D, TOP_K = 256, 10
+
+FILTERS = [
+    {},
+    {"event_type": "moved_country"},
+    {"event_type": {"$in": ["got_divorced", "had_child"]}},
+    {"event_type": "started_school", "age": {"$gte": 6, "$lt": 8}},
+    {"event_type": "started_work", "industry": {"$in": ["tech", "finance"]}},
+    {"event_type": "started_work", "industry": {"$nin": ["tech", "healthcare"]}, "age": {"$ne": 30}},
+    {"age": {"$lte": 3}},
+    {"$and": [{"event_type": "moved_country"}, {"event_type": "started_work", "industry": "tech"}]},
+    {"$or": [{"event_type": "got_married"}, {"time": {"$gte": 1995, "$lt": 1997}}]},
+    {"$not": {"event_type": "started_school"}},
+    {"event_type": "moved_country", "country": "France", "$not": {"event_type": "got_married"}},
+    # nothing matches
+    {"event_type": "started_school", "age": {"$gt": 1000}},
+    {"$and": [{"event_type": "moved_country"}, {"$not": {"event_type": "moved_country"}}]},
+]
+
+
+# ---- reference evaluator over node records ----
+def _numeric(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+def _same(a, b):
+    return _numeric(a) == _numeric(b) and a == b
+
+def _value_ok(value, cond):
+    ops = cond if isinstance(cond, dict) else {"$eq": cond}
+    checks = {
+        "$eq": lambda x: _same(value, x),
+        "$ne": lambda x: not _same(value, x),
+        "$in": lambda xs: any(_same(value, x) for x in xs),
+        "$nin": lambda xs: not any(_same(value, x) for x in xs),
+        "$gt": lambda x: _numeric(value) and value > x,
+        "$gte": lambda x: _numeric(value) and value >= x,
+        "$lt": lambda x: _numeric(value) and value < x,
+        "$lte": lambda x: _numeric(value) and value <= x,
+    }
+    return all(checks[op](x) for op, x in ops.items())
+
+def _has_node(records, leaf):
+    for event_type, items in records:
+        if "event_type" in leaf and not _value_ok(event_type, leaf["event_type"]):
+            continue
+        attrs = dict(items)
+        if all(a in attrs and _value_ok(attrs[a], c) for a, c in leaf.items() if a != "event_type"):
+            return True
+    return False
+
+def _matches(records, filter):
+    leaf = {k: v for k, v in filter.items() if not k.startswith("$")}
+    return ((not leaf or _has_node(records, leaf))
+            and all(_matches(records, f) for f in filter.get("$and", []))
+            and (("$or" not in filter) or any(_matches(records, f) for f in filter["$or"]))
+            and (("$not" not in filter) or not _matches(records, filter["$not"])))
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    graphs = generate_noise_graphs(400, 40, str(RULES_PATH), seed=11)
+    fps = graphs_to_fingerprints(graphs, D)
+    ids = [str(i) for i in range(len(graphs))]
+    index = FingerprintIndex(D)
+    half = len(graphs) // 2
+    index.upsert(dict(zip(ids[:half], fps[:half])), graphs=dict(zip(ids[:half], graphs[:half])))
+    index.upsert(dict(zip(ids[half:], fps[half:])),
+                 graphs={i: g.freeze() for i, g in zip(ids[half:], graphs[half:])})
+    records = [node_records(g) for g in graphs]
+    return index, fps, records
+
+def _brute_scores(fps, mask, query):
+    unit = fps / np.linalg.norm(fps, axis=1, keepdims=True)
+    return unit[mask] @ (query / np.linalg.norm(query)), np.flatnonzero(mask)
+
+def _check(result, fps, mask, query):
+    scores, rows = _brute_scores(fps, mask, query)
+    assert len(result.matches) == min(TOP_K, int(mask.sum()))   # top_k filled whenever enough rows match
+    by_row = dict(zip(rows.tolist(), scores.tolist()))
+    for m in result.matches:
+        assert mask[int(m.id)]
+        assert m.score == pytest.approx(by_row[int(m.id)], abs=1e-5)
+    expected = np.sort(scores)[::-1][:TOP_K]
+    assert np.allclose([m.score for m in result.matches], expected, atol=1e-5)
+
+def test_reference_evaluator_sees_every_filter_kind(corpus):
+    _, _, records = corpus
+    counts = [sum(_matches(r, f) for r in records) for f in FILTERS]
+    assert counts[-2:] == [0, 0]
+    assert all(0 < c for c in counts[:-2])
+    assert any(c < TOP_K for c in counts[:-2]) and any(c > TOP_K for c in counts)
+
+@pytest.mark.parametrize("filter", FILTERS, ids=[str(f) for f in FILTERS])
+def test_filtered_query_matches_brute_force(corpus, filter):
+    index, fps, records = corpus
+    mask = np.array([_matches(r, filter) for r in records])
+    for q in fps[:5]:
+        _check(index.query(q, TOP_K, filter=filter), fps, mask, q)
+
+@pytest.mark.parametrize("filter", FILTERS, ids=[str(f) for f in FILTERS])
+def test_filtered_query_many_matches_brute_force(corpus, filter):
+    index, fps, records = corpus
+    mask = np.array([_matches(r, filter) for r in records])
+    results = index.query_many(fps[:5], TOP_K, filter=filter)
+    assert len(results) == 5
+    for q, result in zip(fps[:5], results):
+        _check(result, fps, mask, q)
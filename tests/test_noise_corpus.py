@@ -0,0 +1,25 @@
+"""A lazy `NoiseCorpus` must produce the same graphs as the eager per-graph-seed corpus."""
+from pathlib import Path
+from lib.noise_sampler import generate_noise_graphs
+
+RULES_PATH = str(Path(__file__).resolve().parent.parent / "lib" / "sampling_rules.json")
+
+
+def _types(graphs):
+    return [[n.event_type for n in g.nodes.values()] for g in graphs]
+
+def test_lazy_matches_eager():
+    eager = generate_noise_graphs(12, 30, RULES_PATH, seed=5, workers=1)
+    lazy = generate_noise_graphs(12, 30, RULES_PATH, seed=5, lazy=True, cache_size=4)
+    assert len(lazy) == 12
+    assert _types(lazy) == _types(eager)
+    assert _types([lazy[3], lazy[-1]]) == _types([eager[3], eager[-1]])
+    assert _types(lazy[2:8:2]) == _types(eager[2:8:2])
+
+def test_concatenation():
+    eager = generate_noise_graphs(6, 30, RULES_PATH, seed=5, workers=1)
+    lazy = generate_noise_graphs(6, 30, RULES_PATH, seed=5, lazy=True)
+    assert _types(lazy + eager) == _types(eager + eager)
+    assert _types(eager + lazy) == _types(eager + eager)
+    assert _types(lazy[:2] + lazy[4:]) == _types(eager[:2] + eager[4:])
+    assert isinstance(lazy + [], list) and isinstance([] + lazy, list)
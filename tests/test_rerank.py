@@ -0,0 +1,38 @@
+"""`rerank` must order candidates the same way serially and on a (reused) process pool."""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import pytest
+from lib import rerank as rerank_module
+from lib.noise_sampler import generate_noise_graphs
+from lib.rerank import MIN_PARALLEL_CANDIDATES, rerank
+
+RULES_PATH = Path(__file__).resolve().parent.parent / "lib" / "sampling_rules.json"
+
+
+@pytest.fixture(scope="module")
+def graphs():
+    return generate_noise_graphs(MIN_PARALLEL_CANDIDATES + 10, 20, str(RULES_PATH), seed=6, freeze=True)
+
+def _ranking(result):
+    return [(m.id, m.score) for m in result.matches]
+
+def test_pool_matches_serial_and_is_reused(graphs):
+    ids = [str(i) for i in range(len(graphs))]
+    serial = _ranking(rerank(graphs[0], ids, graphs, top_k=20))
+    assert serial[0] == ("0", pytest.approx(1.0))
+    assert _ranking(rerank(graphs[0], ids, graphs, top_k=20, workers=2)) == serial
+    pool = rerank_module._pools[2]
+    assert _ranking(rerank(graphs[1], ids, graphs, top_k=20, workers=2)) == \
+        _ranking(rerank(graphs[1], ids, graphs, top_k=20))
+    assert rerank_module._pools[2] is pool
+
+def test_small_candidate_lists_stay_serial(graphs):
+    rerank_module._shutdown_pools()
+    ids = [str(i) for i in range(MIN_PARALLEL_CANDIDATES - 1)]
+    assert _ranking(rerank(graphs[0], ids, graphs, workers=4)) == _ranking(rerank(graphs[0], ids, graphs))
+    assert 4 not in rerank_module._pools
+
+def test_caller_supplied_executor(graphs):
+    ids = [str(i) for i in range(20)]
+    with ThreadPoolExecutor(2) as pool:
+        assert _ranking(rerank(graphs[3], ids, graphs, workers=pool)) == _ranking(rerank(graphs[3], ids, graphs))